@@ -1,19 +1,84 @@
 import sys
 import argparse
-import gradio as gr
+import atexit
+import functools
 import json
 import logging
+import os
+import tempfile
+import threading
 import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from itertools import chain
 from pathlib import Path
 
 from code_summarizer import (
     clone_repo,
-    summarize_repo,
-    upload_summary_to_firebase,
-    get_summaries_by_repo,
-    is_firestore_available
+    sync_repo,
+    iter_summaries,
+    delete_summaries,
+    get_repo_manifest,
+    write_repo_manifest,
+    is_manifest_fresh,
+    has_summaries,
+    get_head_sha,
+    resolve_remote_sha,
+    plan_incremental,
+    record_indexed_commit,
+    is_firestore_available,
+    SUPPORTED_EXTENSIONS,
 )
-from code_summarizer.summarizer import device as summarizer_device, MODEL_LOADED as SUMMARIZER_LOADED
+from code_summarizer.summarizer import (
+    get_device,
+    is_model_loaded,
+    warmup,
+    set_embedding_cache,
+    get_cache_stats,
+    configure_backend,
+    embedding_model_id,
+)
+from code_summarizer.backends import BACKENDS, DEFAULT_BACKEND, DEFAULT_TOLERANCE, check_backend_accuracy
+from code_summarizer.language_parsers import PYTHON_MODES, DEFAULT_PYTHON_MODE
+from code_summarizer.pipeline import iter_summaries_parallel, DEFAULT_QUEUE_DEPTH
+from code_summarizer.search_index import build_index, build_index_from_json, load_index, search, DEFAULT_INDEX_DIR
+from code_summarizer.sinks import SummaryWriter, iter_records, filter_records, METADATA_FILE
+from code_summarizer.records import json_default
+from code_summarizer.orchestrator import checkout_while_loading, firestore_upload, run_overlapped
+from code_summarizer.embedding_cache import EmbeddingCache, DEFAULT_CACHE_PATH, DEFAULT_MAX_BYTES
+from code_summarizer.discovery import discover_files, DEFAULT_EXCLUDES, DEFAULT_MAX_FILE_BYTES
+from code_summarizer.serving import (
+    JobQueue,
+    JobProgress,
+    get_embedding_worker,
+    WEB_CHUNK_SIZE,
+    DEFAULT_MAX_CONCURRENT_JOBS,
+    DEFAULT_MAX_QUEUED_JOBS,
+)
+from code_summarizer.benchmark import (
+    run_synthetic_benchmark,
+    DEFAULT_FILES as DEFAULT_BENCH_FILES,
+    DEFAULT_REPORT_PATH as DEFAULT_BENCH_REPORT,
+)
+from code_summarizer.metrics import (
+    export_metrics,
+    serve_prometheus,
+    set_profile_stage,
+    set_slow_file_threshold,
+    stage_summary,
+    dump_profile,
+    DEFAULT_PROFILE_DIR,
+    DEFAULT_SLOW_FILE_SECONDS,
+    PROFILE_STAGES,
+)
+from code_summarizer.batch import (
+    run_batch,
+    read_repo_list,
+    iter_batch_records,
+    DEFAULT_BATCH_DIR,
+    DEFAULT_CONCURRENT_JOBS,
+    DEFAULT_MAX_ATTEMPTS,
+)
+from code_summarizer.clone_cache import CloneCache, DEFAULT_CLONE_CACHE_DIR, DEFAULT_MAX_BYTES as DEFAULT_CLONE_CACHE_BYTES
 
 logging.basicConfig(
     level=logging.INFO,
@@ -25,28 +90,120 @@ REPO_CLONE_DIR_CLI = "cloned_repo_cli"
 REPO_CLONE_DIR_GRADIO = "cloned_repo_gradio"
 OUTPUT_DIR = Path("outputs")
 OUTPUT_FILE = OUTPUT_DIR / "summaries.json"
+OUTPUT_FORMATS = ("jsonl", "json")
+DELETIONS_FILE = OUTPUT_DIR / "deletions.json"
+SKIPPED_FILES_REPORT = OUTPUT_DIR / "skipped_files.json"
+INDEX_DIR = DEFAULT_INDEX_DIR
+ANY_LANGUAGE = "any"
+SEARCH_RESULTS = 10
+PROGRESS_INTERVAL_SECONDS = 0.5
+
+def describe_location(record) -> str:
+    """`path:start-end (name)` for a summary or search result, with whatever of it is known."""
+    location = record.get('file_path', '?')
+    if record.get('start_line') is not None:
+        location += f":{record['start_line']}-{record.get('end_line', record['start_line'])}"
+    if record.get('name'):
+        location += f" ({record['name']})"
+    return location
 
-def format_summaries_for_display(summaries: list) -> str:
+def format_summaries_for_display(summaries: list, total: int = None) -> str:
     if not summaries: return "No summaries generated."
     limit = 5
-    output = f"Found {len(summaries)} functions.\n"
+    total = len(summaries) if total is None else total
+    output = f"Found {total} functions.\n"
     output += f"Firestore: {'Yes' if is_firestore_available() else 'No'}\n---\n"
     for i, summary in enumerate(summaries[:limit]):
-         output += f"File: {summary.get('file_path', '?')}\nLang: {summary.get('language', '?')}\n"
+         output += f"File: {describe_location(summary)}\nLang: {summary.get('language', '?')}\n"
          output += f"Summary: {summary.get('summary', '?')}\n"
          output += f"Embedding: {'Yes' if 'embedding' in summary else 'No'}\n---\n"
-    if len(summaries) > limit:
-        output += f"... and {len(summaries) - limit} more."
+    if total > limit:
+        output += f"... and {total - limit} more."
     return output
 
+_job_queue = None
+_job_queue_lock = threading.Lock()
+_index_lock = threading.Lock()
+
+def get_job_queue() -> JobQueue:
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue(
+                max_concurrent=int(os.environ.get("SUMMARIZER_MAX_CONCURRENT_JOBS", DEFAULT_MAX_CONCURRENT_JOBS)),
+                max_queued=int(os.environ.get("SUMMARIZER_MAX_QUEUED_JOBS", DEFAULT_MAX_QUEUED_JOBS)),
+            )
+        return _job_queue
+
+def _run_web_job(repo_url: str, firestore_ready: bool, progress: JobProgress) -> dict:
+    """Runs one Gradio request in its own temporary workspace, embedding through the shared worker."""
+    with tempfile.TemporaryDirectory(prefix="summarizer-web-") as workspace:
+        progress.set_stage("cloning")
+        repo_dir = Path(workspace) / "repo"
+        if not clone_repo(repo_url, str(repo_dir)):
+            log.error(f"Gradio: Failed to clone {repo_url}")
+            return {"status": "❌ Failed to clone repo."}
+
+        files = discover_files(repo_dir).files
+        progress.set_stage("summarizing", files_total=len(files))
+        output_dir = Path(workspace) / "output"
+        preview = []
+        # Report paths as if cloned into REPO_CLONE_DIR_GRADIO, so document IDs stay stable across requests.
+        prefix = repo_dir.as_posix() + "/"
+
+        def rewritten(writer):
+            for record in iter_summaries(repo_dir, repo_url, files=files, chunk_size=WEB_CHUNK_SIZE,
+                                         embed=get_embedding_worker().embed, progress=progress):
+                if record["file_path"].startswith(prefix):
+                    record["file_path"] = f"{REPO_CLONE_DIR_GRADIO}/{record['file_path'][len(prefix):]}"
+                writer.write(record)
+                if len(preview) < 5:
+                    preview.append(record)
+                yield record
+
+        # Chunks are uploaded as they are embedded; a cancelled job still uploads what it finished.
+        with SummaryWriter(output_dir) as writer:
+            upload_count = run_overlapped(rewritten(writer), upload=firestore_upload if firestore_ready else None,
+                                          chunk_size=WEB_CHUNK_SIZE).uploaded
+        if not writer.records:
+            log.warning(f"Gradio: No functions found in {repo_url}")
+            return {"status": "⚠️ Repo cloned, but no functions found."}
+
+        status = f"✅ Summarized {writer.records} functions."
+        progress.set_stage("indexing")
+        try:
+            # Jobs share one index directory: merge this repository in, one job at a time.
+            with _index_lock:
+                build_index(iter_records(output_dir, with_embeddings=True), index_dir=INDEX_DIR,
+                            model_id=embedding_model_id(), merge=True)
+                load_index(INDEX_DIR, reload=True)
+        except Exception as e:
+            log.error(f"Gradio: Failed to build search index: {e}", exc_info=True)
+
+        if firestore_ready:
+            if upload_count == writer.records:
+                write_repo_manifest(repo_url, get_head_sha(str(repo_dir)), upload_count, embedding_model_id())
+            status += f" Uploaded {upload_count} to Firebase."
+            log.info(f"Gradio: Uploaded {upload_count} summaries for {repo_url}")
+        else:
+            status += " Firebase unavailable, skipping upload."
+            log.warning(f"Gradio: Skipped Firebase upload for {repo_url}")
+        return {"status": status + "\n---\n" + format_summaries_for_display(preview, total=writer.records)}
+
+_STAGE_MESSAGES = {
+    "starting": "⏳ Cloning repository...",
+    "cloning": "⏳ Cloning repository...",
+    "indexing": "⏳ Building search index...",
+}
+
 def summarize_from_url(repo_url: str):
-    """Gradio action: Clones, summarizes, uploads, yields status updates."""
+    """Gradio action: Queues a summarization job and yields live status updates until it finishes."""
     log.info(f"Gradio request for URL: {repo_url}")
     if not repo_url or not repo_url.startswith("https"):
         yield "❌ Invalid HTTPS GitHub URL."
         return
 
-    if not SUMMARIZER_LOADED:
+    if not is_model_loaded():
          yield "❌ Summarizer Model Not Loaded. Cannot proceed."
          log.error("Gradio: Summarizer model not loaded.")
          return
@@ -55,135 +212,410 @@ def summarize_from_url(repo_url: str):
     if not firestore_ready:
         log.warning("Gradio: Firebase is not available.")
 
-    yield "⏳ Cloning repository..."
-    clone_dir_path = Path(REPO_CLONE_DIR_GRADIO)
-    if not clone_repo(repo_url, str(clone_dir_path)):
-        yield "❌ Failed to clone repo."
-        log.error(f"Gradio: Failed to clone {repo_url}")
+    job_queue = get_job_queue()
+    progress = JobProgress()
+    future = job_queue.submit(functools.partial(_run_web_job, repo_url, firestore_ready), progress)
+    if future is None:
+        yield "❌ Server is busy; too many queued jobs. Please try again in a minute."
         return
+    try:
+        while True:
+            try:
+                result = future.result(timeout=PROGRESS_INTERVAL_SECONDS)
+                break
+            except FutureTimeoutError:
+                position = job_queue.position(progress)
+                if position:
+                    yield f"⏳ Queued: {position - 1} job(s) ahead of yours..."
+                elif progress.stage == "summarizing":
+                    yield progress.render() + f" (device: {get_device()})"
+                else:
+                    yield _STAGE_MESSAGES.get(progress.stage, "⏳ Working...")
+            except Exception as e:
+                log.error(f"Gradio: Job for {repo_url} failed: {e}", exc_info=True)
+                yield f"❌ Summarization failed: {e}"
+                return
+        yield result["status"]
+    finally:
+        # The session went away (or the job ended): stop the job at its next progress report.
+        progress.cancelled.set()
 
-    yield f"⏳ Summarizing code (using {summarizer_device})..."
-    summaries = summarize_repo(clone_dir_path, repo_url)
-    if not summaries:
-        yield "⚠️ Repo cloned, but no functions found."
-        log.warning(f"Gradio: No functions found in {repo_url}")
-        return
+def perform_code_search(query: str, language: str = ANY_LANGUAGE, k: int = SEARCH_RESULTS):
+    """Gradio action: Semantic search over the local index of summarized functions."""
+    log.info(f"Gradio: Code search: {query!r} (language: {language})")
+    if not query or not query.strip():
+        return "Enter a search query."
+    index = load_index(INDEX_DIR)
+    if index is None:
+        return f"🔎 No search index yet. Summarize a repository first (index directory: {INDEX_DIR})."
+    results = search(query, k=int(k), language=None if language == ANY_LANGUAGE else language, index=index)
+    if not results:
+        return f"🔎 No matches for '{query}'."
+    output = f"🔎 Top {len(results)} of {len(index)} indexed functions for '{query}':\n---\n"
+    for result in results:
+        output += f"[{result['score']:.3f}] {describe_location(result)} [{result.get('language', '?')}]\n"
+        output += f"Repo: {result.get('repo_url', '?')}\nSummary: {result.get('summary', '?')}\n---\n"
+    return output
 
-    status = f"✅ Summarized {len(summaries)} functions."
-    yield status + " Uploading to Firebase..."
+def _is_stale(record: dict, repo_url: str, plan, stale: set) -> bool:
+    if record.get("repo_url") != repo_url:
+        return False
+    return plan.full or record.get("file_path") in stale
 
-    upload_count = 0
-    if firestore_ready:
-        for summary in summaries:
-            try:
-                upload_summary_to_firebase(summary)
-                upload_count += 1
-            except Exception as e:
-                log.error(f"Gradio: Firebase upload error: {e}")
-        status += f" Uploaded {upload_count} to Firebase."
-        log.info(f"Gradio: Uploaded {upload_count} summaries for {repo_url}")
-        yield status + "\n---\n" + format_summaries_for_display(summaries)
-    else:
-        status += " Firebase unavailable, skipping upload."
-        log.warning(f"Gradio: Skipped Firebase upload for {repo_url}")
-        yield status + "\n---\n" + format_summaries_for_display(summaries)
-
-def perform_web_search(query: str):
-    """Gradio action: Placeholder for web search."""
-    log.info(f"Gradio: Web search placeholder: {query}")
-    # Placeholder - Replace with actual search implementation
-    return f"🔎 Web search (placeholder) for: '{query}'"
-
-def run_pipeline(repo_url: str, skip_existing: bool = False, save_local: bool = True):
-    """CLI action: Runs the full pipeline."""
+def save_deletions(repo_url: str, plan, commit_sha: str) -> list:
+    deletions = [{"repo_url": repo_url, "file_path": path, "commit_sha": commit_sha}
+                 for path in sorted(plan.stale_file_paths)]
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    with open(DELETIONS_FILE, "w", encoding='utf-8') as f:
+        json.dump(deletions, f, indent=2)
+    return deletions
+
+def save_incremental_output(summaries: list, repo_url: str, plan, commit_sha: str):
+    """Merges an incremental run into the local summaries.json (legacy format) and records deletions."""
+    stale = set(plan.stale_file_paths)
+    existing = []
+    if OUTPUT_FILE.exists():
+        try:
+            with open(OUTPUT_FILE, "r", encoding='utf-8') as f:
+                existing = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            log.warning(f"CLI: Could not read existing {OUTPUT_FILE} ({e}); rewriting it.")
+
+    kept = [record for record in existing if not _is_stale(record, repo_url, plan, stale)]
+    removed = len(existing) - len(kept)
+
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    with open(OUTPUT_FILE, "w", encoding='utf-8') as f:
+        json.dump(kept + summaries, f, indent=2, default=json_default)
+    deletions = save_deletions(repo_url, plan, commit_sha)
+    log.info(f"CLI: Saved {len(summaries)} new summaries to {OUTPUT_FILE} (removed {removed} stale); "
+             f"{len(deletions)} deleted files written to {DELETIONS_FILE}.")
+
+def _counted(records, counts: dict):
+    for record in records:
+        counts["functions"] += 1
+        yield record
+
+def run_pipeline(repo_url: str, skip_existing: bool = False, save_local: bool = True, incremental: bool = False,
+                 workers: int = 1, queue_depth: int = DEFAULT_QUEUE_DEPTH, ordered: bool = True,
+                 python_mode: str = DEFAULT_PYTHON_MODE, build_search_index: bool = False,
+                 output_format: str = "jsonl", ref: str = None, clone_cache: CloneCache = None,
+                 filter_blobs: bool = False, excludes: list = DEFAULT_EXCLUDES,
+                 max_file_bytes: int = DEFAULT_MAX_FILE_BYTES, skip_generated: bool = True):
+    """CLI action: Runs the full pipeline.
+
+    Summaries are streamed from the summarizer straight into the local sink and the
+    uploader, so memory stays flat regardless of repository size. The legacy "json"
+    output format still buffers everything to write a single summaries.json.
+    """
     start_time = time.time()
     log.info(f"CLI: Pipeline starting for: {repo_url}")
 
-    if not SUMMARIZER_LOADED:
-         log.error("CLI: Summarizer Model Not Loaded. Exiting.")
-         sys.exit(1)
-
     firestore_ready = is_firestore_available()
     if not firestore_ready:
         log.warning("CLI: Firebase is not available. Uploads/Checks will be skipped.")
 
     if skip_existing and firestore_ready:
         log.info("CLI: Checking for existing summaries...")
-        if get_summaries_by_repo(repo_url):
+        manifest = get_repo_manifest(repo_url)
+        if manifest is not None:
+            remote_sha = resolve_remote_sha(repo_url, ref)
+            if is_manifest_fresh(manifest, commit_sha=remote_sha, model_id=embedding_model_id()):
+                log.warning(f"CLI: Skipping. Firebase already holds {manifest.get('function_count')} functions "
+                            f"for {(manifest.get('commit_sha') or '?')[:12]} ({manifest.get('model_id')}).")
+                return
+            log.info(f"CLI: Stored summaries are stale (commit {(manifest.get('commit_sha') or '?')[:12]}, "
+                     f"model {manifest.get('model_id')}); re-summarizing.")
+        elif has_summaries(repo_url):
+            # Stored before repo manifests existed.
             log.warning("CLI: Skipping. Found existing summaries in Firebase.")
             return
 
-    log.info("CLI: Cloning repository...")
     clone_dir_path = Path(REPO_CLONE_DIR_CLI)
-    if not clone_repo(repo_url, str(clone_dir_path)):
-        log.error("CLI: Repo cloning failed. Exiting.")
+    plan = None
+    deleted = 0
+    # The model loads while the repository is cloned or updated.
+    if incremental:
+        log.info("CLI: Updating repository (incremental mode)...")
+        head_sha, model_ok = checkout_while_loading(functools.partial(
+            sync_repo, repo_url, str(clone_dir_path), ref=ref, cache=clone_cache, filter_blobs=filter_blobs))
+        checked_out = head_sha is not None
+    else:
+        log.info("CLI: Cloning repository...")
+        checked_out, model_ok = checkout_while_loading(functools.partial(
+            clone_repo, repo_url, str(clone_dir_path), ref=ref, cache=clone_cache, filter_blobs=filter_blobs))
+    if not model_ok:
+         log.error("CLI: Summarizer Model Not Loaded. Exiting.")
+         sys.exit(1)
+    if not checked_out:
+        log.error(f"CLI: Repo {'update' if incremental else 'cloning'} failed. Exiting.")
         sys.exit(1)
+    if incremental:
+        plan = plan_incremental(clone_dir_path, repo_url, head_sha)
+        if plan.up_to_date:
+            log.info(f"CLI: ✅ Index already up to date at {head_sha[:12]}. Nothing to do.")
+            return
 
-    log.info(f"CLI: Running summarization (device: {summarizer_device})...")
-    summaries = summarize_repo(clone_dir_path, repo_url)
-    if not summaries:
+    log.info(f"CLI: Running summarization (device: {get_device()})...")
+    discovery = discover_files(clone_dir_path, None if plan is None or plan.full else plan.files_to_index,
+                               excludes=excludes, max_file_bytes=max_file_bytes, skip_generated=skip_generated)
+    if save_local:
+        discovery.write(SKIPPED_FILES_REPORT)
+    files = discovery.files
+    if workers > 1:
+        stream = iter_summaries_parallel(clone_dir_path, repo_url, workers=workers,
+                                         queue_depth=queue_depth, ordered=ordered, files=files,
+                                         python_mode=python_mode)
+    else:
+        stream = iter_summaries(clone_dir_path, repo_url, files=files, python_mode=python_mode)
+
+    # Peek so an empty run leaves previous local output untouched.
+    first = next(stream, None)
+    if first is None and plan is None:
         log.warning("CLI: No functions found or summarization failed.")
         return
+    stream = iter(()) if first is None else chain([first], stream)
+
+    if plan is not None and firestore_ready:
+        # A full incremental run replaces everything stored for the repo.
+        deleted = delete_summaries(repo_url, None if plan.full else plan.stale_file_paths)
+
+    counts = {"functions": 0}
+    stream = _counted(stream, counts)
+    upload_count = 0
+    collected = None
+    writer = None
+    scratch_dir = None
+    if save_local and output_format == "json":
+        collected = list(stream)
+        stream = iter(collected)
+    elif save_local:
+        if plan is not None:
+            stale = set(plan.stale_file_paths)
+            removed = filter_records(OUTPUT_DIR, lambda record: not _is_stale(record, repo_url, plan, stale))
+            log.info(f"CLI: Removed {removed} stale summaries from {OUTPUT_DIR / METADATA_FILE}.")
+        writer = SummaryWriter(OUTPUT_DIR, append=plan is not None)
+        stream = writer.tee(stream)
+    elif build_search_index:
+        # Nothing is kept locally, but the index still needs the embeddings once the stream is done.
+        scratch_dir = tempfile.TemporaryDirectory(prefix="summaries-")
+        writer = SummaryWriter(Path(scratch_dir.name))
+        stream = writer.tee(stream)
+
+    try:
+        if firestore_ready:
+            log.info("CLI: Streaming summaries to Firebase...")
+        else:
+            log.info("CLI: Skipping Firebase upload.")
+        # Embedded chunks are uploaded while the next ones are embedded.
+        upload_count = run_overlapped(stream, upload=firestore_upload if firestore_ready else None).uploaded
+        if firestore_ready:
+            log.info(f"CLI: Finished uploading {upload_count} summaries.")
+    finally:
+        if writer is not None:
+            writer.close()
 
-    log.info(f"CLI: Summarization complete. Found {len(summaries)} functions.")
+    log.info(f"CLI: Summarization complete. Found {counts['functions']} functions.")
 
+    # Only a complete sync may advance the manifests: the next incremental run diffs from them.
+    synced = True
     if firestore_ready:
-        log.info(f"CLI: Uploading {len(summaries)} summaries to Firebase...")
-        upload_count = 0
-        for i, summary in enumerate(summaries):
-            upload_summary_to_firebase(summary)
-            upload_count +=1
-            if (i + 1) % 100 == 0:
-                 log.info(f"CLI:   Uploaded {i+1}/{len(summaries)}...")
-        log.info(f"CLI: Finished uploading {upload_count} summaries.")
-    else:
-        log.info("CLI: Skipping Firebase upload.")
+        if deleted is None:
+            synced = False
+            log.warning("CLI: Stale summaries could not be deleted; leaving the manifests unchanged.")
+        elif upload_count < counts["functions"]:
+            synced = False
+            log.warning("CLI: Some summaries failed to upload; leaving the manifests unchanged.")
+        else:
+            commit_sha = plan.head_sha if plan is not None else get_head_sha(str(clone_dir_path))
+            function_count = upload_count
+            if plan is not None and not plan.full:
+                previous = get_repo_manifest(repo_url) or {}
+                previous_count = previous.get("function_count")
+                function_count = None if previous_count is None else previous_count - deleted + upload_count
+            write_repo_manifest(repo_url, commit_sha, function_count, embedding_model_id())
 
     if save_local:
-        log.info(f"CLI: Saving summaries locally to {OUTPUT_FILE}...")
         try:
-            OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-            with open(OUTPUT_FILE, "w", encoding='utf-8') as f:
-                json.dump(summaries, f, indent=2, default=str)
-            log.info(f"CLI: Saved local backup to {OUTPUT_FILE}")
+            if collected is None:
+                log.info(f"CLI: Saved summaries to {OUTPUT_DIR / METADATA_FILE} "
+                         f"({writer.rows} embeddings in {OUTPUT_DIR / 'embeddings.f32'}).")
+                if plan is not None:
+                    save_deletions(repo_url, plan, plan.head_sha)
+            elif plan is not None:
+                save_incremental_output(collected, repo_url, plan, plan.head_sha)
+            else:
+                log.info(f"CLI: Saving summaries locally to {OUTPUT_FILE}...")
+                OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+                with open(OUTPUT_FILE, "w", encoding='utf-8') as f:
+                    json.dump(collected, f, indent=2, default=json_default)
+                log.info(f"CLI: Saved local backup to {OUTPUT_FILE}")
         except Exception as e:
             log.error(f"CLI: Failed to save local backup: {e}", exc_info=True)
 
+    if build_search_index:
+        log.info(f"CLI: Building search index in {INDEX_DIR}...")
+        try:
+            if collected is not None:
+                build_index_from_json(OUTPUT_FILE, index_dir=INDEX_DIR, model_id=embedding_model_id(), merge=True)
+            else:
+                build_index(iter_records(writer.output_dir, with_embeddings=True), index_dir=INDEX_DIR,
+                            model_id=embedding_model_id(), merge=True)
+        except Exception as e:
+            log.error(f"CLI: Failed to build search index: {e}", exc_info=True)
+    if scratch_dir is not None:
+        scratch_dir.cleanup()
+
+    if plan is not None and synced:
+        record_indexed_commit(repo_url, plan.head_sha)
+
     duration = time.time() - start_time
-    log.info(f"CLI: ✅ Pipeline completed in {duration:.2f} seconds.")
+    cache_stats = get_cache_stats()
+    log.info(f"CLI: ✅ Pipeline completed in {duration:.2f} seconds. "
+             f"Embedding cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses.")
+    log.info(f"CLI: Stage times: {stage_summary()}")
 
-if not SUMMARIZER_LOADED:
-     log.error("Summarizer model failed to load. Gradio interface may be limited or fail.")
-if not is_firestore_available():
-     log.warning("Firebase is not available. Upload/check functionality will be disabled in Gradio interface.")
+def run_batch_pipeline(repo_list: Path, batch_dir: Path = DEFAULT_BATCH_DIR,
+                       concurrent_jobs: int = DEFAULT_CONCURRENT_JOBS, workers: int = 1,
+                       queue_depth: int = DEFAULT_QUEUE_DEPTH, python_mode: str = DEFAULT_PYTHON_MODE,
+                       clone_cache: CloneCache = None, filter_blobs: bool = False,
+                       excludes: list = DEFAULT_EXCLUDES, max_file_bytes: int = DEFAULT_MAX_FILE_BYTES,
+                       skip_generated: bool = True, max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+                       build_search_index: bool = False):
+    """CLI action: Indexes every repository in a list file with one warm model; re-running resumes."""
+    start_time = time.time()
+    repos = read_repo_list(repo_list)
+    log.info(f"CLI: Batch of {len(repos)} repositories from {repo_list} (workspace: {batch_dir}).")
+    if not is_model_loaded():
+         log.error("CLI: Summarizer Model Not Loaded. Exiting.")
+         sys.exit(1)
+    if not is_firestore_available():
+        log.warning("CLI: Firebase is not available. Uploads will be skipped.")
+
+    counts = run_batch(repos, batch_dir=batch_dir, concurrent_jobs=concurrent_jobs, parse_workers=workers,
+                       queue_depth=queue_depth, python_mode=python_mode, clone_cache=clone_cache,
+                       filter_blobs=filter_blobs, excludes=excludes, max_file_bytes=max_file_bytes,
+                       skip_generated=skip_generated, max_attempts=max_attempts, path_prefix=REPO_CLONE_DIR_CLI)
+
+    if build_search_index:
+        log.info(f"CLI: Building search index in {INDEX_DIR} from all finished repositories...")
+        try:
+            build_index(iter_batch_records(batch_dir), index_dir=INDEX_DIR, model_id=embedding_model_id(), merge=True)
+        except Exception as e:
+            log.error(f"CLI: Failed to build search index: {e}", exc_info=True)
 
-with gr.Blocks(title="Code Summarizer", theme=gr.themes.Soft()) as demo:
-    gr.Markdown("# 🔍 Code Summarizer & Search")
+    duration = time.time() - start_time
+    cache_stats = get_cache_stats()
+    log.info(f"CLI: ✅ Batch completed in {duration:.2f} seconds: {counts}. "
+             f"Embedding cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses.")
+    log.info(f"CLI: Stage times: {stage_summary()}")
 
-    with gr.Tab("Repo Summarizer"):
-        repo_url_input = gr.Textbox(label="GitHub Repo URL", placeholder="https://github.com/user/repo")
-        summarize_button = gr.Button("Summarize & Upload", variant="primary")
-        status_output = gr.Textbox(label="Status / Output", lines=10, interactive=False)
-        summarize_button.click(fn=summarize_from_url, inputs=repo_url_input, outputs=status_output)
+def build_demo():
+    """Builds the Gradio Blocks UI. Gradio is imported here so the CLI never pays for it."""
+    import gradio as gr
 
-    with gr.Tab("Web Code Search (Placeholder)"):
-        search_query_input = gr.Textbox(label="Search Query", placeholder="e.g., binary search tree cpp")
-        search_button = gr.Button("Search Web", variant="secondary")
-        search_output_display = gr.Textbox(label="Web Search Results", lines=5, interactive=False)
-        search_button.click(fn=perform_web_search, inputs=search_query_input, outputs=search_output_display)
+    with gr.Blocks(title="Code Summarizer", theme=gr.themes.Soft()) as demo:
+        gr.Markdown("# 🔍 Code Summarizer & Search")
 
+        with gr.Tab("Repo Summarizer"):
+            repo_url_input = gr.Textbox(label="GitHub Repo URL", placeholder="https://github.com/user/repo")
+            summarize_button = gr.Button("Summarize & Upload", variant="primary")
+            status_output = gr.Textbox(label="Status / Output", lines=10, interactive=False)
+            summarize_button.click(fn=summarize_from_url, inputs=repo_url_input, outputs=status_output)
+
+        with gr.Tab("Code Search"):
+            search_query_input = gr.Textbox(label="Search Query", placeholder="e.g., binary search tree cpp")
+            search_language_input = gr.Dropdown(
+                choices=[ANY_LANGUAGE] + sorted(set(SUPPORTED_EXTENSIONS.values())),
+                value=ANY_LANGUAGE,
+                label="Language",
+            )
+            search_button = gr.Button("Search", variant="secondary")
+            search_output_display = gr.Textbox(label="Search Results", lines=12, interactive=False)
+            search_button.click(fn=perform_code_search, inputs=[search_query_input, search_language_input],
+                                outputs=search_output_display)
+    # Generator handlers need Gradio's queue; size it so every session our JobQueue admits can stream status.
+    sessions = get_job_queue().max_concurrent + get_job_queue().max_queued
+    try:
+        demo.queue(default_concurrency_limit=sessions)
+    except TypeError:
+        # Gradio 3.x
+        demo.queue(concurrency_count=sessions)
+    return demo
+
+def _export_run_metrics(args):
+    """Writes the metrics and profile requested on the command line; runs at exit."""
+    extra = {"argv": sys.argv[1:]}
+    if args.metrics_json:
+        export_metrics("json", Path(args.metrics_json), extra)
+    if args.metrics_prometheus:
+        export_metrics("prometheus", Path(args.metrics_prometheus), extra)
+    dump_profile()
+
+def launch_ui():
+    """Warms up the model and Firebase, then serves the Gradio UI."""
+    configure_backend(
+        os.environ.get("SUMMARIZER_BACKEND", DEFAULT_BACKEND),
+        intra_op_threads=int(os.environ.get("SUMMARIZER_INTRA_OP_THREADS", 0)) or None,
+        inter_op_threads=int(os.environ.get("SUMMARIZER_INTER_OP_THREADS", 0)) or None,
+    )
+    metrics_port = int(os.environ.get("SUMMARIZER_METRICS_PORT", 0))
+    if metrics_port:
+        serve_prometheus(metrics_port)
+    if not warmup():
+         log.error("Summarizer model failed to load. Gradio interface may be limited or fail.")
+    if not is_firestore_available():
+         log.warning("Firebase is not available. Upload/check functionality will be disabled in Gradio interface.")
+    build_demo().launch()
+
+_demo = None
+
+def __getattr__(name: str):
+    # Keeps `app.demo` working for hosts that import it, without building the UI on import.
+    global _demo
+    if name == "demo":
+        if _demo is None:
+            _demo = build_demo()
+        return _demo
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 if __name__ == "__main__":
-    if len(sys.argv) > 1 and "--url" in sys.argv:
+    if len(sys.argv) > 1 and any(flag in sys.argv for flag in ("--url", "--batch", "--check_backends", "--benchmark")):
         parser = argparse.ArgumentParser(
             description="Code Summarizer CLI.",
             formatter_class=argparse.ArgumentDefaultsHelpFormatter
         )
         parser.add_argument(
             "--url",
-            required=True,
             help="HTTPS URL of the public GitHub repository."
         )
+        parser.add_argument(
+            "--batch",
+            default=None,
+            help="File of repositories to index in one process, one 'URL [ref]' per line (# comments allowed)."
+        )
+        parser.add_argument(
+            "--batch_dir",
+            default=str(DEFAULT_BATCH_DIR),
+            help="Per-repository workspaces and the resumable status ledger for --batch."
+        )
+        parser.add_argument(
+            "--concurrent_jobs",
+            type=int,
+            default=DEFAULT_CONCURRENT_JOBS,
+            help="With --batch, repositories cloned and parsed at the same time."
+        )
+        parser.add_argument(
+            "--max_attempts",
+            type=int,
+            default=DEFAULT_MAX_ATTEMPTS,
+            help="With --batch, how often a failing repository is retried across runs."
+        )
+        parser.add_argument(
+            "--ref",
+            default=None,
+            help="Branch, tag or full commit SHA to check out (default: the remote's HEAD)."
+        )
         parser.add_argument(
             "--skip_existing",
             action="store_true",
@@ -192,21 +624,324 @@ if __name__ == "__main__":
         parser.add_argument(
             "--no_save",
             action="store_true",
-            help="Disable saving local summaries.json."
+            help="Disable saving local summaries."
+        )
+        parser.add_argument(
+            "--output_format",
+            choices=OUTPUT_FORMATS,
+            default="jsonl",
+            help="'jsonl' streams outputs/summaries.jsonl plus a row-indexed embeddings.f32; "
+                 "'json' buffers everything into the legacy outputs/summaries.json."
+        )
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Reuse the previous clone and only re-index files changed since the last indexed commit."
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Parser processes feeding the embedder. 1 keeps the serial path."
+        )
+        parser.add_argument(
+            "--queue_depth",
+            type=int,
+            default=DEFAULT_QUEUE_DEPTH,
+            help="Maximum parsed files buffered ahead of the embedder."
+        )
+        parser.add_argument(
+            "--unordered",
+            action="store_true",
+            help="With --workers > 1, emit results in parse completion order instead of file order."
+        )
+        parser.add_argument(
+            "--python_mode",
+            choices=PYTHON_MODES,
+            default=DEFAULT_PYTHON_MODE,
+            help="'outermost' skips nested Python functions already contained in their parent."
+        )
+        parser.add_argument(
+            "--exclude",
+            action="append",
+            default=[],
+            help="Extra glob to skip (repeatable): 'dir/' matches a directory anywhere, "
+                 "'*.ext' a file name, 'a/b/*' a repo-relative path."
+        )
+        parser.add_argument(
+            "--no_default_excludes",
+            action="store_true",
+            help="Do not skip the built-in excludes (node_modules/, vendor/, dist/, *.min.js, ...)."
+        )
+        parser.add_argument(
+            "--max_file_kb",
+            type=int,
+            default=DEFAULT_MAX_FILE_BYTES // 1024,
+            help="Skip source files larger than this."
+        )
+        parser.add_argument(
+            "--include_generated",
+            action="store_true",
+            help="Summarize files that look minified or carry a generated-code header."
+        )
+        parser.add_argument(
+            "--build_index",
+            action="store_true",
+            help="Build the local semantic search index from the summaries after the run."
+        )
+        parser.add_argument(
+            "--cache_path",
+            default=str(DEFAULT_CACHE_PATH),
+            help="Path of the persistent embedding cache (SQLite file)."
+        )
+        parser.add_argument(
+            "--cache_max_mb",
+            type=int,
+            default=DEFAULT_MAX_BYTES // (1024 * 1024),
+            help="Size cap of the embedding cache; least recently used entries are evicted."
+        )
+        parser.add_argument(
+            "--cache_dtype",
+            choices=["float32", "float16"],
+            default="float32",
+            help="Storage precision of cached embedding vectors."
+        )
+        parser.add_argument(
+            "--no_cache",
+            action="store_true",
+            help="Disable the persistent embedding cache."
+        )
+        parser.add_argument(
+            "--backend",
+            choices=BACKENDS,
+            default=DEFAULT_BACKEND,
+            help="Embedding inference backend: fp32 PyTorch, dynamic int8 PyTorch, or ONNX Runtime (CPU)."
+        )
+        parser.add_argument(
+            "--intra_op_threads",
+            type=int,
+            default=None,
+            help="Threads used inside one operator (matmul etc.)."
+        )
+        parser.add_argument(
+            "--inter_op_threads",
+            type=int,
+            default=None,
+            help="Threads used to run independent operators concurrently."
+        )
+        parser.add_argument(
+            "--check_backends",
+            action="store_true",
+            help="Compare every backend against fp32 on a sample set (cosine similarity and speed), then exit."
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=DEFAULT_TOLERANCE,
+            help="Minimum mean cosine similarity to fp32 for --check_backends to accept a backend."
+        )
+        parser.add_argument(
+            "--benchmark",
+            action="store_true",
+            help="Benchmark every pipeline stage on a generated synthetic repository, write a JSON report, then exit."
+        )
+        parser.add_argument(
+            "--bench_files",
+            type=int,
+            default=DEFAULT_BENCH_FILES,
+            help="Number of regular source files in the synthetic repository."
+        )
+        parser.add_argument(
+            "--bench_languages",
+            default=None,
+            help="Language mix as language=weight pairs, e.g. 'python=3,go=1' (default: a mix of all languages)."
+        )
+        parser.add_argument(
+            "--bench_seed",
+            type=int,
+            default=0,
+            help="Random seed of the synthetic repository (and the tiny model)."
+        )
+        parser.add_argument(
+            "--bench_no_pathological",
+            action="store_true",
+            help="Leave out the minified JS bundle and the huge C++ file."
+        )
+        parser.add_argument(
+            "--bench_offline",
+            action="store_true",
+            help="Use a tiny randomly initialized Roberta instead of downloading CodeBERT."
+        )
+        parser.add_argument(
+            "--bench_report",
+            default=str(DEFAULT_BENCH_REPORT),
+            help="Where to write the JSON benchmark report."
+        )
+        parser.add_argument(
+            "--bench_baseline",
+            default=None,
+            help="Earlier benchmark report to compare throughput and p95 latency against."
+        )
+        parser.add_argument(
+            "--metrics_json",
+            default=None,
+            help="Write a JSON run report (counters, stage timers, slowest files) to this path on exit."
+        )
+        parser.add_argument(
+            "--metrics_prometheus",
+            default=None,
+            help="Write metrics in Prometheus text format to this path on exit (e.g. for a textfile collector)."
+        )
+        parser.add_argument(
+            "--metrics_port",
+            type=int,
+            default=0,
+            help="Serve live Prometheus metrics on http://0.0.0.0:PORT/metrics while running (0: off)."
+        )
+        parser.add_argument(
+            "--slow_file_seconds",
+            type=float,
+            default=DEFAULT_SLOW_FILE_SECONDS,
+            help="Log files whose parsing takes longer than this."
+        )
+        parser.add_argument(
+            "--profile_stage",
+            choices=PROFILE_STAGES,
+            default=None,
+            help="Profile one stage with cProfile (main thread only) and write a .prof file."
+        )
+        parser.add_argument(
+            "--profile_dir",
+            default=str(DEFAULT_PROFILE_DIR),
+            help="Directory for --profile_stage output."
+        )
+        parser.add_argument(
+            "--clone_cache_dir",
+            default=str(DEFAULT_CLONE_CACHE_DIR),
+            help="Directory of cached shallow clones, reused across runs."
+        )
+        parser.add_argument(
+            "--clone_cache_max_mb",
+            type=int,
+            default=DEFAULT_CLONE_CACHE_BYTES // (1024 * 1024),
+            help="Disk budget of the clone cache; least recently used clones are deleted."
+        )
+        parser.add_argument(
+            "--no_clone_cache",
+            action="store_true",
+            help="Clone into the working directory instead of the clone cache."
+        )
+        parser.add_argument(
+            "--filter_blobs",
+            action="store_true",
+            help="Partial clone: only download and check out files with a supported extension."
         )
 
         try:
             args = parser.parse_args()
             log.info("Running in CLI mode.")
+            set_slow_file_threshold(args.slow_file_seconds)
+            if args.profile_stage:
+                set_profile_stage(args.profile_stage, Path(args.profile_dir))
+            if args.metrics_port:
+                serve_prometheus(args.metrics_port)
+            atexit.register(_export_run_metrics, args)
+            if args.check_backends:
+                rows = check_backend_accuracy(tolerance=args.tolerance, intra_op_threads=args.intra_op_threads,
+                                              inter_op_threads=args.inter_op_threads)
+                for row in rows:
+                    if "error" in row:
+                        log.info(f"Backend {row['backend']:<10} unavailable: {row['error']}")
+                    else:
+                        log.info(f"Backend {row['backend']:<10} {row['seconds_per_sample'] * 1000:8.2f} ms/sample, "
+                                 f"cosine min {row['min_cosine']:.5f} mean {row['mean_cosine']:.5f} "
+                                 f"({'OK' if row['within_tolerance'] else 'below tolerance'})")
+                accepted = [row for row in rows if row.get("within_tolerance")]
+                if accepted:
+                    best = min(accepted, key=lambda row: row["seconds_per_sample"])
+                    log.info(f"Fastest backend within tolerance {args.tolerance}: {best['backend']}")
+                sys.exit(0)
+            if not args.url and not args.batch and not args.benchmark:
+                parser.error("--url or --batch is required.")
+            configure_backend(args.backend, intra_op_threads=args.intra_op_threads,
+                              inter_op_threads=args.inter_op_threads)
+            if args.benchmark:
+                mix = None
+                if args.bench_languages:
+                    pairs = (item.partition("=") for item in args.bench_languages.split(",") if item.strip())
+                    mix = {name.strip(): float(weight or 1) for name, _, weight in pairs}
+                report = run_synthetic_benchmark(
+                    files=args.bench_files,
+                    language_mix=mix,
+                    seed=args.bench_seed,
+                    pathological=not args.bench_no_pathological,
+                    offline=args.bench_offline,
+                    report_path=Path(args.bench_report),
+                    baseline_path=Path(args.bench_baseline) if args.bench_baseline else None,
+                )
+                for name, stage in report["stages"].items():
+                    p50, p95 = (f"{stage[key]:8.2f} ms" if stage[key] is not None else f"{'-':>11}"
+                                for key in ("p50_ms", "p95_ms"))
+                    log.info(f"Benchmark {name:<12} {stage['items']:>7} {stage['unit']:<9} "
+                             f"{stage['per_sec'] or 0:>10.1f}/s  p50 {p50}  p95 {p95}  "
+                             f"peak RSS {stage['peak_rss_mb']} MB")
+                for name, row in report.get("comparison", {}).items():
+                    log.info(f"Benchmark {name:<12} vs baseline: throughput x{row['per_sec_ratio']}, "
+                             f"p95 x{row['p95_ratio']}")
+                sys.exit(0)
+            if not args.no_cache:
+                set_embedding_cache(EmbeddingCache(
+                    Path(args.cache_path),
+                    max_bytes=args.cache_max_mb * 1024 * 1024,
+                    dtype=args.cache_dtype,
+                ))
+            clone_cache = None
+            if not args.no_clone_cache:
+                clone_cache = CloneCache(
+                    Path(args.clone_cache_dir),
+                    max_bytes=args.clone_cache_max_mb * 1024 * 1024,
+                    filter_blobs=args.filter_blobs,
+                )
+            excludes = ([] if args.no_default_excludes else list(DEFAULT_EXCLUDES)) + args.exclude
+            if args.batch:
+                run_batch_pipeline(
+                    repo_list=Path(args.batch),
+                    batch_dir=Path(args.batch_dir),
+                    concurrent_jobs=args.concurrent_jobs,
+                    workers=args.workers,
+                    queue_depth=args.queue_depth,
+                    python_mode=args.python_mode,
+                    clone_cache=clone_cache,
+                    filter_blobs=args.filter_blobs,
+                    excludes=excludes,
+                    max_file_bytes=args.max_file_kb * 1024,
+                    skip_generated=not args.include_generated,
+                    max_attempts=args.max_attempts,
+                    build_search_index=args.build_index
+                )
+                sys.exit(0)
             run_pipeline(
                 repo_url=args.url,
                 skip_existing=args.skip_existing,
-                save_local=not args.no_save
+                save_local=not args.no_save,
+                incremental=args.incremental,
+                workers=args.workers,
+                queue_depth=args.queue_depth,
+                ordered=not args.unordered,
+                python_mode=args.python_mode,
+                build_search_index=args.build_index,
+                output_format=args.output_format,
+                ref=args.ref,
+                clone_cache=clone_cache,
+                filter_blobs=args.filter_blobs,
+                excludes=excludes,
+                max_file_bytes=args.max_file_kb * 1024,
+                skip_generated=not args.include_generated
             )
         except SystemExit as e:
             if e.code != 0:
-                log.error(f"Argument parsing error (Exit Code: {e.code}). Ensure --url is provided for CLI mode.")
+                log.error(f"Argument parsing error (Exit Code: {e.code}). Ensure --url or --batch is provided for CLI mode.")
             sys.exit(e.code)
     else:
         log.info("Launching Gradio UI...")
-        demo.launch()
+        launch_ui()
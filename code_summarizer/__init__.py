@@ -4,25 +4,94 @@ import logging
 log = logging.getLogger(__name__)
 log.addHandler(logging.NullHandler()) 
 
-from .repo_downloader import clone_repo
-from .language_parsers import extract_code_snippets, get_language_by_extension, SUPPORTED_EXTENSIONS
-from .summarizer import summarize_repo, summarize_file, get_embedding, generate_summary
-from .firebase_db import upload_summary_to_firebase, get_summaries_by_repo, is_firestore_available
+from .repo_downloader import clone_repo, sync_repo, get_head_sha, resolve_remote_sha
+from .language_parsers import extract_code_snippets, extract_code_spans, get_language_by_extension, SnippetSpan, SnippetRecord, SUPPORTED_EXTENSIONS
+from .summarizer import summarize_repo, iter_summaries, summarize_file, get_embedding, get_embeddings, embed_matrix, generate_summary, load_model, warmup, configure_backend
+from .backends import BACKENDS, check_backend_accuracy
+from .discovery import discover_files, DiscoveryReport
+from .embedding_cache import EmbeddingCache
+from .clone_cache import CloneCache
+from .firebase_db import upload_summary_to_firebase, upload_summaries, make_document_id, get_summaries_by_repo, iter_summaries_by_repo, has_summaries, get_repo_manifest, write_repo_manifest, is_manifest_fresh, delete_summaries, is_firestore_available, get_firestore_client
+from .pipeline import summarize_repo_parallel, iter_summaries_parallel
+from .records import SummaryRecord
+from .sinks import SummaryWriter, iter_records
+from .search_index import VectorIndex, build_index, load_index, search
+from .batch import run_batch, read_repo_list, StatusLedger
+from .serving import EmbeddingWorker, JobQueue, JobProgress
+from .orchestrator import run_overlapped, checkout_while_loading, OverlapResult
+from .metrics import stage, stage_summary, to_prometheus, export_metrics, serve_prometheus
+from .benchmark import generate_synthetic_repo, run_benchmark, run_synthetic_benchmark
+from .incremental import plan_incremental, record_indexed_commit
 
 VERSION = "0.1.0"
 
 __all__ = [
     "clone_repo",
+    "sync_repo",
+    "get_head_sha",
+    "resolve_remote_sha",
     "extract_code_snippets",
+    "extract_code_spans",
+    "SnippetSpan",
+    "SnippetRecord",
     "get_language_by_extension",
     "SUPPORTED_EXTENSIONS",
     "summarize_repo",
+    "iter_summaries",
+    "summarize_repo_parallel",
+    "iter_summaries_parallel",
+    "SummaryRecord",
+    "SummaryWriter",
+    "iter_records",
     "summarize_file",
     "get_embedding",
+    "get_embeddings",
+    "embed_matrix",
     "generate_summary",
+    "load_model",
+    "warmup",
+    "configure_backend",
+    "BACKENDS",
+    "check_backend_accuracy",
+    "discover_files",
+    "DiscoveryReport",
+    "EmbeddingCache",
+    "CloneCache",
     "upload_summary_to_firebase",
+    "upload_summaries",
+    "make_document_id",
     "get_summaries_by_repo",
+    "iter_summaries_by_repo",
+    "has_summaries",
+    "get_repo_manifest",
+    "write_repo_manifest",
+    "is_manifest_fresh",
+    "delete_summaries",
+    "VectorIndex",
+    "build_index",
+    "load_index",
+    "search",
+    "run_batch",
+    "read_repo_list",
+    "StatusLedger",
+    "EmbeddingWorker",
+    "JobQueue",
+    "JobProgress",
+    "run_overlapped",
+    "checkout_while_loading",
+    "OverlapResult",
+    "stage",
+    "stage_summary",
+    "to_prometheus",
+    "export_metrics",
+    "serve_prometheus",
+    "generate_synthetic_repo",
+    "run_benchmark",
+    "run_synthetic_benchmark",
+    "plan_incremental",
+    "record_indexed_commit",
     "is_firestore_available",
+    "get_firestore_client",
     "VERSION"
 ]
 
@@ -0,0 +1,191 @@
+import logging
+import re
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+# "torch": the fp32 PyTorch model (CUDA if available). "torch-int8": dynamic int8
+# quantization of the Linear layers (CPU only). "onnx": the fp32 model exported once to
+# ONNX and run with ONNX Runtime's CPU provider (needs the optional onnxruntime package).
+BACKENDS = ("torch", "torch-int8", "onnx")
+DEFAULT_BACKEND = "torch"
+DEFAULT_ONNX_DIR = Path(".cache") / "onnx"
+ONNX_OPSET = 17
+# Minimum mean cosine similarity to the fp32 reference for a backend to count as accurate.
+DEFAULT_TOLERANCE = 0.99
+
+class EmbeddingBackend:
+    """Runs the encoder on padded token batches and mean-pools over real tokens."""
+    name = "base"
+    device = "cpu"
+
+    def embed(self, input_ids: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        """(batch, width) int64 inputs -> (batch, hidden) float32 embeddings."""
+        raise NotImplementedError
+
+def configure_threads(intra_op_threads: Optional[int] = None, inter_op_threads: Optional[int] = None):
+    """Applies PyTorch thread settings; None leaves a setting at its default."""
+    import torch
+
+    if intra_op_threads:
+        torch.set_num_threads(intra_op_threads)
+    if inter_op_threads:
+        try:
+            torch.set_num_interop_threads(inter_op_threads)
+        except RuntimeError as e:
+            # Only allowed before PyTorch starts its inter-op pool.
+            log.warning(f"Could not set inter-op threads to {inter_op_threads}: {e}")
+
+class TorchBackend(EmbeddingBackend):
+    def __init__(self, model_id: str, quantize: bool = False):
+        import torch
+        from transformers import RobertaModel
+
+        self.name = "torch-int8" if quantize else "torch"
+        use_cuda = torch.cuda.is_available() and not quantize
+        self._device = torch.device("cuda" if use_cuda else "cpu")
+        self.device = str(self._device)
+        model = RobertaModel.from_pretrained(model_id)
+        model.eval()
+        if quantize:
+            quantize_dynamic = getattr(getattr(torch, "ao", torch), "quantization", torch.quantization).quantize_dynamic
+            model = quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model = model.to(self._device)
+
+    def embed(self, input_ids: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        import torch
+
+        ids = torch.from_numpy(input_ids).to(self._device)
+        mask = torch.from_numpy(attention_mask).to(self._device)
+        with torch.no_grad():
+            hidden = self.model(input_ids=ids, attention_mask=mask).last_hidden_state
+            # Mean over real tokens only, so padding does not change a snippet's vector.
+            weights = mask.unsqueeze(-1).to(hidden.dtype)
+            pooled = (hidden * weights).sum(dim=1) / weights.sum(dim=1).clamp(min=1)
+        return pooled.float().cpu().numpy()
+
+def _onnx_path(model_id: str, onnx_dir: Path) -> Path:
+    return Path(onnx_dir) / re.sub(r"[^A-Za-z0-9._-]+", "--", model_id.strip("/")) / "model.onnx"
+
+def export_onnx(model_id: str, onnx_dir: Path = DEFAULT_ONNX_DIR) -> Path:
+    """Exports the fp32 encoder to ONNX (dynamic batch and sequence axes) unless already exported."""
+    path = _onnx_path(model_id, onnx_dir)
+    if path.exists():
+        return path
+    import torch
+    from transformers import RobertaModel
+
+    log.info(f"Exporting {model_id} to ONNX at {path}...")
+    model = RobertaModel.from_pretrained(model_id)
+    model.eval()
+    model.config.return_dict = False
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".onnx.tmp")
+    sample = torch.ones((1, 8), dtype=torch.long)
+    export_kwargs = dict(
+        input_names=["input_ids", "attention_mask"],
+        output_names=["last_hidden_state"],
+        dynamic_axes={"input_ids": {0: "batch", 1: "sequence"},
+                      "attention_mask": {0: "batch", 1: "sequence"},
+                      "last_hidden_state": {0: "batch", 1: "sequence"}},
+        opset_version=ONNX_OPSET,
+    )
+    with torch.no_grad():
+        try:
+            torch.onnx.export(model, (sample, sample), str(tmp_path), dynamo=False, **export_kwargs)
+        except TypeError:
+            # Older PyTorch without the `dynamo` switch.
+            torch.onnx.export(model, (sample, sample), str(tmp_path), **export_kwargs)
+    tmp_path.replace(path)
+    return path
+
+class OnnxBackend(EmbeddingBackend):
+    name = "onnx"
+
+    def __init__(self, model_id: str, intra_op_threads: Optional[int] = None,
+                 inter_op_threads: Optional[int] = None, onnx_dir: Path = DEFAULT_ONNX_DIR):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError("The 'onnx' backend needs onnxruntime (pip install onnxruntime onnx).") from e
+        path = export_onnx(model_id, onnx_dir)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        if inter_op_threads:
+            options.inter_op_num_threads = inter_op_threads
+        self.session = ort.InferenceSession(str(path), options, providers=["CPUExecutionProvider"])
+
+    def embed(self, input_ids: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        hidden = self.session.run(["last_hidden_state"],
+                                  {"input_ids": input_ids, "attention_mask": attention_mask})[0]
+        weights = attention_mask[..., None].astype(np.float32)
+        return (hidden * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1.0)
+
+def load_backend(name: str, model_id: str, intra_op_threads: Optional[int] = None,
+                 inter_op_threads: Optional[int] = None) -> EmbeddingBackend:
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend '{name}'. Expected one of {list(BACKENDS)}.")
+    configure_threads(intra_op_threads, inter_op_threads)
+    if name == "onnx":
+        return OnnxBackend(model_id, intra_op_threads, inter_op_threads)
+    return TorchBackend(model_id, quantize=(name == "torch-int8"))
+
+SAMPLE_SNIPPETS = [
+    "def add(a, b):\n    return a + b",
+    "def read_config(path):\n    with open(path) as f:\n        return json.load(f)",
+    "async def fetch(session, url):\n    async with session.get(url) as resp:\n        return await resp.text()",
+    "function debounce(fn, ms) {\n  let t;\n  return (...args) => { clearTimeout(t); t = setTimeout(() => fn(...args), ms); };\n}",
+    "public int binarySearch(int[] a, int key) {\n    int lo = 0, hi = a.length - 1;\n    while (lo <= hi) {\n"
+    "        int mid = (lo + hi) >>> 1;\n        if (a[mid] < key) lo = mid + 1; else if (a[mid] > key) hi = mid - 1; else return mid;\n"
+    "    }\n    return -(lo + 1);\n}",
+    "func (s *Server) Close() error {\n\ts.mu.Lock()\n\tdefer s.mu.Unlock()\n\treturn s.listener.Close()\n}",
+    "static void swap(int *a, int *b) {\n    int t = *a;\n    *a = *b;\n    *b = t;\n}",
+    "public async Task<User> GetUserAsync(int id)\n{\n    return await _db.Users.FindAsync(id);\n}",
+]
+
+def check_backend_accuracy(names=BACKENDS, snippets: Optional[List[str]] = None,
+                           tolerance: float = DEFAULT_TOLERANCE, batch_size: int = 8,
+                           intra_op_threads: Optional[int] = None,
+                           inter_op_threads: Optional[int] = None) -> List[Dict]:
+    """Embeds a sample set with each backend and compares it to the fp32 "torch" reference.
+
+    Returns one row per backend with min/mean cosine similarity, seconds per sample and
+    whether the mean cosine meets `tolerance`. Backends that fail to load are reported
+    with their error.
+    """
+    from . import summarizer
+
+    snippets = snippets or SAMPLE_SNIPPETS
+    rows = []
+    reference = None
+    for name in ["torch"] + [n for n in names if n != "torch"]:
+        row = {"backend": name}
+        try:
+            backend = load_backend(name, summarizer.MODEL_ID, intra_op_threads, inter_op_threads)
+            summarizer.embed_with_backend(backend, snippets[:1], batch_size)  # warm-up
+            start = time.perf_counter()
+            vectors = summarizer.embed_with_backend(backend, snippets, batch_size)
+            row["seconds_per_sample"] = (time.perf_counter() - start) / len(snippets)
+        except Exception as e:
+            log.warning(f"Backend '{name}' failed during the accuracy check: {e}")
+            row["error"] = str(e)
+            rows.append(row)
+            if reference is None:
+                # Nothing to compare against without the fp32 reference.
+                break
+            continue
+        if reference is None:
+            reference = vectors
+        cosines = (np.sum(vectors * reference, axis=1)
+                   / np.maximum(np.linalg.norm(vectors, axis=1) * np.linalg.norm(reference, axis=1), 1e-12))
+        row.update(min_cosine=float(cosines.min()), mean_cosine=float(cosines.mean()),
+                   within_tolerance=bool(cosines.mean() >= tolerance))
+        if name in names:
+            rows.append(row)
+    return rows
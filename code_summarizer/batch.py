@@ -0,0 +1,324 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from itertools import chain
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .clone_cache import CloneCache
+from .discovery import DEFAULT_EXCLUDES, DEFAULT_MAX_FILE_BYTES, discover_files
+from .firebase_db import is_firestore_available, upload_summaries, write_repo_manifest
+from .language_parsers import DEFAULT_PYTHON_MODE, SnippetRecord
+from .pipeline import DEFAULT_QUEUE_DEPTH, DONE, ParseFailure, produce_parse_results
+from .repo_downloader import get_head_sha, link_checkout, shallow_checkout
+from .sinks import SummaryWriter, iter_records
+from .summarizer import DEFAULT_BATCH_SIZE, EMBED_CHUNK_SIZE, build_records, embedding_model_id, load_model
+
+log = logging.getLogger(__name__)
+
+DEFAULT_BATCH_DIR = Path("outputs") / "batch"
+DEFAULT_CONCURRENT_JOBS = 4
+DEFAULT_MAX_ATTEMPTS = 2
+LEDGER_FILE = "ledger.jsonl"
+SKIPPED_FILES_REPORT = "skipped_files.json"
+# Stored file paths are rewritten from the job workspace to this prefix, the CLI's clone
+# directory, so a repository indexed by batch or by the CLI gets the same document IDs.
+DEFAULT_PATH_PREFIX = "cloned_repo_cli"
+# "cloning" and "parsing" are in-progress states; a crash leaves them behind and the
+# next run simply starts those repositories again.
+JOB_STATUSES = ("pending", "cloning", "parsing", "done", "failed")
+
+def read_repo_list(path: Path) -> List[Tuple[str, Optional[str]]]:
+    """Parses a repo list file: one "URL [ref]" per line; blank lines and # comments are ignored."""
+    repos, seen = [], set()
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            fields = line.split("#", 1)[0].split()
+            if not fields or fields[0] in seen:
+                continue
+            seen.add(fields[0])
+            repos.append((fields[0], fields[1] if len(fields) > 1 else None))
+    return repos
+
+class StatusLedger:
+    """Append-only JSONL log of per-repository job status; the last line per URL wins.
+
+    Appending keeps every update O(1) and crash-safe: a torn final line is ignored on load.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._state: Dict[str, Dict] = {}
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self._state.setdefault(entry["repo_url"], {}).update(entry)
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def get(self, repo_url: str) -> Dict:
+        with self._lock:
+            return dict(self._state.get(repo_url, {}))
+
+    def update(self, repo_url: str, status: str, **fields):
+        entry = {"repo_url": repo_url, "status": status, "updated_at": time.time(), **fields}
+        with self._lock:
+            self._state.setdefault(repo_url, {}).update(entry)
+            self._file.write(json.dumps(entry, default=str) + "\n")
+            self._file.flush()
+
+    def statuses(self) -> Dict[str, str]:
+        with self._lock:
+            return {url: entry.get("status", "pending") for url, entry in self._state.items()}
+
+    def counts(self, repo_urls: Optional[Sequence[str]] = None) -> Dict[str, int]:
+        with self._lock:
+            urls = self._state.keys() if repo_urls is None else repo_urls
+            counts: Dict[str, int] = {}
+            for url in urls:
+                status = self._state.get(url, {}).get("status", "pending")
+                counts[status] = counts.get(status, 0) + 1
+            return counts
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+@dataclass
+class BatchJob:
+    repo_url: str
+    ref: Optional[str]
+    workspace: Path
+
+    @property
+    def repo_dir(self) -> Path:
+        return self.workspace / "repo"
+
+    @property
+    def output_dir(self) -> Path:
+        return self.workspace / "output"
+
+    def stored_path(self, file_path: str, path_prefix: str) -> str:
+        """file_path as stored in records: relative to the checkout, under path_prefix."""
+        prefix = self.repo_dir.as_posix() + "/"
+        return f"{path_prefix}/{file_path[len(prefix):]}" if file_path.startswith(prefix) else file_path
+
+@dataclass
+class _JobState:
+    job: BatchJob
+    started_at: float
+    commit_sha: Optional[str] = None
+    writer: Optional[SummaryWriter] = None
+    pending: List[SnippetRecord] = field(default_factory=list)
+    files: int = 0
+    failed_files: int = 0
+
+class _JobFailed:
+    def __init__(self, error: str):
+        self.error = error
+
+class _JobStarted:
+    def __init__(self, commit_sha: str):
+        self.commit_sha = commit_sha
+
+class _TaggedQueue:
+    """Lets the single-repo produce_parse_results feed the shared queue, tagging items with their job."""
+
+    def __init__(self, out_queue: "queue.Queue", job: BatchJob):
+        self._queue = out_queue
+        self._job = job
+
+    def put(self, item):
+        self._queue.put((self._job, item))
+
+def _prepare_and_parse(job: BatchJob, attempt: int, ledger: StatusLedger, executor: ProcessPoolExecutor,
+                       out_queue: "queue.Queue", queue_depth: int, python_mode: str, stop: threading.Event,
+                       clone_cache: Optional[CloneCache], filter_blobs: bool, discovery_options: Dict):
+    """Job thread: checks out one repository, discovers its files and streams parse results to the embedder."""
+    tagged = _TaggedQueue(out_queue, job)
+    if stop.is_set():
+        tagged.put(_JobFailed("cancelled"))
+        return
+    try:
+        ledger.update(job.repo_url, "cloning", ref=job.ref, attempts=attempt, workspace=str(job.workspace))
+        job.workspace.mkdir(parents=True, exist_ok=True)
+        # Holding the cached clone keeps it from being evicted or re-checked-out while it is parsed.
+        with (clone_cache.use(job.repo_url, job.ref) if clone_cache is not None else nullcontext()) as cached:
+            if clone_cache is not None:
+                linked = cached is not None and link_checkout(cached, str(job.repo_dir))
+                sha = get_head_sha(str(cached)) if linked else None
+            else:
+                sha = shallow_checkout(job.repo_url, str(job.repo_dir), ref=job.ref, filter_blobs=filter_blobs)
+            if sha is None:
+                tagged.put(_JobFailed("checkout failed"))
+                return
+            ledger.update(job.repo_url, "parsing", commit_sha=sha)
+            discovery = discover_files(job.repo_dir, **discovery_options)
+            discovery.write(job.output_dir / SKIPPED_FILES_REPORT)
+            tagged.put(_JobStarted(sha))
+            produce_parse_results(discovery.files, executor, tagged, queue_depth, True, python_mode, stop)
+    except Exception as e:
+        log.error(f"Batch job for {job.repo_url} failed: {e}", exc_info=True)
+        tagged.put(_JobFailed(str(e)))
+
+def _finalize(state: _JobState, ledger: StatusLedger, upload: bool):
+    """Closes a finished job's output, uploads it and marks it done (runs off the embedder thread).
+
+    A job whose upload fell short is marked failed instead, so the next run retries it.
+    """
+    job = state.job
+    try:
+        if state.writer is None:
+            state.writer = SummaryWriter(job.output_dir)
+        state.writer.close()
+        uploaded = 0
+        if upload and is_firestore_available():
+            uploaded = upload_summaries(iter_records(job.output_dir, with_embeddings=True))
+            if uploaded < state.writer.records:
+                ledger.update(job.repo_url, "failed", commit_sha=state.commit_sha, functions=state.writer.records,
+                              uploaded=uploaded, error=f"uploaded {uploaded} of {state.writer.records} summaries")
+                log.error(f"Batch: ❌ {job.repo_url}: uploaded {uploaded} of {state.writer.records} summaries.")
+                return
+            write_repo_manifest(job.repo_url, state.commit_sha, uploaded, embedding_model_id())
+        ledger.update(job.repo_url, "done", commit_sha=state.commit_sha, files=state.files,
+                      failed_files=state.failed_files, functions=state.writer.records, uploaded=uploaded,
+                      seconds=round(time.time() - state.started_at, 3), error=None)
+        log.info(f"Batch: ✅ {job.repo_url}: {state.writer.records} functions from {state.files} files.")
+    except Exception as e:
+        log.error(f"Batch: failed to finalize {job.repo_url}: {e}", exc_info=True)
+        ledger.update(job.repo_url, "failed", error=str(e))
+
+def plan_jobs(repos: Sequence[Tuple[str, Optional[str]]], ledger: StatusLedger, batch_dir: Path,
+              max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> List[Tuple[BatchJob, int]]:
+    """Jobs still to run with their attempt number: skips repos done at the same ref and ones out of attempts."""
+    jobs = []
+    for repo_url, ref in repos:
+        previous = ledger.get(repo_url)
+        if previous.get("status") == "done" and previous.get("ref") == ref:
+            continue
+        attempts = previous.get("attempts", 0) if previous.get("ref") == ref else 0
+        if previous.get("status") == "failed" and attempts >= max_attempts:
+            log.warning(f"Batch: giving up on {repo_url} after {attempts} attempts ({previous.get('error')}).")
+            continue
+        workspace = Path(batch_dir) / "jobs" / CloneCache.key_for(repo_url)
+        jobs.append((BatchJob(repo_url, ref, workspace), attempts + 1))
+    return jobs
+
+def run_batch(repos: Sequence[Tuple[str, Optional[str]]], batch_dir: Path = DEFAULT_BATCH_DIR,
+              concurrent_jobs: int = DEFAULT_CONCURRENT_JOBS, parse_workers: Optional[int] = None,
+              queue_depth: int = DEFAULT_QUEUE_DEPTH, batch_size: int = DEFAULT_BATCH_SIZE,
+              python_mode: str = DEFAULT_PYTHON_MODE, clone_cache: Optional[CloneCache] = None,
+              filter_blobs: bool = False, excludes: Sequence[str] = DEFAULT_EXCLUDES,
+              max_file_bytes: int = DEFAULT_MAX_FILE_BYTES, skip_generated: bool = True,
+              upload: bool = True, max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+              path_prefix: str = DEFAULT_PATH_PREFIX) -> Dict[str, int]:
+    """Indexes many repositories with one warm model.
+
+    Up to `concurrent_jobs` repositories are checked out and parsed at once (parsing on a
+    shared pool of `parse_workers` processes), while this thread embeds for all of them.
+    Each repository gets its own workspace under batch_dir/jobs/ with its checkout and
+    streamed output; stored file paths are reported under `path_prefix` instead of the
+    workspace. Progress is recorded in batch_dir/ledger.jsonl, so re-running the
+    same list resumes: finished repositories are skipped and interrupted ones restarted.
+    Returns status counts for the repositories in `repos`.
+    """
+    batch_dir = Path(batch_dir)
+    ledger = StatusLedger(batch_dir / LEDGER_FILE)
+    jobs = plan_jobs(repos, ledger, batch_dir, max_attempts)
+    log.info(f"Batch: {len(jobs)} of {len(repos)} repositories to index "
+             f"({concurrent_jobs} concurrent jobs, {parse_workers or os.cpu_count() or 1} parser processes).")
+    if not jobs:
+        ledger.close()
+        return ledger.counts([url for url, _ in repos])
+    if not load_model():
+        ledger.close()
+        raise RuntimeError("Summarizer model could not be loaded.")
+
+    discovery_options = {"excludes": excludes, "max_file_bytes": max_file_bytes, "skip_generated": skip_generated}
+    chunk_size = max(EMBED_CHUNK_SIZE, batch_size)
+    out_queue: "queue.Queue" = queue.Queue(maxsize=max(1, queue_depth))
+    stop = threading.Event()
+    states: Dict[str, _JobState] = {}
+    remaining = len(jobs)
+
+    def flush(state: _JobState):
+        records = build_records(state.pending, state.job.repo_url, batch_size)
+        state.pending = []
+        for record in records:
+            state.writer.write(record)
+
+    executor = ProcessPoolExecutor(max_workers=parse_workers or os.cpu_count() or 1)
+    job_pool = ThreadPoolExecutor(max_workers=max(1, concurrent_jobs), thread_name_prefix="batch-job")
+    finalizer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="batch-finalize")
+    futures = []
+    try:
+        for job, attempt in jobs:
+            futures.append(job_pool.submit(_prepare_and_parse, job, attempt, ledger, executor, out_queue,
+                                           queue_depth, python_mode, stop, clone_cache, filter_blobs,
+                                           discovery_options))
+        while remaining:
+            job, item = out_queue.get()
+            state = states.get(job.repo_url)
+            if isinstance(item, _JobStarted):
+                states[job.repo_url] = _JobState(job, time.time(), item.commit_sha, SummaryWriter(job.output_dir))
+            elif isinstance(item, _JobFailed):
+                remaining -= 1
+                states.pop(job.repo_url, None)
+                ledger.update(job.repo_url, "failed", error=item.error)
+                log.error(f"Batch: ❌ {job.repo_url}: {item.error}")
+            elif isinstance(item, ParseFailure):
+                log.error(f"Failed to process file {item.file_path}: {item.error}")
+                state.failed_files += 1
+            elif item is DONE:
+                remaining -= 1
+                if state.pending:
+                    flush(state)
+                finalizer.submit(_finalize, states.pop(job.repo_url), ledger, upload)
+            else:
+                _, file_pending = item
+                if file_pending:
+                    state.pending.extend(item._replace(file_path=job.stored_path(item.file_path, path_prefix))
+                                         for item in file_pending)
+                    state.files += 1
+                if len(state.pending) >= chunk_size:
+                    flush(state)
+    finally:
+        stop.set()
+        job_pool.shutdown(wait=False, cancel_futures=True)
+        # Unblock job threads waiting on a full queue so they can see `stop` and exit.
+        while any(not future.done() for future in futures):
+            try:
+                out_queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        for state in states.values():
+            # Interrupted jobs keep their in-progress ledger status and are restarted next run.
+            if state.writer is not None:
+                state.writer.close()
+        finalizer.shutdown(wait=True)
+        executor.shutdown(wait=True, cancel_futures=True)
+        counts = ledger.counts([url for url, _ in repos])
+        ledger.close()
+    log.info(f"Batch: finished. Status counts: {counts}")
+    return counts
+
+def iter_batch_records(batch_dir: Path = DEFAULT_BATCH_DIR, with_embeddings: bool = True) -> Iterator[Dict]:
+    """Streams the records of every finished repository in a batch directory."""
+    ledger = StatusLedger(Path(batch_dir) / LEDGER_FILE)
+    try:
+        urls = [url for url, status in ledger.statuses().items() if status == "done"]
+    finally:
+        ledger.close()
+    workspaces = [Path(batch_dir) / "jobs" / CloneCache.key_for(url) / "output" for url in urls]
+    return chain.from_iterable(iter_records(path, with_embeddings=with_embeddings) for path in workspaces)
@@ -0,0 +1,350 @@
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from . import summarizer
+from .discovery import discover_files
+from .fake_firestore import InMemoryFirestore
+from .firebase_db import upload_summaries
+from .language_parsers import SUPPORTED_EXTENSIONS, extract_code_snippets
+from .records import SummaryRecord
+from .sinks import SummaryWriter, iter_records
+
+log = logging.getLogger(__name__)
+
+REPORT_VERSION = 1
+DEFAULT_BENCH_DIR = Path(".cache") / "bench"
+DEFAULT_REPORT_PATH = Path("outputs") / "benchmark.json"
+DEFAULT_FILES = 200
+DEFAULT_LANGUAGE_MIX = {
+    "python": 0.35, "javascript": 0.15, "typescript": 0.1, "java": 0.1,
+    "cpp": 0.1, "c": 0.05, "csharp": 0.05, "go": 0.1,
+}
+# Function bodies follow a log-normal line count (median about 7 lines, long tail), capped here.
+BODY_LINES_MU = 2.0
+BODY_LINES_SIGMA = 0.8
+MAX_BODY_LINES = 400
+FUNCTIONS_PER_FILE = (2, 24)
+# Pathological inputs: one minified bundle and one huge generated C++ file.
+MINIFIED_JS_FUNCTIONS = 4000
+HUGE_CPP_BYTES = 3 * 1024 * 1024 // 2
+# Sample of snippets embedded one at a time through get_embedding.
+SINGLE_EMBED_SAMPLE = 16
+# Tiny randomly initialized Roberta: byte-level vocabulary, 2 layers of width 32.
+TINY_MODEL_CONFIG = dict(hidden_size=32, num_hidden_layers=2, num_attention_heads=2, intermediate_size=64)
+
+_EXTENSIONS = {language: ext for ext, language in SUPPORTED_EXTENSIONS.items()}
+
+# Per language: file prelude, function header, statement, return, closing lines and file postlude.
+# {i} is the function index, {j} the statement index, {k} the file index.
+_TEMPLATES = {
+    "python": ("import math\n\n", "def func_{i}(a, b):\n", "    x_{j} = a * {j} + b\n", "    return a + b\n", "\n", ""),
+    "javascript": ("'use strict';\n\n", "function func{i}(a, b) {{\n", "  const x{j} = a * {j} + b;\n",
+                   "  return a + b;\n", "}}\n\n", ""),
+    "typescript": ("export {{}};\n\n", "function func{i}(a: number, b: number): number {{\n",
+                   "  const x{j}: number = a * {j} + b;\n", "  return a + b;\n", "}}\n\n", ""),
+    "java": ("public class Bench{k} {{\n", "    public int func{i}(int a, int b) {{\n",
+             "        int x{j} = a * {j} + b;\n", "        return a + b;\n", "    }}\n\n", "}}\n"),
+    "csharp": ("public class Bench{k}\n{{\n", "    public int Func{i}(int a, int b)\n    {{\n",
+               "        var x{j} = a * {j} + b;\n", "        return a + b;\n", "    }}\n\n", "}}\n"),
+    "cpp": ("#include <cmath>\n\nnamespace bench {{\n\n", "int func{i}(int a, int b) {{\n",
+            "    int x{j} = a * {j} + b;\n", "    return a + b;\n", "}}\n\n", "}}  // namespace bench\n"),
+    "c": ("#include <stdio.h>\n\n", "int func{i}(int a, int b) {{\n", "    int x{j} = a * {j} + b;\n",
+          "    return a + b;\n", "}}\n\n", ""),
+    "go": ("package bench\n\n", "func Func{i}(a int, b int) int {{\n", "\tx{j} := a*{j} + b\n\t_ = x{j}\n",
+           "\treturn a + b\n", "}}\n\n", ""),
+}
+
+def _body_lines(rng: random.Random) -> int:
+    return max(1, min(MAX_BODY_LINES, int(rng.lognormvariate(BODY_LINES_MU, BODY_LINES_SIGMA))))
+
+def _render_file(language: str, file_index: int, functions: int, rng: random.Random) -> Tuple[str, int]:
+    prelude, header, statement, ret, closer, postlude = _TEMPLATES[language]
+    parts = [prelude.format(k=file_index)]
+    for i in range(functions):
+        parts.append(header.format(i=i))
+        parts.extend(statement.format(j=j) for j in range(_body_lines(rng)))
+        parts.append(ret)
+        parts.append(closer.format())
+    parts.append(postlude.format())
+    return "".join(parts), functions
+
+def _minified_js(functions: int) -> str:
+    return ";".join(f"function m{i}(a,b){{var c=a*{i}+b;return c>0?c:-c}}" for i in range(functions)) + ";\n"
+
+def _huge_cpp(target_bytes: int) -> str:
+    parts, size, i = ["// Huge translation unit.\n"], 0, 0
+    while size < target_bytes:
+        chunk = f"int huge{i}(int a, int b) {{\n    int x = a * {i} + b;\n    return x ^ (a - b);\n}}\n"
+        parts.append(chunk)
+        size += len(chunk)
+        i += 1
+    return "".join(parts)
+
+def generate_synthetic_repo(dest: Path, files: int = DEFAULT_FILES, language_mix: Optional[Dict[str, float]] = None,
+                            seed: int = 0, pathological: bool = True) -> Dict:
+    """Writes a committed git repository of generated source files and returns a description of it.
+
+    Languages are drawn by weight from `language_mix`; each file holds a random number of
+    functions with log-normal body lengths. With `pathological`, a minified JS bundle and
+    a >1 MiB C++ file are added (discovery skips both; the parse stage still times them).
+    """
+    from git import Actor, Repo
+
+    mix = language_mix or DEFAULT_LANGUAGE_MIX
+    unknown = sorted(set(mix) - set(_TEMPLATES))
+    if unknown:
+        raise ValueError(f"Unknown languages {unknown}. Expected some of {sorted(_TEMPLATES)}.")
+    rng = random.Random(seed)
+    dest = Path(dest)
+    dest.mkdir(parents=True, exist_ok=True)
+    languages, weights = zip(*sorted(mix.items()))
+    by_language: Dict[str, Dict[str, int]] = {}
+    total_bytes = 0
+    for k in range(files):
+        language = rng.choices(languages, weights=weights)[0]
+        source, functions = _render_file(language, k, rng.randint(*FUNCTIONS_PER_FILE), rng)
+        path = dest / "src" / f"pkg{k % 16}" / f"bench{k}{_EXTENSIONS[language]}"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(source, encoding="utf-8")
+        stats = by_language.setdefault(language, {"files": 0, "functions": 0, "bytes": 0})
+        stats["files"] += 1
+        stats["functions"] += functions
+        stats["bytes"] += len(source)
+        total_bytes += len(source)
+
+    pathological_files = {}
+    if pathological:
+        for rel, source in (("src/bundle.js", _minified_js(MINIFIED_JS_FUNCTIONS)),
+                            ("src/huge_generated.cpp", _huge_cpp(HUGE_CPP_BYTES))):
+            (dest / rel).write_text(source, encoding="utf-8")
+            pathological_files[rel] = len(source)
+            total_bytes += len(source)
+
+    repo = Repo.init(dest)
+    repo.git.add("-A")
+    author = Actor("bench", "bench@example.invalid")
+    repo.index.commit("Synthetic benchmark repository", author=author, committer=author)
+    return {"files": files + len(pathological_files), "bytes": total_bytes, "seed": seed,
+            "by_language": by_language, "pathological": pathological_files}
+
+def make_tiny_model(dest: Path, seed: int = 0) -> Path:
+    """Saves a tiny randomly initialized Roberta model and byte-level tokenizer, for offline runs."""
+    dest = Path(dest)
+    if (dest / "config.json").exists():
+        return dest
+    import torch
+    from transformers import RobertaConfig, RobertaModel, RobertaTokenizerFast
+    from transformers.models.gpt2.tokenization_gpt2 import bytes_to_unicode
+
+    dest.mkdir(parents=True, exist_ok=True)
+    vocab = {"<s>": 0, "<pad>": 1, "</s>": 2, "<unk>": 3}
+    for char in sorted(bytes_to_unicode().values()):
+        vocab.setdefault(char, len(vocab))
+    vocab["<mask>"] = len(vocab)
+    (dest / "vocab.json").write_text(json.dumps(vocab), encoding="utf-8")
+    (dest / "merges.txt").write_text("#version: 0.2\n", encoding="utf-8")
+    tokenizer = RobertaTokenizerFast(vocab_file=str(dest / "vocab.json"), merges_file=str(dest / "merges.txt"))
+    tokenizer.save_pretrained(dest)
+    torch.manual_seed(seed)
+    config = RobertaConfig(vocab_size=len(vocab), max_position_embeddings=summarizer.MAX_LENGTH + 2,
+                           pad_token_id=1, bos_token_id=0, eos_token_id=2, **TINY_MODEL_CONFIG)
+    RobertaModel(config).save_pretrained(dest)
+    log.info(f"Saved tiny random Roberta model to {dest}.")
+    return dest
+
+def _peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS.
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def _stage(items: int, seconds: float, latencies: List[float], unit: str = "functions", **extra) -> Dict:
+    """One stage's metrics. Latencies are per call (a file, a batch or a record, see `latency_of`)."""
+    row = {
+        "items": items,
+        "unit": unit,
+        "seconds": round(seconds, 6),
+        "per_sec": round(items / seconds, 2) if seconds > 0 else None,
+        "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 3) if latencies else None,
+        "p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 3) if latencies else None,
+        # Process-wide high-water mark after the stage, so growth between stages is visible.
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+    row.update(extra)
+    return row
+
+def _timed(fn: Callable, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def run_benchmark(repo_dir: Path, batch_size: int = summarizer.DEFAULT_BATCH_SIZE,
+                  chunk_size: int = summarizer.EMBED_CHUNK_SIZE) -> Dict:
+    """Runs each pipeline stage on its own over a repository and returns the metrics report.
+
+    Stages: discovery, parsing (per language, plus any file discovery skipped), tokenization,
+    batched embedding (embed_matrix, embedding cache disabled), single-snippet embedding
+    (get_embedding), serialization (SummaryWriter) and upload to an InMemoryFirestore.
+    """
+    repo_dir = Path(repo_dir)
+    stages: Dict[str, Dict] = {}
+
+    report, seconds = _timed(discover_files, repo_dir)
+    stages["discovery"] = _stage(len(report.files), seconds, [], unit="files",
+                                 skipped=report.skip_counts())
+
+    # Parse every source file, so pathological ones discovery would drop are still measured.
+    by_language: Dict[str, Dict[str, list]] = {}
+    pathological = {}
+    pending: List[Tuple[str, str, str]] = []
+    selected = {path.resolve() for path in report.files}
+    sources = sorted(p for p in repo_dir.rglob("*") if p.suffix.lower() in SUPPORTED_EXTENSIONS
+                     and ".git" not in p.relative_to(repo_dir).parts)
+    for path in sources:
+        (language, snippets), seconds = _timed(extract_code_snippets, path)
+        rel = path.relative_to(repo_dir).as_posix()
+        if rel in report.skipped:
+            pathological[rel] = {"bytes": path.stat().st_size, "seconds": round(seconds, 6),
+                                 "functions": len(snippets), "skipped_by_discovery": report.skipped[rel]}
+            continue
+        samples = by_language.setdefault(language or "unknown", {"latencies": [], "functions": []})
+        samples["latencies"].append(seconds)
+        samples["functions"].append(len(snippets))
+        if path.resolve() in selected:
+            pending.extend((path.as_posix(), language, s) for s in snippets if s and not s.isspace())
+    parse_by_language = {
+        language: _stage(sum(samples["functions"]), sum(samples["latencies"]), samples["latencies"],
+                         files=len(samples["latencies"]))
+        for language, samples in sorted(by_language.items())
+    }
+    all_latencies = [s for samples in by_language.values() for s in samples["latencies"]]
+    stages["parse"] = _stage(sum(sum(s["functions"]) for s in by_language.values()), sum(all_latencies),
+                             all_latencies, files=len(all_latencies))
+
+    snippets = [snippet for _, _, snippet in pending]
+    if not summarizer.load_model():
+        raise RuntimeError(f"Could not load the model '{summarizer.MODEL_ID}'.")
+
+    latencies, tokens = [], 0
+    for start in range(0, len(snippets), batch_size):
+        encoded, seconds = _timed(summarizer.tokenizer, snippets[start:start + batch_size], truncation=True,
+                                  max_length=summarizer.MAX_LENGTH)
+        latencies.append(seconds)
+        tokens += sum(len(ids) for ids in encoded["input_ids"])
+    stages["tokenize"] = _stage(len(snippets), sum(latencies), latencies, tokens=tokens,
+                                tokens_per_sec=round(tokens / sum(latencies), 2) if sum(latencies) else None)
+
+    previous_cache = summarizer.embedding_cache
+    summarizer.set_embedding_cache(None)
+    try:
+        summarizer.warmup()
+        embeddings, latencies = [], []
+        for start in range(0, len(snippets), chunk_size):
+            (matrix, found), seconds = _timed(summarizer.embed_matrix, snippets[start:start + chunk_size],
+                                              batch_size=batch_size)
+            embeddings.extend(row if ok else None for row, ok in zip(matrix, found))
+            latencies.append(seconds)
+        stages["embed"] = _stage(len(snippets), sum(latencies), latencies, chunk_size=chunk_size,
+                                 batch_size=batch_size)
+
+        sample = snippets[:SINGLE_EMBED_SAMPLE]
+        latencies = [_timed(summarizer.get_embedding, snippet)[1] for snippet in sample]
+        stages["embed_single"] = _stage(len(sample), sum(latencies), latencies)
+    finally:
+        summarizer.set_embedding_cache(previous_cache)
+
+    with tempfile.TemporaryDirectory(prefix="bench-") as scratch:
+        records = [
+            SummaryRecord("bench://synthetic", file_path, language, snippet, summarizer.generate_summary(snippet),
+                          embedding)
+            for (file_path, language, snippet), embedding in zip(pending, embeddings) if embedding is not None
+        ]
+        latencies = []
+        start = time.perf_counter()
+        with SummaryWriter(Path(scratch)) as writer:
+            for record in records:
+                latencies.append(_timed(writer.write, record)[1])
+        stages["serialize"] = _stage(len(records), time.perf_counter() - start, latencies,
+                                     bytes=sum(f.stat().st_size for f in Path(scratch).iterdir()))
+        del records
+
+        client = InMemoryFirestore()
+        uploaded, seconds = _timed(upload_summaries, iter_records(Path(scratch), with_embeddings=True),
+                                   client=client)
+        stages["upload"] = _stage(uploaded, seconds, [], commits=client.commits)
+
+    return {
+        "version": REPORT_VERSION,
+        "created_at": time.time(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "model_id": summarizer.MODEL_ID,
+            "backend": summarizer.BACKEND,
+            "device": summarizer.get_device(),
+            "intra_op_threads": summarizer.INTRA_OP_THREADS,
+            "inter_op_threads": summarizer.INTER_OP_THREADS,
+        },
+        "stages": stages,
+        "parse_by_language": parse_by_language,
+        "pathological": pathological,
+    }
+
+def compare_reports(baseline: Dict, current: Dict) -> Dict[str, Dict]:
+    """Per stage, the current/baseline ratios of throughput and p95 latency (>1 means more of it)."""
+    def ratio(new, old):
+        return round(new / old, 3) if new is not None and old else None
+
+    rows = {}
+    for name, stage in current.get("stages", {}).items():
+        old = baseline.get("stages", {}).get(name)
+        if old is None:
+            continue
+        rows[name] = {"per_sec_ratio": ratio(stage.get("per_sec"), old.get("per_sec")),
+                      "p95_ratio": ratio(stage.get("p95_ms"), old.get("p95_ms"))}
+    return rows
+
+def run_synthetic_benchmark(files: int = DEFAULT_FILES, language_mix: Optional[Dict[str, float]] = None,
+                            seed: int = 0, pathological: bool = True, offline: bool = False,
+                            bench_dir: Path = DEFAULT_BENCH_DIR, report_path: Optional[Path] = DEFAULT_REPORT_PATH,
+                            baseline_path: Optional[Path] = None) -> Dict:
+    """Generates a synthetic repository, benchmarks it and writes the JSON report.
+
+    With `offline`, a tiny random Roberta (bench_dir/tiny-roberta) replaces CodeBERT, so
+    nothing is downloaded; its throughput numbers are only comparable with other offline runs.
+    """
+    bench_dir = Path(bench_dir)
+    if offline:
+        summarizer.MODEL_ID = str(make_tiny_model(bench_dir / "tiny-roberta", seed=seed).resolve())
+        summarizer.configure_backend(summarizer.BACKEND, summarizer.INTRA_OP_THREADS, summarizer.INTER_OP_THREADS)
+    with tempfile.TemporaryDirectory(prefix="synthetic-", dir=bench_dir if bench_dir.exists() else None) as scratch:
+        repo = generate_synthetic_repo(Path(scratch) / "repo", files=files, language_mix=language_mix,
+                                       seed=seed, pathological=pathological)
+        log.info(f"Generated synthetic repository: {repo['files']} files, {repo['bytes'] / 1e6:.1f} MB.")
+        report = run_benchmark(Path(scratch) / "repo")
+    report["repository"] = repo
+    report["environment"]["offline_model"] = offline
+    if baseline_path is not None:
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            report["comparison"] = compare_reports(json.load(f), report)
+    if report_path is not None:
+        report_path = Path(report_path)
+        report_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        log.info(f"Wrote benchmark report to {report_path}.")
+    return report
@@ -0,0 +1,467 @@
+import re
+import time
+from typing import List, Optional, Tuple
+
+# Single-pass function finder for brace-delimited languages (C-family, JS/TS, Go).
+#
+# The scanner jumps between "interesting" characters with one compiled regex, skips
+# strings, comments, template literals and preprocessor lines, and keeps a stack of
+# open braces. When a brace opens, the text since the previous statement boundary is
+# classified as a function header or not; when a function's brace closes, its span
+# is emitted. Each character is visited a bounded number of times, so the scan is O(n).
+
+BRACE_LANGUAGES = frozenset({"javascript", "typescript", "java", "cpp", "c", "csharp", "go"})
+
+# Longest header (text before `{`) we are willing to classify.
+MAX_HEADER_CHARS = 2000
+# How many trailing lines of a header are tried on their own (for code without `;`).
+MAX_HEADER_LINES = 8
+# How often (in scanner steps) the time budget is checked.
+_DEADLINE_CHECK_INTERVAL = 4096
+
+_SPECIAL = {
+    "default": re.compile(r"[{}();\"'/]"),
+    "c_family": re.compile(r"[{}();\"'/#]"),
+    "js": re.compile(r"[{}();\"'/`]"),
+    "go": re.compile(r"[{}();\"'/`]"),
+}
+_DOUBLE_QUOTED = re.compile(r'"(?:[^"\\\n]|\\[\s\S])*"')
+_SINGLE_QUOTED = re.compile(r"'(?:[^'\\\n]|\\[\s\S])*'")
+_REGEX_LITERAL = re.compile(r"/(?:[^/\\\[\n]|\\.|\[(?:[^\]\\\n]|\\.)*\])+/[a-z]*")
+_TEMPLATE_STOP = re.compile(r"\\[\s\S]|`|\$\{")
+_COMMENTS = re.compile(r"//[^\n]*|/\*[\s\S]*?\*/")
+_STRINGS = re.compile(r'"(?:[^"\\\n]|\\.)*"|\'(?:[^\'\\\n]|\\.)*\'')
+# Whitespace, comments and C++ access labels that precede a header.
+_LEADING_TRIVIA = re.compile(r"(?:\s+|//[^\n]*|/\*[\s\S]*?\*/|(?:public|private|protected)\s*:(?!:))*")
+_REGEX_PRECEDERS = set("(,=:[!&|?{};+-*%<>~^")
+_REGEX_KEYWORDS = frozenset({"return", "typeof", "case", "do", "else", "in", "of", "void", "yield", "await"})
+
+_NON_FUNCTION_NAMES = frozenset({
+    "if", "for", "while", "switch", "catch", "else", "do", "try", "finally", "synchronized",
+    "using", "lock", "foreach", "fixed", "checked", "unchecked", "return", "new", "throw",
+    "sizeof", "typeof", "when", "with", "await", "yield", "case", "delete", "function",
+    "select", "defer", "go",
+})
+_REJECT_TOKENS = frozenset({"new", "return", "else", "throw", "case", "goto", "delete", "await", "yield", "do", "sizeof"})
+
+_C_ANNOTATIONS = re.compile(r"@[\w.]+(?:\s*\([^()]*\))?|^\s*(?:\[[^\[\]]*\]\s*)+")
+_C_TYPE_TOKEN = re.compile(r"^[\w<>\[\],.?*&:~$]+$")
+_C_OPERATOR = re.compile(r"\boperator\s*[^\s\w(]+")
+_C_NAME = re.compile(r"^(?:[\w$]+::)*~?[\w$]+$|^(?:[\w$]+::)*operator\s*\S+$")
+# Innermost template argument list, e.g. the `<T>` of `Foo<T>::get`.
+_C_TEMPLATE_ARGS = re.compile(r"<[^<>]*>")
+_C_WORD = re.compile(r"[A-Za-z_]\w*")
+# Qualifiers allowed between a parameter list and the body.
+_C_QUALIFIERS = frozenset({"const", "override", "final", "volatile", "mutable"})
+_GO_FUNC = re.compile(r"^func\s*(?:\([^()]*\)\s*)?([A-Za-z_]\w*)\s*(?:\[[^\]]*\]\s*)?\(")
+_JS_DECORATORS = re.compile(r"@[\w.]+(?:\s*\([^()]*\))?")
+_JS_FUNCTION_DECL = re.compile(r"^(?:export\s+(?:default\s+)?)?(?:declare\s+)?(?:async\s+)?function\b\s*\*?\s*([\w$]*)\s*(?:<[^>]*>)?$")
+_JS_FUNCTION_ASSIGN = re.compile(r"^(?:export\s+)?(?:(?:const|let|var)\s+)?([\w$.]+)\s*(?::[^=]+)?=\s*(?:async\s+)?function\b\s*\*?\s*[\w$]*$")
+_JS_METHOD = re.compile(
+    r"^(?:(?:public|private|protected|static|async|get|set|readonly|override|abstract|declare)\s+)*"
+    r"\*?\s*(#?[\w$]+)\s*\??\s*(?:<[^>]*>)?$"
+)
+_JS_SUFFIX = re.compile(r"^\s*(?::\s*[^;{=]+)?\s*$")
+_JS_ARROW = re.compile(
+    r"^(?:export\s+)?(?:(?:const|let|var)\s+|(?:(?:public|private|protected|static|readonly)\s+)*)"
+    r"([\w$]+)\s*(?::[^=]+)?=\s*(?:async\s*)?(?:\([^;]*\)|[\w$]+)\s*(?::\s*[^=;]+)?$"
+)
+
+class ScanBudgetExceeded(Exception):
+    """Raised when a scan exceeds its time budget; carries the spans found so far."""
+
+    def __init__(self, spans: List[Tuple[int, int, str]]):
+        super().__init__("Brace scan exceeded its time budget.")
+        self.spans = spans
+
+def _split_first_call(header: str) -> Optional[Tuple[str, str]]:
+    """Splits `prefix(params)suffix` at the first balanced top-level paren group."""
+    open_idx = header.find("(")
+    if open_idx < 0:
+        return None
+    depth = 0
+    for idx in range(open_idx, len(header)):
+        ch = header[idx]
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+            if depth == 0:
+                return header[:open_idx], header[idx + 1:]
+    return None
+
+def _balanced_without_semicolon(text: str, pos: int) -> bool:
+    """True if text[pos:] has balanced (), [] and {} and no `;` outside them (lambdas may hold `;`)."""
+    depth = 0
+    for idx in range(pos, len(text)):
+        ch = text[idx]
+        if ch in "([{":
+            depth += 1
+        elif ch in ")]}":
+            depth -= 1
+            if depth < 0:
+                return False
+        elif ch == ";" and not depth:
+            return False
+    return depth == 0
+
+def _c_suffix_ok(suffix: str) -> bool:
+    """Checks the text between a parameter list and `{` in one left-to-right pass.
+
+    Accepts qualifiers (const, noexcept(...), override, &&, ...) followed optionally by one
+    open-ended clause: `-> type`, `throws ...`, `where ...` or `: initializers` / `: base(...)`.
+    """
+    pos, length = 0, len(suffix)
+    while True:
+        while pos < length and suffix[pos].isspace():
+            pos += 1
+        if pos == length:
+            return True
+        ch = suffix[pos]
+        if ch == ":":
+            return _balanced_without_semicolon(suffix, pos + 1)
+        if suffix.startswith("->", pos):
+            rest = suffix[pos + 2:]
+            return bool(rest.strip()) and not any(c in "{;=" for c in rest)
+        if ch == "&":
+            pos += 1
+            continue
+        word = _C_WORD.match(suffix, pos)
+        if word is None:
+            return False
+        pos = word.end()
+        if word.group() == "throws":
+            rest = suffix[pos:]
+            return rest[:1].isspace() and bool(rest.strip()) \
+                and all(c.isalnum() or c.isspace() or c in "_.,<>" for c in rest)
+        if word.group() == "where":
+            rest = suffix[pos:]
+            return rest[:1].isspace() and bool(rest.strip()) and not any(c in "{;=" for c in rest)
+        if word.group() == "noexcept":
+            while pos < length and suffix[pos].isspace():
+                pos += 1
+            if suffix.startswith("(", pos):
+                close = suffix.find(")", pos)
+                if close < 0 or "(" in suffix[pos + 1:close]:
+                    return False
+                pos = close + 1
+        elif word.group() not in _C_QUALIFIERS:
+            return False
+
+def _strip_template_args(text: str) -> str:
+    while True:
+        stripped = _C_TEMPLATE_ARGS.sub("", text)
+        if stripped == text:
+            return text
+        text = stripped
+
+def _c_function_name(prefix: str, suffix: str, language: str) -> Optional[str]:
+    """Name of the function declared by `prefix(params)suffix`, or None if it is not a definition."""
+    if "operator" not in prefix:
+        # `template <typename T = int>`, `Foo<T>::get`: template arguments are not part of the name.
+        prefix = _strip_template_args(prefix)
+    bare_prefix = _C_OPERATOR.sub("operator", prefix)
+    if "=" in bare_prefix or ";" in prefix or "(" in prefix:
+        return None
+    if language == "java" and suffix.strip() and not suffix.strip().startswith("throws"):
+        return None
+    tokens = prefix.split()
+    if not tokens:
+        return None
+    # `operator ==` may be split across tokens.
+    if len(tokens) >= 2 and tokens[-2].endswith("operator"):
+        tokens = tokens[:-2] + [tokens[-2] + tokens[-1]]
+    name = tokens[-1]
+    # `char *dup`, `const std::string &name`: the pointer or reference belongs to the type.
+    bare_name = name.lstrip("*&")
+    if bare_name != name:
+        if len(tokens) == 1 or not bare_name:
+            return None
+        tokens = tokens[:-1] + [name[:len(name) - len(bare_name)], bare_name]
+        name = bare_name
+    if not _C_NAME.match(name) or name.rsplit("::", 1)[-1] in _NON_FUNCTION_NAMES:
+        return None
+    if any(token in _REJECT_TOKENS or not _C_TYPE_TOKEN.match(token) for token in tokens[:-1]):
+        return None
+    if len(tokens) == 1 and language in ("c", "cpp") and "::" not in name \
+            and not name.startswith("~") and not suffix.strip():
+        # A bare `NAME(args) {` in C/C++ is almost always a macro invocation.
+        return None
+    return name
+
+def _classify_c_family(header: str, language: str) -> Optional[str]:
+    header = _C_ANNOTATIONS.sub(" ", header).strip()
+    split = _split_first_call(header)
+    if split is None or not _c_suffix_ok(split[1]):
+        return None
+    return _c_function_name(split[0], split[1], language)
+
+def _ends_with_bare_name(text: str) -> bool:
+    """True if the last item of a `: a_(1), b_` initializer list is a name still awaiting its `{...}`."""
+    end = idx = len(text.rstrip())
+    while idx > 0:
+        if text[idx - 1].isalnum() or text[idx - 1] in "_$":
+            idx -= 1
+        elif idx >= 2 and text[idx - 2:idx] == "::":
+            idx -= 2
+        else:
+            break
+    if idx == end:
+        return False
+    before = text[:idx].rstrip()
+    return before.endswith(",") or (before.endswith(":") and not before.endswith("::"))
+
+def _opens_member_initializer(code: str, seg_start: int, open_pos: int) -> bool:
+    """True when the `{` at open_pos brace-initializes a member in a C++ constructor's initializer list."""
+    text = code[max(seg_start, open_pos - MAX_HEADER_CHARS):open_pos]
+    header = _C_ANNOTATIONS.sub(" ", _STRINGS.sub('""', _COMMENTS.sub(" ", text))).strip()
+    split = _split_first_call(header)
+    if split is None:
+        return False
+    prefix, suffix = split
+    stripped = suffix.lstrip()
+    if not stripped.startswith(":") or stripped.startswith("::"):
+        return False
+    return _c_suffix_ok(suffix) and _ends_with_bare_name(suffix) \
+        and _c_function_name(prefix, suffix, "cpp") is not None
+
+def _classify_js(header: str, language: str) -> Optional[str]:
+    header = _JS_DECORATORS.sub(" ", header).strip()
+    if header.endswith("=>"):
+        match = _JS_ARROW.match(header[:-2].rstrip())
+        return match.group(1) if match else None
+    split = _split_first_call(header)
+    if split is None:
+        return None
+    prefix, suffix = split
+    prefix = prefix.strip()
+    if not (_JS_SUFFIX.match(suffix) if language == "typescript" else not suffix.strip()):
+        return None
+    for pattern in (_JS_FUNCTION_DECL, _JS_FUNCTION_ASSIGN):
+        match = pattern.match(prefix)
+        if match:
+            return match.group(1)
+    match = _JS_METHOD.match(prefix)
+    if match and match.group(1) not in _NON_FUNCTION_NAMES:
+        return match.group(1)
+    return None
+
+def _classify_go(header: str, language: str) -> Optional[str]:
+    match = _GO_FUNC.match(header.strip())
+    return match.group(1) if match else None
+
+_CLASSIFIERS = {
+    "javascript": _classify_js,
+    "typescript": _classify_js,
+    "go": _classify_go,
+}
+
+def _header_candidates(code: str, start: int, end: int, truncated: bool):
+    """Yields (offset, text) header candidates: the whole header, trailing lines, then the last list item."""
+    if not truncated:
+        yield start, code[start:end]
+    line_start = end
+    for _ in range(MAX_HEADER_LINES):
+        line_start = code.rfind("\n", start, line_start)
+        if line_start < 0:
+            break
+        yield line_start + 1, code[line_start + 1:end]
+    depth = 0
+    for idx in range(end - 1, start - 1, -1):
+        ch = code[idx]
+        if ch in ")]>":
+            depth += 1
+        elif ch in "([<":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            yield idx + 1, code[idx + 1:end]
+            break
+
+def _classify_header(code: str, seg_start: int, open_pos: int, language: str) -> Optional[Tuple[int, str]]:
+    start = max(seg_start, open_pos - MAX_HEADER_CHARS)
+    classify = _CLASSIFIERS.get(language, _classify_c_family)
+    for offset, text in _header_candidates(code, start, open_pos, truncated=start > seg_start):
+        cleaned = _STRINGS.sub('""', _COMMENTS.sub(" ", text))
+        if not cleaned.strip():
+            continue
+        name = classify(cleaned, language)
+        if name is not None:
+            offset = _LEADING_TRIVIA.match(code, offset, open_pos).end()
+            return offset, name
+    return None
+
+def _at_line_start(code: str, pos: int) -> bool:
+    line_start = code.rfind("\n", max(0, pos - 200), pos)
+    if line_start < 0 and pos > 200:
+        return False
+    return code[line_start + 1:pos].strip() == ""
+
+def _skip_preprocessor(code: str, pos: int) -> int:
+    while True:
+        newline = code.find("\n", pos)
+        if newline < 0:
+            return len(code)
+        if code[newline - 1] != "\\" and not (code[newline - 1] == "\r" and code[newline - 2] == "\\"):
+            return newline + 1
+        pos = newline + 1
+
+def _regex_allowed(code: str, pos: int) -> bool:
+    """Heuristic: a `/` starts a regex literal unless it follows an operand."""
+    idx = pos - 1
+    limit = max(0, pos - 100)
+    while idx >= limit and code[idx].isspace():
+        idx -= 1
+    if idx < limit or code[idx] in _REGEX_PRECEDERS:
+        return True
+    word_end = idx + 1
+    while idx >= limit and (code[idx].isalnum() or code[idx] in "_$"):
+        idx -= 1
+    return code[idx + 1:word_end] in _REGEX_KEYWORDS
+
+def scan_functions(code: str, language: str, deadline: Optional[float] = None) -> List[Tuple[int, int, str]]:
+    """Returns (start, end, name) character spans of outermost function definitions.
+
+    Functions nested inside other functions are not reported separately; methods
+    inside classes, structs and namespaces are.
+    """
+    if language in ("javascript", "typescript"):
+        special = _SPECIAL["js"]
+    elif language == "go":
+        special = _SPECIAL["go"]
+    elif language in ("c", "cpp", "csharp"):
+        special = _SPECIAL["c_family"]
+    else:
+        special = _SPECIAL["default"]
+    is_js = language in ("javascript", "typescript")
+
+    spans: List[Tuple[int, int, str]] = []
+    # Frames: (kind, header_start, name, saved_paren_depth, saved_seg_start)
+    # with kind in {"block", "function", "template", "init"}.
+    stack: List[Tuple[str, int, str, int, int]] = []
+    function_depth = 0
+    paren_depth = 0
+    seg_start = 0
+    pos = 0
+    steps = 0
+    length = len(code)
+
+    while pos < length:
+        steps += 1
+        if deadline is not None and steps % _DEADLINE_CHECK_INTERVAL == 0 and time.monotonic() > deadline:
+            raise ScanBudgetExceeded(sorted(spans))
+        match = special.search(code, pos)
+        if match is None:
+            break
+        idx = match.start()
+        ch = code[idx]
+        pos = idx + 1
+
+        if ch == "{":
+            header = None
+            kind = "block"
+            # Braces inside parentheses (default arguments, callbacks, inline types) never open a function.
+            if not function_depth and not paren_depth:
+                if language == "cpp" and _opens_member_initializer(code, seg_start, idx):
+                    # `Foo() : a_{1}, b_(2) {`: the header continues after this brace.
+                    kind = "init"
+                else:
+                    header = _classify_header(code, seg_start, idx, language)
+            if header is not None:
+                stack.append(("function", header[0], header[1], paren_depth, seg_start))
+                function_depth += 1
+            else:
+                stack.append((kind, idx, "", paren_depth, seg_start))
+            paren_depth = 0
+            seg_start = idx + 1
+        elif ch == "}":
+            kind, header_start, name, saved_parens, saved_seg = stack.pop() if stack else ("block", idx, "", 0, 0)
+            paren_depth = saved_parens
+            # Inside an unfinished expression the enclosing header is still being read.
+            seg_start = saved_seg if saved_parens or kind in ("template", "init") else idx + 1
+            if kind == "function":
+                function_depth -= 1
+                if function_depth == 0:
+                    spans.append((header_start, idx + 1, name))
+            elif kind == "template":
+                depth_before = len(stack)
+                pos = _skip_template(code, idx + 1, stack, paren_depth, seg_start)
+                if len(stack) > depth_before:
+                    paren_depth = 0
+        elif ch == "(":
+            paren_depth += 1
+        elif ch == ")":
+            paren_depth = max(0, paren_depth - 1)
+        elif ch == ";":
+            if not paren_depth:
+                seg_start = idx + 1
+        elif ch == '"':
+            pos = _skip_double_quoted(code, idx, language)
+        elif ch == "'":
+            if not (language == "cpp" and idx > 0 and code[idx - 1].isalnum()):  # C++14 digit separator
+                string = _SINGLE_QUOTED.match(code, idx)
+                pos = string.end() if string else idx + 1
+        elif ch == "`":
+            if is_js:
+                depth_before = len(stack)
+                pos = _skip_template(code, idx + 1, stack, paren_depth, seg_start)
+                if len(stack) > depth_before:
+                    paren_depth = 0
+            else:
+                close = code.find("`", idx + 1)
+                pos = length if close < 0 else close + 1
+        elif ch == "/":
+            nxt = code[idx + 1:idx + 2]
+            if nxt == "/":
+                newline = code.find("\n", idx)
+                pos = length if newline < 0 else newline + 1
+            elif nxt == "*":
+                close = code.find("*/", idx + 2)
+                pos = length if close < 0 else close + 2
+            elif is_js and _regex_allowed(code, idx):
+                regex = _REGEX_LITERAL.match(code, idx)
+                pos = regex.end() if regex else idx + 1
+        elif ch == "#":
+            if _at_line_start(code, idx):
+                pos = _skip_preprocessor(code, idx)
+                if not paren_depth:
+                    seg_start = pos
+
+    return sorted(spans)
+
+def _skip_double_quoted(code: str, idx: int, language: str) -> int:
+    if language == "java" and code.startswith('"""', idx):
+        close = code.find('"""', idx + 3)
+        return len(code) if close < 0 else close + 3
+    prev = code[idx - 1] if idx > 0 else ""
+    if language == "csharp" and (prev == "@" or (prev == "$" and idx > 1 and code[idx - 2] == "@")):
+        pos = idx + 1
+        while True:
+            close = code.find('"', pos)
+            if close < 0:
+                return len(code)
+            if code.startswith('""', close):
+                pos = close + 2
+                continue
+            return close + 1
+    if language == "cpp" and prev == "R":
+        paren = code.find("(", idx + 1, idx + 18)
+        if paren > 0:
+            close = code.find(")" + code[idx + 1:paren] + '"', paren + 1)
+            return len(code) if close < 0 else close + paren - idx + 1
+    string = _DOUBLE_QUOTED.match(code, idx)
+    return string.end() if string else idx + 1
+
+def _skip_template(code: str, pos: int, stack: List[Tuple[str, int, str, int, int]],
+                   paren_depth: int, seg_start: int) -> int:
+    """Skips template-literal text from pos; on `${` pushes a template frame and returns after it."""
+    while True:
+        stop = _TEMPLATE_STOP.search(code, pos)
+        if stop is None:
+            return len(code)
+        token = stop.group()
+        if token == "`":
+            return stop.end()
+        if token == "${":
+            stack.append(("template", stop.start(), "", paren_depth, seg_start))
+            return stop.end()
+        pos = stop.end()
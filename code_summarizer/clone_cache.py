@@ -0,0 +1,142 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from .repo_downloader import shallow_checkout
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CLONE_CACHE_DIR = Path(".cache") / "clones"
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024 * 1024  # 5 GiB
+_INDEX_FILE = "index.json"
+
+def _dir_size(path: Path) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+class CloneCache:
+    """Shallow clones kept under `root`, keyed by repository URL.
+
+    Cached clones are updated with fetch + reset rather than re-cloned, and the least
+    recently used ones are deleted once the cache exceeds max_bytes (and, optionally,
+    max_entries). Works with any git URL, including file:// paths to bare repositories.
+    """
+
+    def __init__(self, root: Path = DEFAULT_CLONE_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES,
+                 max_entries: Optional[int] = None, filter_blobs: bool = False):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.filter_blobs = filter_blobs
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+        self._entries: Dict[str, Dict] = self._load_index()
+
+    def _load_index(self) -> Dict[str, Dict]:
+        path = self.root / _INDEX_FILE
+        if not path.exists():
+            return {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            log.warning(f"Ignoring unreadable clone cache index {path}: {e}")
+            return {}
+        return {key: entry for key, entry in entries.items() if (self.root / key).is_dir()}
+
+    def _save_index(self):
+        path = self.root / _INDEX_FILE
+        tmp_path = path.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f, indent=2)
+        tmp_path.replace(path)
+
+    @staticmethod
+    def key_for(repo_url: str) -> str:
+        slug = re.sub(r"[^A-Za-z0-9._-]+", "-", repo_url.rstrip("/").split("://")[-1])[-48:].strip("-.")
+        digest = hashlib.sha256(repo_url.encode("utf-8")).hexdigest()[:12]
+        return f"{slug}-{digest}"
+
+    def path_for(self, repo_url: str) -> Path:
+        return self.root / self.key_for(repo_url)
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _checkout_locked(self, repo_url: str, ref: Optional[str]) -> Optional[str]:
+        key = self.key_for(repo_url)
+        sha = shallow_checkout(repo_url, str(self.root / key), ref=ref, filter_blobs=self.filter_blobs)
+        if sha is None:
+            return None
+        size = _dir_size(self.root / key)
+        with self._lock:
+            self._entries[key] = {"repo_url": repo_url, "ref": ref, "commit_sha": sha,
+                                  "size_bytes": size, "last_used": time.time()}
+            self._save_index()
+        self.evict()
+        return sha
+
+    def checkout(self, repo_url: str, ref: Optional[str] = None) -> Optional[str]:
+        """Updates (or creates) the cached clone of repo_url at `ref`; returns the commit SHA or None."""
+        with self._key_lock(self.key_for(repo_url)):
+            return self._checkout_locked(repo_url, ref)
+
+    @contextmanager
+    def use(self, repo_url: str, ref: Optional[str] = None) -> Iterator[Optional[Path]]:
+        """Checks out `ref` and holds the clone (no eviction, no concurrent checkout) until the block exits.
+
+        Yields the clone directory, or None if the checkout failed.
+        """
+        with self._key_lock(self.key_for(repo_url)):
+            sha = self._checkout_locked(repo_url, ref)
+            yield self.path_for(repo_url) if sha is not None else None
+
+    def entries(self) -> List[Dict]:
+        with self._lock:
+            return [dict(entry, key=key) for key, entry in self._entries.items()]
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return sum(entry.get("size_bytes", 0) for entry in self._entries.values())
+
+    def evict(self) -> int:
+        """Deletes least recently used clones until the cache fits its budget. Clones in use are skipped."""
+        with self._lock:
+            candidates = sorted(self._entries, key=lambda key: self._entries[key].get("last_used", 0.0))
+        removed = 0
+        for key in candidates:
+            with self._lock:
+                total = sum(entry.get("size_bytes", 0) for entry in self._entries.values())
+                over_count = self.max_entries is not None and len(self._entries) > self.max_entries
+                if total <= self.max_bytes and not over_count:
+                    break
+            lock = self._key_lock(key)
+            if not lock.acquire(blocking=False):
+                continue
+            try:
+                shutil.rmtree(self.root / key, ignore_errors=True)
+                with self._lock:
+                    entry = self._entries.pop(key, {})
+                    self._save_index()
+                removed += 1
+                log.info(f"Evicted cached clone of {entry.get('repo_url', key)} "
+                         f"({entry.get('size_bytes', 0) / (1024 * 1024):.1f} MB).")
+            finally:
+                lock.release()
+        return removed
@@ -0,0 +1,191 @@
+import fnmatch
+import json
+import logging
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from git import Repo, GitCommandError, InvalidGitRepositoryError, NoSuchPathError
+
+from . import metrics
+from .language_parsers import SUPPORTED_EXTENSIONS
+
+log = logging.getLogger(__name__)
+
+# Repo-relative glob patterns. "name/" matches a directory at any depth; patterns
+# containing "/" match the whole relative path; anything else matches the file name.
+DEFAULT_EXCLUDES: Tuple[str, ...] = (
+    ".git/", "node_modules/", "bower_components/", "vendor/", "third_party/", "site-packages/",
+    ".venv/", "venv/", "__pycache__/", "dist/", "build/", "target/", ".next/", "coverage/",
+    "*.min.js", "*-min.js", "*.bundle.js", "*.chunk.js",
+    "*_pb2.py", "*_pb2_grpc.py", "*.pb.go", "*.pb.cc", "*.pb.h", "*.g.cs", "*.Designer.cs",
+)
+DEFAULT_MAX_FILE_BYTES = 1024 * 1024
+# Bytes sniffed from the top of each file for minified/generated detection.
+SNIFF_BYTES = 16 * 1024
+MINIFIED_MEAN_LINE_LENGTH = 300
+MINIFIED_MAX_LINE_LENGTH = 5000
+_GENERATED_MARKERS = re.compile(
+    rb"@generated|do not edit|code generated by|auto-?generated|generated by the protocol buffer compiler",
+    re.IGNORECASE,
+)
+_GENERATED_HEADER_BYTES = 2048
+
+# Skip reasons, in the order they are checked.
+SKIP_REASONS = ("unsupported", "gitignored", "excluded", "missing", "too_large", "minified", "generated")
+
+@dataclass
+class DiscoveryReport:
+    """Files selected for summarization, plus every skipped file and why."""
+    repo_dir: Path
+    files: List[Path] = field(default_factory=list)
+    # Repo-relative posix path -> reason (one of SKIP_REASONS).
+    skipped: Dict[str, str] = field(default_factory=dict)
+    source: str = "git"
+
+    def skip_counts(self) -> Dict[str, int]:
+        return dict(Counter(self.skipped.values()))
+
+    def summary(self) -> str:
+        counts = self.skip_counts()
+        details = ", ".join(f"{reason} {counts[reason]}" for reason in SKIP_REASONS if reason in counts)
+        return (f"{len(self.files)} files selected from {self.source} listing"
+                + (f"; skipped {len(self.skipped)} ({details})" if self.skipped else ""))
+
+    def write(self, path: Path):
+        """Writes the skip report as JSON (reason counts plus the skipped paths, grouped by reason)."""
+        by_reason: Dict[str, List[str]] = {}
+        for rel_path, reason in sorted(self.skipped.items()):
+            by_reason.setdefault(reason, []).append(rel_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"repo_dir": str(self.repo_dir), "selected": len(self.files),
+                       "skipped_counts": self.skip_counts(), "skipped": by_reason}, f, indent=2)
+
+def _split_nul(output: str) -> List[str]:
+    return [path for path in output.split("\0") if path]
+
+def _list_git_files(repo_dir: Path) -> Optional[Tuple[List[str], Set[str]]]:
+    """(tracked paths, tracked paths matched by .gitignore) from the git index, or None if not a repo."""
+    try:
+        git = Repo(repo_dir).git
+        tracked = _split_nul(git.ls_files("-z", "--cached"))
+        ignored = set(_split_nul(git.ls_files("-z", "--cached", "--ignored", "--exclude-standard")))
+        return tracked, ignored
+    except (InvalidGitRepositoryError, NoSuchPathError, GitCommandError) as e:
+        log.debug(f"Not listing {repo_dir} from git ({e}); walking the directory instead.")
+        return None
+
+def _walk_files(repo_dir: Path, excludes: Sequence[str]) -> List[str]:
+    paths = []
+    for root, dirs, files in os.walk(repo_dir):
+        rel_root = Path(root).relative_to(repo_dir)
+        # Prune excluded directories instead of descending into them.
+        dirs[:] = [d for d in dirs if not is_excluded((rel_root / d).as_posix() + "/", excludes)]
+        paths.extend((rel_root / name).as_posix() for name in files)
+    return paths
+
+def is_excluded(rel_path: str, excludes: Sequence[str]) -> bool:
+    """Matches a repo-relative posix path (directories end with "/") against exclude patterns."""
+    parts = rel_path.rstrip("/").split("/")
+    dir_parts = parts if rel_path.endswith("/") else parts[:-1]
+    for pattern in excludes:
+        if pattern.endswith("/"):
+            if any(fnmatch.fnmatchcase(part, pattern[:-1]) for part in dir_parts):
+                return True
+        elif "/" in pattern:
+            if fnmatch.fnmatchcase(rel_path, pattern.lstrip("/")):
+                return True
+        elif not rel_path.endswith("/") and fnmatch.fnmatchcase(parts[-1], pattern):
+            return True
+    return False
+
+def sniff_content(file_path: Path) -> Optional[str]:
+    """Returns "minified" or "generated" if the top of the file looks like either, else None."""
+    try:
+        with open(file_path, "rb") as f:
+            head = f.read(SNIFF_BYTES)
+    except OSError:
+        return None
+    if _GENERATED_MARKERS.search(head[:_GENERATED_HEADER_BYTES]):
+        return "generated"
+    lines = head.split(b"\n")
+    if len(head) == SNIFF_BYTES and len(lines) > 1:
+        # The last line is usually cut off by the sniff window.
+        lines = lines[:-1]
+    longest = max((len(line) for line in lines), default=0)
+    mean = len(head) / max(1, len(lines))
+    if longest > MINIFIED_MAX_LINE_LENGTH or (len(head) >= 1024 and mean > MINIFIED_MEAN_LINE_LENGTH):
+        return "minified"
+    return None
+
+def discover_files(repo_dir: Path, candidates: Optional[Iterable[Path]] = None,
+                   excludes: Sequence[str] = DEFAULT_EXCLUDES,
+                   max_file_bytes: int = DEFAULT_MAX_FILE_BYTES,
+                   skip_generated: bool = True) -> DiscoveryReport:
+    """Selects the source files worth summarizing in a checkout.
+
+    Files come from the git index (tracked files not matched by .gitignore), or a
+    directory walk honoring only the exclude list when repo_dir is not a git
+    repository. Unsupported extensions, excluded paths, files over max_file_bytes and,
+    with skip_generated, minified or generated files are skipped and recorded in the
+    report. If `candidates` is given
+    (e.g. the changed files of an incremental run), only those are considered.
+    """
+    repo_dir = Path(repo_dir)
+    with metrics.stage("discover"):
+        report = DiscoveryReport(repo_dir=repo_dir)
+        listed = _list_git_files(repo_dir)
+        if listed is None:
+            report.source = "directory"
+            paths, ignored = _walk_files(repo_dir, excludes), set()
+        else:
+            paths, ignored = listed
+        if candidates is not None:
+            wanted = set()
+            for candidate in candidates:
+                candidate = Path(candidate)
+                try:
+                    wanted.add(candidate.relative_to(repo_dir).as_posix())
+                except ValueError:
+                    wanted.add(candidate.as_posix())
+            paths = [path for path in paths if path in wanted]
+
+        for rel_path in paths:
+            if Path(rel_path).suffix.lower() not in SUPPORTED_EXTENSIONS:
+                report.skipped[rel_path] = "unsupported"
+                continue
+            if rel_path in ignored:
+                report.skipped[rel_path] = "gitignored"
+                continue
+            if is_excluded(rel_path, excludes):
+                report.skipped[rel_path] = "excluded"
+                continue
+            file_path = repo_dir / rel_path
+            try:
+                size = file_path.stat().st_size
+            except OSError:
+                # Submodules, sparse-checkout gaps and broken symlinks.
+                report.skipped[rel_path] = "missing"
+                continue
+            if not file_path.is_file():
+                report.skipped[rel_path] = "missing"
+                continue
+            if size > max_file_bytes:
+                report.skipped[rel_path] = "too_large"
+                continue
+            if skip_generated:
+                verdict = sniff_content(file_path)
+                if verdict is not None:
+                    report.skipped[rel_path] = verdict
+                    continue
+            report.files.append(file_path)
+    metrics.incr("files_discovered", len(report.files))
+    for reason, count in report.skip_counts().items():
+        metrics.incr("files_filtered", count, reason=reason)
+
+    log.info(f"File discovery in {repo_dir}: {report.summary()}.")
+    return report
@@ -0,0 +1,146 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Sequence
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = Path(".cache") / "embeddings.sqlite3"
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024  # 1 GiB
+# Evict down to this fraction of the cap so we don't evict on every insert.
+EVICTION_TARGET_RATIO = 0.9
+SUPPORTED_DTYPES = {"float32": np.float32, "float16": np.float16}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    key TEXT PRIMARY KEY,
+    dtype TEXT NOT NULL,
+    vector BLOB NOT NULL,
+    nbytes INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings(last_access);
+"""
+
+def make_cache_key(snippet: str, model_id: str, max_length: int, pooling: str) -> str:
+    """Content address for a snippet under a given model configuration."""
+    h = hashlib.sha256()
+    for part in (model_id, str(max_length), pooling, snippet):
+        h.update(part.encode("utf-8", errors="surrogatepass"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+class EmbeddingCache:
+    """On-disk, content-addressed embedding store with an LRU size cap.
+
+    Backed by SQLite in WAL mode, so several CLI processes can share one cache file. The
+    size is tracked as a running estimate (seeded from the table, grown by every insert) and
+    only re-read from the table when the estimate crosses the cap, so inserts stay O(rows).
+    """
+
+    def __init__(self, path: Path = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES,
+                 dtype: str = "float32", timeout: float = 30.0):
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"Unsupported cache dtype '{dtype}'. Expected one of {list(SUPPORTED_DTYPES)}.")
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.dtype = dtype
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), timeout=timeout, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+        self._total_bytes = self._stored_bytes()
+        log.info(f"Embedding cache opened at {self.path} (cap: {max_bytes / (1024 * 1024):.0f} MB, dtype: {dtype}).")
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Returns cached float32 vectors for the keys that are present and refreshes their LRU position."""
+        found: Dict[str, np.ndarray] = {}
+        unique_keys = list(dict.fromkeys(keys))
+        if not unique_keys:
+            return found
+        with self._lock:
+            try:
+                # Stay well under SQLite's bound-parameter limit.
+                for start in range(0, len(unique_keys), 500):
+                    chunk = unique_keys[start:start + 500]
+                    placeholders = ",".join("?" * len(chunk))
+                    rows = self._conn.execute(
+                        f"SELECT key, dtype, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                    ).fetchall()
+                    for key, dtype, blob in rows:
+                        found[key] = np.frombuffer(blob, dtype=SUPPORTED_DTYPES[dtype]).astype(np.float32)
+                if found:
+                    now = time.time()
+                    self._conn.executemany("UPDATE embeddings SET last_access = ? WHERE key = ?",
+                                           [(now, key) for key in found])
+                    self._conn.commit()
+            except sqlite3.Error as e:
+                log.warning(f"Embedding cache read failed: {e}")
+                found = {}
+            self.hits += sum(1 for key in keys if key in found)
+            self.misses += sum(1 for key in keys if key not in found)
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]):
+        if not items:
+            return
+        now = time.time()
+        np_dtype = SUPPORTED_DTYPES[self.dtype]
+        rows = []
+        for key, vector in items.items():
+            blob = np.asarray(vector, dtype=np_dtype).tobytes()
+            rows.append((key, self.dtype, blob, len(blob), now))
+        with self._lock:
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, dtype, vector, nbytes, last_access) VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+                self._conn.commit()
+                # Replaced keys are counted again; the estimate only errs high and is corrected on recount.
+                self._total_bytes += sum(row[3] for row in rows)
+                self._evict_if_needed()
+            except sqlite3.Error as e:
+                log.warning(f"Embedding cache write failed: {e}")
+
+    def _stored_bytes(self) -> int:
+        return self._conn.execute("SELECT COALESCE(SUM(nbytes), 0) FROM embeddings").fetchone()[0]
+
+    def _evict_if_needed(self):
+        if self._total_bytes <= self.max_bytes:
+            return
+        # Recount: the estimate may be high, and other processes sharing the file also insert and evict.
+        total = self._total_bytes = self._stored_bytes()
+        if total <= self.max_bytes:
+            return
+        target = int(self.max_bytes * EVICTION_TARGET_RATIO)
+        evicted = 0
+        cursor = self._conn.execute("SELECT key, nbytes FROM embeddings ORDER BY last_access ASC")
+        to_delete = []
+        for key, nbytes in cursor:
+            if total <= target:
+                break
+            to_delete.append((key,))
+            total -= nbytes
+            evicted += 1
+        self._conn.executemany("DELETE FROM embeddings WHERE key = ?", to_delete)
+        self._conn.commit()
+        self._total_bytes = total
+        log.info(f"Embedding cache evicted {evicted} least recently used entries.")
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,194 @@
+import copy
+import logging
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+# A small in-memory stand-in for the parts of the Firestore client this package uses:
+# documents, write batches, and simple queries (==/in filters, projection, ordering,
+# pagination and limits). Meant for tests and offline benchmarks; for full fidelity
+# point firebase_admin at the Firestore emulator via FIRESTORE_EMULATOR_HOST instead.
+
+class ServiceUnavailable(Exception):
+    """Named like google.api_core's error so the uploader treats it as transient."""
+
+class DocumentSnapshot:
+    def __init__(self, reference: "DocumentReference", data: Optional[Dict]):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def to_dict(self) -> Optional[Dict]:
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field: str) -> Any:
+        return (self._data or {}).get(field)
+
+class DocumentReference:
+    def __init__(self, client: "InMemoryFirestore", collection: str, doc_id: str):
+        self._client = client
+        self.collection_name = collection
+        self.id = doc_id
+
+    def set(self, data: Dict, merge: bool = False):
+        self._client._write(self.collection_name, self.id, data, merge)
+
+    def get(self) -> DocumentSnapshot:
+        return DocumentSnapshot(self, self._client._read(self.collection_name, self.id))
+
+    def delete(self):
+        self._client._delete(self.collection_name, self.id)
+
+class Query:
+    def __init__(self, client: "InMemoryFirestore", collection: str):
+        self._client = client
+        self._collection = collection
+        self._filters: List[Tuple[str, str, Any]] = []
+        self._fields: Optional[List[str]] = None
+        self._order: Optional[str] = None
+        self._start_after: Optional[Any] = None
+        self._limit: Optional[int] = None
+
+    def _copy(self) -> "Query":
+        clone = Query(self._client, self._collection)
+        clone._filters = list(self._filters)
+        clone._fields, clone._order = self._fields, self._order
+        clone._start_after, clone._limit = self._start_after, self._limit
+        return clone
+
+    def where(self, field: str, op: str, value: Any) -> "Query":
+        if op not in ("==", "in"):
+            raise ValueError(f"InMemoryFirestore supports only '==' and 'in' filters, got '{op}'.")
+        clone = self._copy()
+        clone._filters.append((field, op, value))
+        return clone
+
+    def select(self, field_paths: List[str]) -> "Query":
+        clone = self._copy()
+        clone._fields = list(field_paths)
+        return clone
+
+    def order_by(self, field: str) -> "Query":
+        clone = self._copy()
+        clone._order = field
+        return clone
+
+    def start_after(self, snapshot_or_values: Any) -> "Query":
+        clone = self._copy()
+        clone._start_after = snapshot_or_values
+        return clone
+
+    def limit(self, count: int) -> "Query":
+        clone = self._copy()
+        clone._limit = count
+        return clone
+
+    def _sort_key(self, doc_id: str, data: Dict):
+        if self._order in (None, "__name__"):
+            return doc_id
+        return (data.get(self._order), doc_id)
+
+    def stream(self) -> Iterator[DocumentSnapshot]:
+        rows = []
+        for doc_id, data in self._client._scan(self._collection):
+            if all((data.get(f) == v) if op == "==" else (data.get(f) in v) for f, op, v in self._filters):
+                rows.append((doc_id, data))
+        rows.sort(key=lambda row: self._sort_key(*row))
+        if self._start_after is not None:
+            marker = self._start_after
+            if isinstance(marker, DocumentSnapshot):
+                after = self._sort_key(marker.id, marker._data or {})
+            else:
+                after = marker
+            rows = [row for row in rows if self._sort_key(*row) > after]
+        if self._limit is not None:
+            rows = rows[:self._limit]
+        for doc_id, data in rows:
+            if self._fields is not None:
+                data = {k: v for k, v in data.items() if k in self._fields}
+            yield DocumentSnapshot(DocumentReference(self._client, self._collection, doc_id), data)
+
+    def get(self) -> List[DocumentSnapshot]:
+        return list(self.stream())
+
+class CollectionReference(Query):
+    def document(self, doc_id: Optional[str] = None) -> DocumentReference:
+        return DocumentReference(self._client, self._collection, doc_id or self._client._new_id())
+
+class WriteBatch:
+    def __init__(self, client: "InMemoryFirestore"):
+        self._client = client
+        self._ops: List[Tuple[str, DocumentReference, Optional[Dict], bool]] = []
+
+    def set(self, reference: DocumentReference, data: Dict, merge: bool = False):
+        self._ops.append(("set", reference, data, merge))
+
+    def delete(self, reference: DocumentReference):
+        self._ops.append(("delete", reference, None, False))
+
+    def commit(self):
+        if len(self._ops) > 500:
+            raise ValueError("A Firestore batch may contain at most 500 operations.")
+        self._client._apply(self._ops)
+
+class InMemoryFirestore:
+    """Thread-safe fake Firestore client. `fail_next_commits` makes that many batch commits raise a transient error."""
+
+    def __init__(self, fail_next_commits: int = 0):
+        self._lock = threading.Lock()
+        self._data: Dict[str, Dict[str, Dict]] = {}
+        self._counter = 0
+        self.fail_next_commits = fail_next_commits
+        self.commits = 0
+
+    def collection(self, name: str) -> CollectionReference:
+        return CollectionReference(self, name)
+
+    def batch(self) -> WriteBatch:
+        return WriteBatch(self)
+
+    def _new_id(self) -> str:
+        with self._lock:
+            self._counter += 1
+            return f"auto-{self._counter:012d}"
+
+    def _write(self, collection: str, doc_id: str, data: Dict, merge: bool):
+        with self._lock:
+            docs = self._data.setdefault(collection, {})
+            if merge and doc_id in docs:
+                docs[doc_id].update(copy.deepcopy(data))
+            else:
+                docs[doc_id] = copy.deepcopy(data)
+
+    def _read(self, collection: str, doc_id: str) -> Optional[Dict]:
+        with self._lock:
+            return self._data.get(collection, {}).get(doc_id)
+
+    def _delete(self, collection: str, doc_id: str):
+        with self._lock:
+            self._data.get(collection, {}).pop(doc_id, None)
+
+    def _scan(self, collection: str) -> List[Tuple[str, Dict]]:
+        with self._lock:
+            return list(self._data.get(collection, {}).items())
+
+    def _apply(self, ops):
+        with self._lock:
+            if self.fail_next_commits > 0:
+                self.fail_next_commits -= 1
+                raise ServiceUnavailable("Simulated transient Firestore failure.")
+            self.commits += 1
+        for op, reference, data, merge in ops:
+            if op == "set":
+                self._write(reference.collection_name, reference.id, data, merge)
+            else:
+                self._delete(reference.collection_name, reference.id)
+
+    def count(self, collection: str) -> int:
+        with self._lock:
+            return len(self._data.get(collection, {}))
@@ -1,69 +1,330 @@
-import firebase_admin
-from firebase_admin import credentials, firestore
 import os
+import json
+import hashlib
 import logging
-from typing import List, Dict
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Iterable, Iterator, List, Dict, Optional, Tuple
+
+import numpy as np
+
+from . import metrics
 
 log = logging.getLogger(__name__)
 
+COLLECTION = "functions"
+# One small document per repository, written after a successful run (see write_repo_manifest).
+MANIFEST_COLLECTION = "repo_manifests"
+REQUIRED_KEYS = ['repo_url', 'file_path', 'language', 'function_code', 'summary']
+# Firestore caps "in" filters and write batches.
+_IN_FILTER_LIMIT = 10
+_BATCH_LIMIT = 500
+DEFAULT_PAGE_SIZE = 500
+DEFAULT_MAX_IN_FLIGHT = 4
+DEFAULT_MAX_RETRIES = 5
+# google.api_core exception names (plus builtins) worth retrying; matched by name so
+# fake clients and the emulator can raise them without importing google libraries.
+_TRANSIENT_ERRORS = frozenset({
+    "ServiceUnavailable", "DeadlineExceeded", "InternalServerError", "TooManyRequests",
+    "ResourceExhausted", "Aborted", "GatewayTimeout", "RetryError",
+    "ConnectionError", "TimeoutError",
+})
+
+# Firebase is initialized on first use (see init_firestore), not at import time.
 FIRESTORE_INITIALIZED = False
 db = None
+_init_lock = threading.Lock()
+_init_attempted = False
 
-firebase_secret_json = os.environ.get('FIREBASE_SERVICE_ACCOUNT_JSON')
+def init_firestore() -> bool:
+    """Initializes the Firebase Admin SDK and Firestore client once, thread-safely."""
+    global FIRESTORE_INITIALIZED, db, _init_attempted
+    if _init_attempted:
+        return FIRESTORE_INITIALIZED
+    with _init_lock:
+        if _init_attempted:
+            return FIRESTORE_INITIALIZED
+        try:
+            firebase_secret_json = os.environ.get('FIREBASE_SERVICE_ACCOUNT_JSON')
+            if not firebase_secret_json:
+                log.warning("Firebase Secret (FIREBASE_SERVICE_ACCOUNT_JSON) not found in environment. Firebase disabled.")
+                return False
+            try:
+                import firebase_admin
+                from firebase_admin import credentials, firestore
+                # Convert the JSON string from the env var into a dictionary
+                credentials_dict = json.loads(firebase_secret_json)
+                if not firebase_admin._apps:
+                    cred = credentials.Certificate(credentials_dict)
+                    firebase_admin.initialize_app(cred)
+                    log.info("Firebase Admin SDK initialized from Secret.")
+                else:
+                    log.info("Firebase Admin SDK already initialized.")
+                db = firestore.client()
+                FIRESTORE_INITIALIZED = True
+            except Exception as e:
+                log.error(f"Failed to initialize Firebase from Secret: {e}", exc_info=True)
+        finally:
+            _init_attempted = True
+    return FIRESTORE_INITIALIZED
 
-if firebase_secret_json:
-    try:
-        import json
-        # Convert the JSON string from the env var into a dictionary
-        credentials_dict = json.loads(firebase_secret_json)
-        if not firebase_admin._apps:
-            cred = credentials.Certificate(credentials_dict)
-            firebase_admin.initialize_app(cred)
-            log.info("Firebase Admin SDK initialized from Secret.")
-        else:
-            log.info("Firebase Admin SDK already initialized.")
-        db = firestore.client()
-        FIRESTORE_INITIALIZED = True
-    except Exception as e:
-        log.error(f"Failed to initialize Firebase from Secret: {e}", exc_info=True)
-else:
-    log.warning("Firebase Secret (FIREBASE_SERVICE_ACCOUNT_JSON) not found in environment. Firebase disabled.")
+def get_firestore_client():
+    """Returns the Firestore client, initializing it on first use, or None if unavailable."""
+    return db if init_firestore() else None
 
 def is_firestore_available() -> bool:
-    return FIRESTORE_INITIALIZED and db is not None
+    return init_firestore() and db is not None
+
+def make_document_id(repo_url: str, file_path: str, function_code: str) -> str:
+    """Deterministic document ID, so re-uploading the same function overwrites instead of duplicating."""
+    function_hash = hashlib.sha256(function_code.encode("utf-8", errors="surrogatepass")).hexdigest()
+    key = "\0".join((repo_url, file_path, function_hash))
+    return hashlib.sha256(key.encode("utf-8", errors="surrogatepass")).hexdigest()
+
+def _prepare_document(summary: Dict) -> Optional[Tuple[str, Dict]]:
+    if not all(key in summary for key in REQUIRED_KEYS):
+        log.warning(f"Skipped upload: Missing required keys. Has: {list(summary.keys())}")
+        return None
+    document = dict(summary)
+    # Records keep embeddings as float32 arrays; Firestore stores them as arrays of doubles.
+    if isinstance(document.get("embedding"), np.ndarray):
+        document["embedding"] = document["embedding"].tolist()
+    if "embedding" in document and not isinstance(document["embedding"], list):
+        log.warning(f"Removing invalid non-list embedding before upload for {document.get('file_path')}")
+        del document["embedding"]
+    doc_id = make_document_id(document["repo_url"], document["file_path"], document["function_code"])
+    return doc_id, document
+
+def _is_transient(error: BaseException) -> bool:
+    return any(cls.__name__ in _TRANSIENT_ERRORS for cls in type(error).__mro__)
+
+def _commit_with_retry(client, documents: List[Tuple[str, Dict]], max_retries: int, base_delay: float) -> int:
+    """Writes one batch (set = upsert), retrying transient failures with jittered exponential backoff."""
+    attempt = 0
+    while True:
+        try:
+            with metrics.stage("upload"):
+                batch = client.batch()
+                collection = client.collection(COLLECTION)
+                for doc_id, document in documents:
+                    batch.set(collection.document(doc_id), document)
+                batch.commit()
+            metrics.incr("documents_uploaded", len(documents))
+            return len(documents)
+        except Exception as e:
+            if attempt >= max_retries or not _is_transient(e):
+                log.error(f"Failed to upload a batch of {len(documents)} summaries after {attempt + 1} attempt(s): {e}")
+                metrics.incr("upload_failed_documents", len(documents))
+                return 0
+            delay = base_delay * (2 ** attempt) * (0.5 + random.random())
+            attempt += 1
+            metrics.incr("upload_retries", error=type(e).__name__)
+            log.warning(f"Transient Firestore error ({type(e).__name__}); retrying batch in {delay:.2f}s "
+                        f"(attempt {attempt}/{max_retries}).")
+            time.sleep(delay)
+
+def upload_summaries(summaries: Iterable[Dict], client: Any = None, batch_size: int = _BATCH_LIMIT,
+                     max_in_flight: int = DEFAULT_MAX_IN_FLIGHT, max_retries: int = DEFAULT_MAX_RETRIES,
+                     base_delay: float = 0.5) -> int:
+    """Bulk-upserts summaries in Firestore batches, keeping up to max_in_flight batches committing concurrently.
+
+    `client` defaults to the initialized Firestore client; any object with the same
+    batch()/collection() interface (the emulator, or InMemoryFirestore) works.
+    Returns the number of documents written.
+    """
+    if client is None:
+        client = get_firestore_client()
+        if client is None:
+            log.debug("Firestore unavailable, skipping upload.")
+            return 0
+    batch_size = max(1, min(batch_size, _BATCH_LIMIT))
+    max_in_flight = max(1, max_in_flight)
+
+    uploaded = 0
+    batches_done = 0
+    in_flight = set()
+
+    def collect(done):
+        nonlocal uploaded, batches_done
+        for future in done:
+            uploaded += future.result()
+            batches_done += 1
+            if batches_done % 10 == 0:
+                log.info(f"Uploaded {uploaded} summaries ({batches_done} batches)...")
+
+    with ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="firestore-upload") as executor:
+        documents: List[Tuple[str, Dict]] = []
+        for summary in summaries:
+            prepared = _prepare_document(summary)
+            if prepared is None:
+                continue
+            documents.append(prepared)
+            if len(documents) == batch_size:
+                if len(in_flight) >= max_in_flight:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    collect(done)
+                in_flight.add(executor.submit(_commit_with_retry, client, documents, max_retries, base_delay))
+                documents = []
+        if documents:
+            in_flight.add(executor.submit(_commit_with_retry, client, documents, max_retries, base_delay))
+        collect(wait(in_flight).done)
+
+    log.info(f"Finished uploading {uploaded} summaries to Firestore in {batches_done} batches.")
+    return uploaded
 
 def upload_summary_to_firebase(summary: Dict):
     if not is_firestore_available():
         log.debug("Firestore unavailable, skipping upload.")
         return
 
-    required_keys = ['repo_url', 'file_path', 'language', 'function_code', 'summary']
-    if not all(key in summary for key in required_keys):
-        log.warning(f"Skipped upload: Missing required keys. Has: {list(summary.keys())}")
+    prepared = _prepare_document(summary)
+    if prepared is None:
         return
-
+    doc_id, document = prepared
     try:
-        if "embedding" in summary and not isinstance(summary["embedding"], list):
-            log.warning(f"Removing invalid non-list embedding before upload for {summary.get('file_path')}")
-            del summary["embedding"]
-
-        doc_ref = db.collection("functions").document()
-        doc_ref.set(summary)
+        db.collection(COLLECTION).document(doc_id).set(document)
         log.debug(f"Uploaded summary for: {summary.get('file_path')}")
     except Exception as e:
         log.error(f"Error uploading summary for {summary.get('file_path')} to Firebase: {e}", exc_info=True)
 
-def get_summaries_by_repo(repo_url: str) -> List[Dict]:
-    if not is_firestore_available():
+def _resolve_client(client: Any):
+    if client is not None:
+        return client
+    return get_firestore_client()
+
+def iter_summaries_by_repo(repo_url: str, fields: Optional[List[str]] = None, limit: Optional[int] = None,
+                           page_size: int = DEFAULT_PAGE_SIZE, client: Any = None) -> Iterator[Dict]:
+    """Streams a repo's stored functions page by page, ordered by document ID.
+
+    `fields` projects each document to those fields (e.g. ["file_path", "summary"] to leave
+    out function code and embeddings); `limit` caps the number of documents returned.
+    Each page is a separate query resumed after the previous page's last document.
+    """
+    client = _resolve_client(client)
+    if client is None:
         log.warning("Firestore unavailable, cannot fetch summaries.")
-        return []
-    summaries = []
+        return
+    query = client.collection(COLLECTION).where("repo_url", "==", repo_url).order_by("__name__")
+    if fields is not None:
+        query = query.select(list(fields))
+    returned = 0
+    last = None
+    while limit is None or returned < limit:
+        count = page_size if limit is None else min(page_size, limit - returned)
+        page = query if last is None else query.start_after(last)
+        docs = list(page.limit(count).stream())
+        for doc in docs:
+            yield doc.to_dict()
+        returned += len(docs)
+        if len(docs) < count:
+            break
+        last = docs[-1]
+
+def get_summaries_by_repo(repo_url: str, fields: Optional[List[str]] = None, limit: Optional[int] = None,
+                          page_size: int = DEFAULT_PAGE_SIZE, client: Any = None) -> List[Dict]:
+    """Fetches a repo's stored functions; see iter_summaries_by_repo for projection and paging."""
     try:
         log.info(f"Querying Firestore for repo_url: {repo_url}")
-        docs_stream = db.collection("functions").where("repo_url", "==", repo_url).stream()
-        summaries = [doc.to_dict() for doc in docs_stream]
+        summaries = list(iter_summaries_by_repo(repo_url, fields=fields, limit=limit, page_size=page_size,
+                                                client=client))
         log.info(f"Found {len(summaries)} existing summaries in Firestore for {repo_url}.")
     except Exception as e:
         log.error(f"Error fetching summaries for {repo_url} from Firebase: {e}", exc_info=True)
         return []
-    return summaries
\ No newline at end of file
+    return summaries
+
+def has_summaries(repo_url: str, client: Any = None) -> bool:
+    """Whether any function is stored for the repo, reading at most one projected document."""
+    return bool(get_summaries_by_repo(repo_url, fields=["repo_url"], limit=1, client=client))
+
+def manifest_document_id(repo_url: str) -> str:
+    return hashlib.sha256(repo_url.encode("utf-8", errors="surrogatepass")).hexdigest()
+
+def write_repo_manifest(repo_url: str, commit_sha: Optional[str], function_count: int,
+                        model_id: str, client: Any = None) -> bool:
+    """Records a completed run for a repository: commit SHA, function count, model ID and timestamp."""
+    client = _resolve_client(client)
+    if client is None:
+        log.debug("Firestore unavailable, skipping manifest write.")
+        return False
+    manifest = {
+        "repo_url": repo_url,
+        "commit_sha": commit_sha,
+        "function_count": function_count,
+        "model_id": model_id,
+        "updated_at": time.time(),
+    }
+    try:
+        client.collection(MANIFEST_COLLECTION).document(manifest_document_id(repo_url)).set(manifest)
+        log.info(f"Wrote manifest for {repo_url} ({function_count} functions"
+                 f"{f' at {commit_sha[:12]}' if commit_sha else ''}).")
+        return True
+    except Exception as e:
+        log.error(f"Error writing manifest for {repo_url} to Firebase: {e}", exc_info=True)
+        return False
+
+def get_repo_manifest(repo_url: str, client: Any = None) -> Optional[Dict]:
+    """The repo's manifest document (a single read), or None if there is none."""
+    client = _resolve_client(client)
+    if client is None:
+        return None
+    try:
+        snapshot = client.collection(MANIFEST_COLLECTION).document(manifest_document_id(repo_url)).get()
+    except Exception as e:
+        log.error(f"Error reading manifest for {repo_url} from Firebase: {e}", exc_info=True)
+        return None
+    return snapshot.to_dict() if snapshot.exists else None
+
+def is_manifest_fresh(manifest: Optional[Dict], commit_sha: Optional[str] = None,
+                      model_id: Optional[str] = None) -> bool:
+    """True if the manifest covers `commit_sha` and `model_id` (each checked only when given)."""
+    if not manifest:
+        return False
+    if commit_sha is not None and manifest.get("commit_sha") != commit_sha:
+        return False
+    if model_id is not None and manifest.get("model_id") != model_id:
+        return False
+    return True
+
+def delete_summaries(repo_url: str, file_paths: Optional[List[str]] = None) -> Optional[int]:
+    """Deletes stored functions for a repo, restricted to `file_paths` when given.
+
+    Returns the count deleted, or None if the deletion failed part-way.
+    """
+    if not is_firestore_available():
+        log.debug("Firestore unavailable, skipping deletions.")
+        return 0
+    if file_paths is not None and not file_paths:
+        return 0
+
+    base_query = db.collection(COLLECTION).where("repo_url", "==", repo_url)
+    if file_paths is None:
+        queries = [base_query]
+    else:
+        queries = [base_query.where("file_path", "in", file_paths[i:i + _IN_FILTER_LIMIT])
+                   for i in range(0, len(file_paths), _IN_FILTER_LIMIT)]
+
+    deleted = 0
+    try:
+        batch, pending = db.batch(), 0
+        for query in queries:
+            for doc in query.select(["file_path"]).stream():
+                batch.delete(doc.reference)
+                pending += 1
+                if pending == _BATCH_LIMIT:
+                    batch.commit()
+                    deleted += pending
+                    batch, pending = db.batch(), 0
+        if pending:
+            batch.commit()
+            deleted += pending
+        if file_paths is None:
+            # Nothing is stored for the repo any more; the next successful run writes a new manifest.
+            db.collection(MANIFEST_COLLECTION).document(manifest_document_id(repo_url)).delete()
+        log.info(f"Deleted {deleted} stale summaries for {repo_url} from Firestore.")
+    except Exception as e:
+        log.error(f"Error deleting summaries for {repo_url} from Firebase: {e}", exc_info=True)
+        return None
+    return deleted
\ No newline at end of file
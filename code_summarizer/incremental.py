@@ -0,0 +1,81 @@
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .language_parsers import SUPPORTED_EXTENSIONS
+from .repo_downloader import diff_commits
+
+log = logging.getLogger(__name__)
+
+DEFAULT_MANIFEST_PATH = Path("outputs") / "index_manifest.json"
+
+@dataclass
+class IncrementalPlan:
+    """What an indexing run has to do for one repository."""
+    repo_url: str
+    head_sha: Optional[str]
+    base_sha: Optional[str] = None
+    full: bool = True
+    # Absolute/clone-prefixed paths, matching the `file_path` stored on summaries.
+    files_to_index: List[Path] = field(default_factory=list)
+    # Stored `file_path` values whose functions must be removed before (re)indexing.
+    stale_file_paths: List[str] = field(default_factory=list)
+
+    @property
+    def up_to_date(self) -> bool:
+        return not self.full and not self.files_to_index and not self.stale_file_paths
+
+def load_manifest(manifest_path: Path = DEFAULT_MANIFEST_PATH) -> Dict[str, Dict]:
+    if not manifest_path.exists():
+        return {}
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        log.warning(f"Ignoring unreadable index manifest {manifest_path}: {e}")
+        return {}
+
+def record_indexed_commit(repo_url: str, commit_sha: str, manifest_path: Path = DEFAULT_MANIFEST_PATH):
+    """Stores the last successfully indexed commit for a repository."""
+    manifest = load_manifest(manifest_path)
+    manifest[repo_url] = {"commit_sha": commit_sha, "indexed_at": time.time()}
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = manifest_path.with_suffix(manifest_path.suffix + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    tmp_path.replace(manifest_path)
+    log.info(f"Recorded indexed commit {commit_sha[:12]} for {repo_url}.")
+
+def _is_supported(path: str) -> bool:
+    return Path(path).suffix.lower() in SUPPORTED_EXTENSIONS
+
+def plan_incremental(repo_dir: Path, repo_url: str, head_sha: Optional[str],
+                     manifest_path: Path = DEFAULT_MANIFEST_PATH) -> IncrementalPlan:
+    """Compares the manifest's last indexed commit with `head_sha` and lists the work to do.
+
+    Falls back to a full re-index (dropping everything previously stored for the repo)
+    when there is no usable previous commit.
+    """
+    previous = load_manifest(manifest_path).get(repo_url, {})
+    base_sha = previous.get("commit_sha")
+    plan = IncrementalPlan(repo_url=repo_url, head_sha=head_sha, base_sha=base_sha)
+
+    if base_sha and head_sha:
+        diff = diff_commits(str(repo_dir), base_sha, head_sha)
+        if diff is not None:
+            changed, deleted = diff
+            changed = [p for p in changed if _is_supported(p)]
+            deleted = [p for p in deleted if _is_supported(p)]
+            plan.full = False
+            plan.files_to_index = [repo_dir / p for p in changed if (repo_dir / p).is_file()]
+            # Modified files are replaced wholesale, so their old functions are stale too.
+            plan.stale_file_paths = [(repo_dir / p).as_posix() for p in changed + deleted]
+            log.info(f"Incremental plan for {repo_url} ({base_sha[:12]}..{head_sha[:12]}): "
+                     f"{len(plan.files_to_index)} files to index, {len(deleted)} deleted.")
+            return plan
+
+    log.info(f"No usable previous index for {repo_url}; performing a full re-index.")
+    return plan
@@ -1,76 +1,236 @@
-import os
 from pathlib import Path
-from typing import List, Tuple, Dict, Optional
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
 import re
 import ast
+import bisect
 import logging
+import time
+
+from . import metrics
+from .brace_scanner import BRACE_LANGUAGES, ScanBudgetExceeded, scan_functions
 
 log = logging.getLogger(__name__)
 
-# Note: ast.get_source_segment requires Python 3.8+
+# Note: end_lineno/end_col_offset on ast nodes require Python 3.8+
 SUPPORTED_EXTENSIONS: Dict[str, str] = {
     ".py": "python", ".js": "javascript", ".java": "java", ".cpp": "cpp",
     ".c": "c", ".cs": "csharp", ".ts": "typescript", ".go": "go"
 }
 
-# Regex patterns (simplified, may need adjustment per language)
-# WARNING: Regex-based parsing is fragile.
-patterns = {
-    "javascript": r"^(?:async\s+)?function\s+\w+\s*\([^)]*\)\s*\{[\s\S]*?^\}|(?:export\s+)?(?:const|let|var)\s+\w+\s*=\s*(?:async\s*)?\([^)]*\)\s*=>\s*\{[\s\S]*?^\}",
-    "typescript": r"^(?:async\s+)?function\s+\w+\s*\([^)]*\)\s*\{[\s\S]*?^\}|(?:export\s+)?(?:const|let|var)\s+\w+\s*=\s*(?:async\s*)?\([^)]*\)\s*=>\s*\{[\s\S]*?^\}",
-    "java": r"^(?:public|private|protected|static|\s)*\s*[\w<>\[\]]+\s+\w+\s*\([^)]*\)\s*(?:throws\s+[\w,\s]+)?\s*\{[\s\S]*?^\}",
-    "cpp": r"^(?:[\w:]+)\s+\**\s*[\w:]+\s*\([^)]*\)\s*(?:const)?\s*\{[\s\S]*?^\}",
-    "c": r"^(?:[\w:]+)\s+\**\s*[\w:]+\s*\([^)]*\)\s*(?:const)?\s*\{[\s\S]*?^\}",
-    "csharp": r"^(?:public|private|protected|internal|static|virtual|async|override|\s)*\s*[\w<>\[\],?]+\s+\w+\s*\([^)]*\)\s*\{[\s\S]*?^\}",
-    "go": r"^func(?:\s*\(\s*\w+\s+\*?\w+\s*\))?\s+\w+\s*\([^)]*\)\s*(?:[\w\s,()]+)?\s*\{[\s\S]*?^\}"
-}
+# Files larger than this are skipped, and a single file may not scan for longer than
+# MAX_SCAN_SECONDS; both guard workers against generated or minified inputs.
+MAX_FILE_BYTES = 2 * 1024 * 1024
+MAX_SCAN_SECONDS = 5.0
+
+# "all" keeps nested functions; "outermost" drops those already contained in a parent function.
+PYTHON_MODES = ("all", "outermost")
+DEFAULT_PYTHON_MODE = "all"
+_PYTHON_FUNCTION_NODES = (ast.FunctionDef, ast.AsyncFunctionDef)
+
+_LINE_BREAK = re.compile(r"\r\n|\r|\n")
+
+class SnippetSpan(NamedTuple):
+    """A function's source text and where it sits in its file (1-based lines, end-exclusive bytes).
+
+    Line endings are kept as in the file, so for UTF-8 files start_byte/end_byte index the raw bytes.
+    """
+    text: str
+    name: str
+    start_line: int
+    end_line: int
+    start_byte: int
+    end_byte: int
+
+class SnippetRecord(NamedTuple):
+    """A snippet ready for embedding: where it came from, its language, text and function name/lines."""
+    file_path: str
+    language: str
+    snippet: str
+    name: Optional[str] = None
+    start_line: Optional[int] = None
+    end_line: Optional[int] = None
+
+class LineIndex:
+    """Line-start table for one source string: line numbers and byte offsets without re-splitting."""
+
+    def __init__(self, source: str):
+        self.source = source
+        self.line_starts = [0] + [m.end() for m in _LINE_BREAK.finditer(source)]
+        self.is_ascii = source.isascii()
+        self._line_byte_starts: Optional[List[int]] = None
+        self._last_offset = 0
+        self._last_byte = 0
+
+    def line_of(self, offset: int) -> int:
+        return bisect.bisect_right(self.line_starts, offset)
+
+    def offset(self, lineno: int, col_byte: int) -> int:
+        """Character offset of an ast-style (1-based line, UTF-8 column) position."""
+        line_start = self.line_starts[lineno - 1]
+        if self.is_ascii:
+            return line_start + col_byte
+        # A column of n bytes never spans more than n characters.
+        prefix = self.source[line_start:line_start + col_byte].encode("utf-8", errors="surrogatepass")
+        return line_start + len(prefix[:col_byte].decode("utf-8", errors="ignore"))
+
+    def byte_offset(self, offset: int) -> int:
+        if self.is_ascii:
+            return offset
+        if offset >= self._last_offset and offset - self._last_offset < 4096:
+            # Spans are usually requested in order, so encode only the gap since the last query.
+            self._last_byte += len(self.source[self._last_offset:offset].encode("utf-8", errors="surrogatepass"))
+            self._last_offset = offset
+            return self._last_byte
+        if self._line_byte_starts is None:
+            starts, total = [], 0
+            bounds = self.line_starts + [len(self.source)]
+            for begin, end in zip(bounds, bounds[1:]):
+                starts.append(total)
+                total += len(self.source[begin:end].encode("utf-8", errors="surrogatepass"))
+            self._line_byte_starts = starts or [0]
+        line = self.line_of(offset) - 1
+        line_start = self.line_starts[line]
+        self._last_offset = offset
+        self._last_byte = self._line_byte_starts[line] + len(self.source[line_start:offset].encode("utf-8", errors="surrogatepass"))
+        return self._last_byte
+
+    def span(self, start: int, end: int, name: str) -> SnippetSpan:
+        return SnippetSpan(
+            text=self.source[start:end],
+            name=name,
+            start_line=self.line_of(start),
+            end_line=self.line_of(max(start, end - 1)),
+            start_byte=self.byte_offset(start),
+            end_byte=self.byte_offset(end),
+        )
 
 def get_language_by_extension(file_path: Path) -> Optional[str]:
     return SUPPORTED_EXTENSIONS.get(file_path.suffix.lower())
 
-def extract_python_functions(file_path: Path) -> List[str]:
-    functions = []
+def _read_source(file_path: Path) -> Optional[str]:
+    """Decodes a source file as UTF-8, keeping its line endings so span offsets match the file.
+
+    Undecodable bytes are dropped; spans of such files are offsets into the decoded text.
+    """
+    try:
+        size = file_path.stat().st_size
+        if size > MAX_FILE_BYTES:
+            log.warning(f"Skipping file {file_path}: {size} bytes exceeds the {MAX_FILE_BYTES} byte limit.")
+            metrics.incr("files_skipped", reason="too_large")
+            return None
+        with open(file_path, 'r', encoding='utf-8', errors='ignore', newline='') as f:
+            return f.read()
+    except (FileNotFoundError, UnicodeDecodeError, OSError) as e:
+        log.warning(f"Skipping file {file_path} due to read error: {e}")
+        metrics.incr("files_skipped", reason="read_error")
+        return None
+
+def _iter_python_functions(tree: ast.AST, mode: str) -> Iterator[Tuple[ast.AST, str]]:
+    """Yields (function node, qualified name) in source order, following __qualname__ conventions."""
+    # Stack entries: (node, qualname prefix, inside a function)
+    stack = [(child, "", False) for child in reversed(list(ast.iter_child_nodes(tree)))]
+    while stack:
+        node, prefix, in_function = stack.pop()
+        if isinstance(node, _PYTHON_FUNCTION_NODES):
+            qualname = prefix + node.name
+            if mode == "all" or not in_function:
+                yield node, qualname
+            if mode == "outermost":
+                continue
+            child_prefix, child_in_function = qualname + ".<locals>.", True
+        elif isinstance(node, ast.ClassDef):
+            child_prefix, child_in_function = prefix + node.name + ".", in_function
+        else:
+            child_prefix, child_in_function = prefix, in_function
+        stack.extend((child, child_prefix, child_in_function)
+                     for child in reversed(list(ast.iter_child_nodes(node))))
+
+def extract_python_spans(file_path: Path, source: Optional[str] = None,
+                         mode: str = DEFAULT_PYTHON_MODE) -> List[SnippetSpan]:
+    """Extracts sync and async functions with qualified names.
+
+    mode="all" returns nested functions as well; mode="outermost" skips functions
+    whose source is already contained in an enclosing function.
+    """
+    if mode not in PYTHON_MODES:
+        raise ValueError(f"Unknown Python extraction mode '{mode}'. Expected one of {PYTHON_MODES}.")
+    spans = []
     try:
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            source = f.read()
+        if source is None:
+            source = _read_source(file_path)
+            if source is None:
+                return []
         tree = ast.parse(source, filename=str(file_path))
-        for node in ast.walk(tree):
-            if isinstance(node, ast.FunctionDef):
-                try:
-                    segment = ast.get_source_segment(source, node)
-                    if segment:
-                        functions.append(segment)
-                except Exception: # Ignore segment extraction errors
-                    pass
-    except (FileNotFoundError, SyntaxError, UnicodeDecodeError) as e:
+        index = LineIndex(source)
+        for node, qualname in _iter_python_functions(tree, mode):
+            try:
+                start = index.offset(node.lineno, node.col_offset)
+                end = index.offset(node.end_lineno, node.end_col_offset)
+                if end > start:
+                    spans.append(index.span(start, end, qualname))
+            except (IndexError, TypeError): # Ignore nodes without usable positions
+                pass
+    except (SyntaxError, ValueError) as e:
         log.warning(f"Skipping file {file_path} due to parsing error: {e}")
+        metrics.incr("files_skipped", reason="syntax_error")
     except Exception as e:
         log.error(f"Unexpected error parsing Python file {file_path}: {e}", exc_info=True)
-    return functions
+    return spans
 
-def extract_functions_by_regex(file_path: Path, pattern: str) -> List[str]:
+def extract_python_functions(file_path: Path, mode: str = DEFAULT_PYTHON_MODE) -> List[str]:
+    return [span.text for span in extract_python_spans(file_path, mode=mode)]
+
+def extract_brace_spans(file_path: Path, language: str, source: Optional[str] = None,
+                        max_seconds: float = MAX_SCAN_SECONDS) -> List[SnippetSpan]:
+    """Finds functions in C-family, JS/TS and Go files with the linear-time brace scanner."""
+    if source is None:
+        source = _read_source(file_path)
+        if source is None:
+            return []
     try:
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            code = f.read()
-        return re.findall(pattern, code, re.DOTALL | re.MULTILINE)
-    except (FileNotFoundError, UnicodeDecodeError) as e:
-         log.warning(f"Skipping file {file_path} due to read error: {e}")
-         return []
+        found = scan_functions(source, language, deadline=time.monotonic() + max_seconds)
+    except ScanBudgetExceeded as e:
+        log.warning(f"Scan of {file_path} exceeded {max_seconds}s; keeping {len(e.spans)} functions found so far.")
+        metrics.incr("scan_budget_exceeded", language=language)
+        found = e.spans
     except Exception as e:
-        log.error(f"Failed regex extraction on {file_path}: {e}", exc_info=True)
+        log.error(f"Failed brace scan on {file_path}: {e}", exc_info=True)
         return []
+    index = LineIndex(source)
+    return [index.span(start, end, name) for start, end, name in found]
 
-def extract_code_snippets(file_path: Path) -> Tuple[Optional[str], List[str]]:
+def extract_code_spans(file_path: Path, python_mode: str = DEFAULT_PYTHON_MODE) -> Tuple[Optional[str], List[SnippetSpan]]:
     language = get_language_by_extension(file_path)
     if language is None:
         return None, []
 
+    start = time.perf_counter()
     if language == "python":
-        return language, extract_python_functions(file_path)
-
-    pattern = patterns.get(language)
-    if pattern:
-        return language, extract_functions_by_regex(file_path, pattern)
+        spans = extract_python_spans(file_path, mode=python_mode)
+    elif language in BRACE_LANGUAGES:
+        spans = extract_brace_spans(file_path, language)
     else:
-        log.debug(f"No regex pattern defined for language: {language} in file {file_path}")
-        return language, []
\ No newline at end of file
+        log.debug(f"No extractor defined for language: {language} in file {file_path}")
+        spans = []
+    seconds = time.perf_counter() - start
+    metrics.observe("parse_file", seconds, language=language)
+    metrics.incr("files_parsed", language=language)
+    metrics.incr("snippets", len(spans), language=language)
+    metrics.note_file("parse", file_path, seconds, language=language, functions=len(spans))
+    return language, spans
+
+def extract_code_snippets(file_path: Path, python_mode: str = DEFAULT_PYTHON_MODE) -> Tuple[Optional[str], List[str]]:
+    language, spans = extract_code_spans(file_path, python_mode=python_mode)
+    return language, [span.text for span in spans]
+
+def extract_snippet_records(file_path: Path, python_mode: str = DEFAULT_PYTHON_MODE) -> List[SnippetRecord]:
+    """Returns a SnippetRecord (posix file path, language, snippet, name, lines) per non-blank snippet in a file.
+
+    Module-level and model-free so it can run inside worker processes.
+    """
+    language, spans = extract_code_spans(file_path, python_mode=python_mode)
+    if not spans:
+        return []
+    posix_path = str(file_path.as_posix())
+    return [SnippetRecord(posix_path, language, span.text, span.name, span.start_line, span.end_line)
+            for span in spans if span.text and not span.text.isspace()]
\ No newline at end of file
@@ -0,0 +1,242 @@
+import cProfile
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+# Lightweight, process-local run metrics: labelled counters and timers (count/sum/max),
+# a list of the slowest files, and exports as a JSON run report or Prometheus text.
+# Work done in ProcessPool parse workers is not timed per file; the parent still counts
+# the files and snippets it receives.
+
+METRIC_PREFIX = "code_summarizer"
+DEFAULT_SLOW_FILE_SECONDS = 1.0
+MAX_SLOW_FILES = 50
+DEFAULT_PROFILE_DIR = Path(".cache") / "profiles"
+
+_Key = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+def _key(name: str, labels: Dict[str, object]) -> _Key:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+class Metrics:
+    """Thread-safe registry of counters and timers keyed by name plus labels."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self.counters: Dict[_Key, float] = {}
+        # name+labels -> [count, total seconds, max seconds]
+        self.timers: Dict[_Key, List[float]] = {}
+        self.slow_files: List[Dict] = []
+        self.slow_file_seconds = DEFAULT_SLOW_FILE_SECONDS
+
+    def incr(self, name: str, value: float = 1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            timer = self.timers.setdefault(key, [0, 0.0, 0.0])
+            timer[0] += 1
+            timer[1] += seconds
+            timer[2] = max(timer[2], seconds)
+
+    @contextmanager
+    def timer(self, name: str, **labels) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def note_file(self, stage: str, path: object, seconds: float, **details):
+        """Logs and keeps files whose `stage` took longer than slow_file_seconds."""
+        if seconds < self.slow_file_seconds:
+            return
+        log.warning(f"Slow {stage}: {path} took {seconds:.2f}s"
+                    + (f" ({', '.join(f'{k}={v}' for k, v in details.items())})" if details else "") + ".")
+        entry = {"stage": stage, "path": str(path), "seconds": round(seconds, 4), **details}
+        self.incr("slow_files", stage=stage)
+        with self._lock:
+            self.slow_files.append(entry)
+            self.slow_files.sort(key=lambda e: e["seconds"], reverse=True)
+            del self.slow_files[MAX_SLOW_FILES:]
+
+    def reset(self):
+        with self._lock:
+            self.started_at = time.time()
+            self.counters.clear()
+            self.timers.clear()
+            self.slow_files.clear()
+
+    def snapshot(self) -> Dict:
+        """JSON-ready copy: counters and timers as lists of {name, labels, ...} rows."""
+        with self._lock:
+            counters = [{"name": name, "labels": dict(labels), "value": value}
+                        for (name, labels), value in sorted(self.counters.items())]
+            timers = [{"name": name, "labels": dict(labels), "count": int(count),
+                       "seconds": round(total, 6), "max_seconds": round(longest, 6)}
+                      for (name, labels), (count, total, longest) in sorted(self.timers.items())]
+            return {"started_at": self.started_at, "elapsed_seconds": round(time.time() - self.started_at, 3),
+                    "counters": counters, "timers": timers, "slow_files": list(self.slow_files)}
+
+metrics = Metrics()
+incr = metrics.incr
+observe = metrics.observe
+timer = metrics.timer
+note_file = metrics.note_file
+
+def set_slow_file_threshold(seconds: float):
+    metrics.slow_file_seconds = seconds
+
+def _labels_text(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    def escape(value: str) -> str:
+        return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    return "{" + ",".join(f'{k}="{escape(str(v))}"' for k, v in sorted(labels.items())) + "}"
+
+def _metric_name(name: str) -> str:
+    return f"{METRIC_PREFIX}_{re.sub(r'[^a-zA-Z0-9_]', '_', name)}"
+
+def to_prometheus(snapshot: Optional[Dict] = None) -> str:
+    """Renders metrics in the Prometheus text exposition format."""
+    snapshot = snapshot or metrics.snapshot()
+    lines = []
+    seen = set()
+    for row in snapshot["counters"]:
+        name = _metric_name(row["name"]) + "_total"
+        if name not in seen:
+            lines.append(f"# TYPE {name} counter")
+            seen.add(name)
+        lines.append(f"{name}{_labels_text(row['labels'])} {row['value']}")
+    for row in snapshot["timers"]:
+        base = _metric_name(row["name"]) + "_seconds"
+        if base not in seen:
+            lines.append(f"# TYPE {base} summary")
+            lines.append(f"# TYPE {base}_max gauge")
+            seen.add(base)
+        labels = _labels_text(row["labels"])
+        lines.append(f"{base}_count{labels} {row['count']}")
+        lines.append(f"{base}_sum{labels} {row['seconds']}")
+        lines.append(f"{base}_max{labels} {row['max_seconds']}")
+    return "\n".join(lines) + "\n"
+
+def write_json_report(path: Path, extra: Optional[Dict] = None) -> Path:
+    report = metrics.snapshot()
+    if extra:
+        report.update(extra)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    log.info(f"Wrote metrics report to {path}.")
+    return path
+
+def write_prometheus_file(path: Path, extra: Optional[Dict] = None) -> Path:
+    """Writes the text format atomically, e.g. for node_exporter's textfile collector."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    tmp_path.write_text(to_prometheus(), encoding="utf-8")
+    tmp_path.replace(path)
+    log.info(f"Wrote Prometheus metrics to {path}.")
+    return path
+
+# Exporters by name; each takes (path, extra report fields).
+EXPORTERS = {"json": write_json_report, "prometheus": write_prometheus_file}
+
+def export_metrics(kind: str, path: Path, extra: Optional[Dict] = None) -> Path:
+    if kind not in EXPORTERS:
+        raise ValueError(f"Unknown metrics exporter '{kind}'. Expected one of {sorted(EXPORTERS)}.")
+    return EXPORTERS[kind](path, extra)
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = to_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        log.debug("metrics endpoint: " + format % args)
+
+def serve_prometheus(port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Serves GET /metrics from a daemon thread; call .shutdown() on the result to stop it."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-endpoint", daemon=True).start()
+    log.info(f"Serving Prometheus metrics on http://{host}:{server.server_port}/metrics")
+    return server
+
+# Stages wrapped in stage() across the package; any one of them can be profiled.
+PROFILE_STAGES = ("clone", "discover", "parse", "embed", "upload")
+# Stage profiled with cProfile by stage(); SUMMARIZER_PROFILE_STAGE sets it from the environment.
+PROFILE_STAGE: Optional[str] = os.environ.get("SUMMARIZER_PROFILE_STAGE") or None
+PROFILE_DIR = Path(os.environ.get("SUMMARIZER_PROFILE_DIR", DEFAULT_PROFILE_DIR))
+_profiler: Optional[cProfile.Profile] = None
+# cProfile can only be active once at a time, so concurrent entries of the stage are not profiled.
+_profiler_busy = threading.Lock()
+
+def set_profile_stage(name: Optional[str], profile_dir: Optional[Path] = None):
+    global PROFILE_STAGE, PROFILE_DIR
+    if name is not None and name not in PROFILE_STAGES:
+        raise ValueError(f"Unknown stage '{name}'. Expected one of {list(PROFILE_STAGES)}.")
+    PROFILE_STAGE = name
+    if profile_dir is not None:
+        PROFILE_DIR = Path(profile_dir)
+
+@contextmanager
+def stage(name: str, **labels) -> Iterator[None]:
+    """Times one entry of a pipeline stage (the `stage` timer) and profiles it if it is PROFILE_STAGE.
+
+    Profiles accumulate over every entry of the stage until dump_profile(). cProfile sees only
+    the calling thread; for other threads and parse worker processes, attach py-spy instead.
+    """
+    global _profiler
+    profiling = PROFILE_STAGE == name and _profiler_busy.acquire(blocking=False)
+    if profiling:
+        if _profiler is None:
+            _profiler = cProfile.Profile()
+        _profiler.enable()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.observe("stage", time.perf_counter() - start, stage=name, **labels)
+        if profiling:
+            _profiler.disable()
+            _profiler_busy.release()
+
+def dump_profile() -> Optional[Path]:
+    """Writes the accumulated profile to PROFILE_DIR/<stage>-<pid>.prof (view with pstats or snakeviz)."""
+    if _profiler is None or PROFILE_STAGE is None:
+        return None
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    path = PROFILE_DIR / f"{PROFILE_STAGE}-{os.getpid()}.prof"
+    with _profiler_busy:
+        _profiler.dump_stats(str(path))
+    log.info(f"Wrote {PROFILE_STAGE} profile to {path} (view with `python -m pstats {path}`).")
+    return path
+
+def stage_summary() -> str:
+    """One line of total seconds per stage, e.g. "clone 1.20s, parse 3.41s (212x)"."""
+    rows = [row for row in metrics.snapshot()["timers"] if row["name"] == "stage"]
+    return ", ".join(f"{row['labels'].get('stage')} {row['seconds']:.2f}s"
+                     + (f" ({row['count']}x)" if row["count"] > 1 else "") for row in rows) or "no stages recorded"
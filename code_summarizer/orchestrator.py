@@ -0,0 +1,184 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from itertools import islice
+from typing import Callable, Iterator, List, Optional, Set, Tuple, TypeVar
+
+from . import metrics
+from .firebase_db import DEFAULT_MAX_IN_FLIGHT, upload_summaries
+from .records import SummaryRecord
+from .summarizer import EMBED_CHUNK_SIZE, load_model
+
+log = logging.getLogger(__name__)
+
+# Overlaps the pipeline stages with asyncio instead of running them as strict phases:
+# the checkout runs while the model loads, and each embedded chunk is handed to the
+# upload stage as soon as it is ready, so inference and network I/O proceed together.
+#
+#   records stream --(pulled one chunk at a time on an embed thread)--> bounded queue
+#       --> up to max_in_flight uploads on I/O threads
+#
+# The queue holds at most queue_chunks chunks; when uploads fall behind, embedding
+# waits (backpressure). A failed or cancelled run still uploads every chunk that was
+# already embedded before it returns or re-raises.
+
+# Embedded chunks allowed to wait for upload before embedding pauses.
+DEFAULT_QUEUE_CHUNKS = 4
+
+T = TypeVar("T")
+# Uploads one chunk of records and returns how many were written.
+UploadFn = Callable[[List[SummaryRecord]], int]
+
+_DONE = object()
+
+@dataclass
+class OverlapResult:
+    functions: int = 0
+    uploaded: int = 0
+    upload_failures: int = 0
+    cancelled: bool = False
+    error: Optional[str] = None
+
+def firestore_upload(chunk: List[SummaryRecord]) -> int:
+    """Default UploadFn. A chunk fits in one Firestore batch; concurrency comes from max_in_flight."""
+    return upload_summaries(chunk, max_in_flight=1)
+
+def _take(records: Iterator[SummaryRecord], count: int) -> Tuple[List[SummaryRecord], Optional[BaseException]]:
+    """Pulls up to count records; an error from the stream is returned with the records before it."""
+    chunk: List[SummaryRecord] = []
+    try:
+        for record in islice(records, count):
+            chunk.append(record)
+    except Exception as e:
+        return chunk, e
+    return chunk, None
+
+def _upload_chunk(upload: UploadFn, chunk: List[SummaryRecord]) -> Tuple[int, int]:
+    try:
+        return upload(chunk), len(chunk)
+    except Exception as e:
+        log.error(f"Upload of {len(chunk)} summaries failed: {e}", exc_info=True)
+        return 0, len(chunk)
+
+async def _produce(records: Iterator[SummaryRecord], chunks: asyncio.Queue, chunk_size: int,
+                   executor: ThreadPoolExecutor, result: OverlapResult, unsent: List[List[SummaryRecord]]):
+    loop = asyncio.get_running_loop()
+    while True:
+        pending = loop.run_in_executor(executor, _take, records, chunk_size)
+        try:
+            chunk, error = await asyncio.shield(pending)
+        except asyncio.CancelledError:
+            # A chunk cannot be interrupted mid-embedding. Let it finish, so nothing writes to
+            # the caller's sinks after we return, and flush it with the rest.
+            chunk, error = await pending
+            if error is not None:
+                log.warning(f"Chunk in progress at cancellation failed: {error}")
+            if chunk:
+                result.functions += len(chunk)
+                unsent.append(chunk)
+            raise
+        if error is not None:
+            # Records pulled before the error may already be in the caller's sinks; upload them too.
+            result.functions += len(chunk)
+            if chunk:
+                unsent.append(chunk)
+            raise error
+        if not chunk:
+            return
+        result.functions += len(chunk)
+        if chunks.full():
+            metrics.incr("upload_backpressure_waits")
+        try:
+            await chunks.put(chunk)
+        except asyncio.CancelledError:
+            unsent.append(chunk)
+            raise
+
+async def _consume(chunks: asyncio.Queue, upload: Optional[UploadFn], executor: ThreadPoolExecutor,
+                   max_in_flight: int, result: OverlapResult):
+    loop = asyncio.get_running_loop()
+    in_flight: Set[asyncio.Future] = set()
+
+    def collect(done):
+        for future in done:
+            uploaded, size = future.result()
+            result.uploaded += uploaded
+            result.upload_failures += size - uploaded
+
+    while True:
+        chunk = await chunks.get()
+        if chunk is _DONE:
+            break
+        if upload is None:
+            continue
+        if len(in_flight) >= max_in_flight:
+            done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            collect(done)
+        in_flight.add(loop.run_in_executor(executor, _upload_chunk, upload, chunk))
+    if in_flight:
+        done, _ = await asyncio.wait(in_flight)
+        collect(done)
+
+async def overlap(records: Iterator[SummaryRecord], upload: Optional[UploadFn] = None,
+                  chunk_size: int = EMBED_CHUNK_SIZE, queue_chunks: int = DEFAULT_QUEUE_CHUNKS,
+                  max_in_flight: int = DEFAULT_MAX_IN_FLIGHT) -> OverlapResult:
+    """Drains a lazy record stream (e.g. iter_summaries) while uploading its chunks concurrently.
+
+    The stream is pulled on one dedicated thread, so any sinks it tees into (SummaryWriter,
+    progress callbacks) see records in order from a single thread. With `upload` None, the
+    stream is only drained. An error from the stream, or cancellation, is re-raised after
+    every record already produced has been handed to `upload`.
+    """
+    result = OverlapResult()
+    chunks: asyncio.Queue = asyncio.Queue(maxsize=max(1, queue_chunks))
+    unsent: List[List[SummaryRecord]] = []
+    max_in_flight = max(1, max_in_flight)
+    embedder = ThreadPoolExecutor(max_workers=1, thread_name_prefix="overlap-embed")
+    uploader = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="overlap-upload")
+    consumer = asyncio.create_task(_consume(chunks, upload, uploader, max_in_flight, result))
+    try:
+        await _produce(records, chunks, max(1, chunk_size), embedder, result, unsent)
+    except asyncio.CancelledError:
+        result.cancelled = True
+        raise
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        for chunk in unsent:
+            await chunks.put(chunk)
+        await chunks.put(_DONE)
+        await consumer
+        embedder.shutdown()
+        uploader.shutdown()
+        close = getattr(records, "close", None)
+        if close is not None:
+            close()
+        if result.cancelled or result.error:
+            log.warning(f"Run stopped ({'cancelled' if result.cancelled else result.error}) after "
+                        f"{result.functions} functions; flushed {result.uploaded} uploads.")
+    if result.upload_failures:
+        log.warning(f"{result.upload_failures} of {result.functions} summaries failed to upload.")
+    return result
+
+def run_overlapped(records: Iterator[SummaryRecord], upload: Optional[UploadFn] = None,
+                   chunk_size: int = EMBED_CHUNK_SIZE, queue_chunks: int = DEFAULT_QUEUE_CHUNKS,
+                   max_in_flight: int = DEFAULT_MAX_IN_FLIGHT) -> OverlapResult:
+    """Blocking form of overlap() for threads without a running event loop (CLI, web jobs).
+
+    Ctrl-C cancels the run: the chunk being embedded finishes, queued chunks are uploaded,
+    then KeyboardInterrupt is raised. A second Ctrl-C aborts the flush.
+    """
+    return asyncio.run(overlap(records, upload, chunk_size=chunk_size, queue_chunks=queue_chunks,
+                               max_in_flight=max_in_flight))
+
+async def _checkout_while_loading(checkout: Callable[[], T]) -> Tuple[T, bool]:
+    loop = asyncio.get_running_loop()
+    checked_out, model_ok = await asyncio.gather(loop.run_in_executor(None, checkout),
+                                                 loop.run_in_executor(None, load_model))
+    return checked_out, model_ok
+
+def checkout_while_loading(checkout: Callable[[], T]) -> Tuple[T, bool]:
+    """Runs checkout (a clone or sync) while the model loads; returns (its result, whether the model is usable)."""
+    return asyncio.run(_checkout_while_loading(checkout))
@@ -0,0 +1,144 @@
+import logging
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Deque, Iterable, Iterator, List, Optional, Tuple
+
+from . import metrics
+from .language_parsers import DEFAULT_PYTHON_MODE, SnippetRecord, extract_snippet_records, get_language_by_extension
+from .summarizer import DEFAULT_BATCH_SIZE, EMBED_CHUNK_SIZE, build_records, iter_source_files
+from .records import SummaryRecord
+
+log = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_DEPTH = 64
+
+DONE = object()
+
+class ParseFailure:
+    def __init__(self, file_path: Path, error: BaseException):
+        self.file_path = file_path
+        self.error = error
+
+def produce_parse_results(files: Iterable[Path], executor: ProcessPoolExecutor, out_queue: "queue.Queue",
+                          max_in_flight: int, ordered: bool, python_mode: str, stop: threading.Event):
+    """Submits files to the parser pool and forwards finished results to out_queue.
+
+    At most max_in_flight files are parsed ahead of the consumer; the bounded queue
+    blocks this thread when the embedder falls behind.
+    """
+    in_flight: Deque[Tuple[Path, Future]] = deque()
+
+    def forward(file_path: Path, future: Future):
+        language = get_language_by_extension(Path(file_path))
+        try:
+            item = (file_path, future.result())
+            # Metrics recorded inside the worker processes stay there; count results here instead.
+            metrics.incr("files_parsed", language=language)
+            metrics.incr("snippets", len(item[1]), language=language)
+        except Exception as e:
+            item = ParseFailure(file_path, e)
+            metrics.incr("parse_failures", language=language)
+        out_queue.put(item)
+
+    def drain_one():
+        if ordered:
+            forward(*in_flight.popleft())
+            return
+        done, _ = wait([f for _, f in in_flight], return_when=FIRST_COMPLETED)
+        for entry in [entry for entry in in_flight if entry[1] in done]:
+            in_flight.remove(entry)
+            forward(*entry)
+
+    try:
+        for file_path in files:
+            if stop.is_set():
+                break
+            in_flight.append((file_path, executor.submit(extract_snippet_records, file_path, python_mode)))
+            while len(in_flight) >= max_in_flight:
+                drain_one()
+        while in_flight and not stop.is_set():
+            drain_one()
+    except Exception as e:
+        log.error(f"File discovery failed: {e}", exc_info=True)
+    finally:
+        for _, future in in_flight:
+            future.cancel()
+        out_queue.put(DONE)
+
+def iter_summaries_parallel(repo_dir: Path, repo_url: str, workers: Optional[int] = None,
+                            queue_depth: int = DEFAULT_QUEUE_DEPTH, ordered: bool = True,
+                            batch_size: int = DEFAULT_BATCH_SIZE,
+                            files: Optional[Iterable[Path]] = None,
+                            python_mode: str = DEFAULT_PYTHON_MODE) -> Iterator[SummaryRecord]:
+    """Pipelined iter_summaries: a process pool parses files while this thread embeds.
+
+    With ordered=True the output matches iter_summaries record for record; otherwise
+    records follow parse completion order.
+    """
+    workers = workers or os.cpu_count() or 1
+    queue_depth = max(1, queue_depth)
+    log.info(f"Starting pipelined summarization for repository: {repo_url} "
+             f"({workers} parser processes, queue depth {queue_depth}, ordered={ordered})")
+
+    pending: List[SnippetRecord] = []
+    chunk_size = max(EMBED_CHUNK_SIZE, batch_size)
+    files_processed_count = 0
+    functions_count = 0
+    out_queue: "queue.Queue" = queue.Queue(maxsize=queue_depth)
+    stop = threading.Event()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        producer = threading.Thread(
+            target=produce_parse_results,
+            args=(iter_source_files(repo_dir) if files is None else files, executor, out_queue,
+                  queue_depth, ordered, python_mode, stop),
+            name="parse-producer",
+            daemon=True,
+        )
+        producer.start()
+        try:
+            while True:
+                item = out_queue.get()
+                if item is DONE:
+                    break
+                if isinstance(item, ParseFailure):
+                    log.error(f"Failed to process file {item.file_path}: {item.error}")
+                    continue
+                _, file_pending = item
+                if file_pending:
+                    pending.extend(file_pending)
+                    files_processed_count += 1
+                if len(pending) >= chunk_size:
+                    records = build_records(pending, repo_url, batch_size)
+                    pending = []
+                    functions_count += len(records)
+                    yield from records
+            if pending:
+                records = build_records(pending, repo_url, batch_size)
+                functions_count += len(records)
+                yield from records
+        finally:
+            stop.set()
+            # Unblock the producer if it is waiting on a full queue.
+            while producer.is_alive():
+                try:
+                    out_queue.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            producer.join()
+
+    log.info(f"Summarization complete for {repo_url}. Processed {files_processed_count} files, found {functions_count} functions.")
+
+def summarize_repo_parallel(repo_dir: Path, repo_url: str, workers: Optional[int] = None,
+                            queue_depth: int = DEFAULT_QUEUE_DEPTH, ordered: bool = True,
+                            batch_size: int = DEFAULT_BATCH_SIZE,
+                            files: Optional[Iterable[Path]] = None,
+                            python_mode: str = DEFAULT_PYTHON_MODE) -> List[SummaryRecord]:
+    """List-returning wrapper around iter_summaries_parallel."""
+    return list(iter_summaries_parallel(repo_dir, repo_url, workers=workers, queue_depth=queue_depth,
+                                        ordered=ordered, batch_size=batch_size, files=files,
+                                        python_mode=python_mode))
@@ -0,0 +1,76 @@
+import sys
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, Optional
+
+import numpy as np
+
+# Fields of a summary record, in output order. Optional fields are left out of a record's
+# keys when unset: `embedding` when the function could not be embedded, exactly as the plain
+# dicts used to omit it, and the function's name and 1-based line range when not known.
+FIELDS = ("repo_url", "file_path", "language", "name", "start_line", "end_line", "function_code", "summary",
+          "embedding")
+_OPTIONAL = frozenset(("name", "start_line", "end_line", "embedding"))
+# Strings repeated across many records; interning makes all records of a file share one object.
+_INTERNED = frozenset(("repo_url", "file_path", "language"))
+
+class SummaryRecord(Mapping):
+    """Read-mostly summary of one function, about 3 KB instead of ~25 KB for a dict holding a float list.
+
+    The embedding is a float32 row, normally a view into the matrix of the chunk the function
+    was embedded with, so the vectors of a chunk stay in one contiguous array. The record
+    behaves like the dict it replaces (`record["file_path"]`, .get, `"embedding" in record`);
+    convert with to_dict() where plain JSON types are needed.
+    """
+    __slots__ = FIELDS
+
+    def __init__(self, repo_url: str, file_path: str, language: str, function_code: str, summary: str,
+                 embedding: Optional[np.ndarray] = None, name: Optional[str] = None,
+                 start_line: Optional[int] = None, end_line: Optional[int] = None):
+        self.repo_url = sys.intern(repo_url)
+        self.file_path = sys.intern(file_path)
+        self.language = sys.intern(language)
+        self.function_code = function_code
+        self.summary = summary
+        self.embedding = embedding
+        self.name = name
+        self.start_line = start_line
+        self.end_line = end_line
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in FIELDS or (key in _OPTIONAL and getattr(self, key) is None):
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key: str, value: Any):
+        if key not in FIELDS:
+            raise KeyError(f"SummaryRecord has no field '{key}'.")
+        setattr(self, key, sys.intern(value) if key in _INTERNED else value)
+
+    def __contains__(self, key: object) -> bool:
+        return key in FIELDS and (key not in _OPTIONAL or getattr(self, key) is not None)
+
+    def __iter__(self) -> Iterator[str]:
+        return (key for key in FIELDS if key not in _OPTIONAL or getattr(self, key) is not None)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"SummaryRecord({self.repo_url!r}, {self.file_path!r}, {self.language!r}, ...)"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain dict with the embedding as a list of floats (the Firestore/JSON form)."""
+        document = {key: getattr(self, key) for key in self}
+        if self.embedding is not None:
+            document["embedding"] = self.embedding.tolist()
+        return document
+
+def json_default(value: Any) -> Any:
+    """`default` hook for json.dump: lists for records and arrays, str() for anything else."""
+    if isinstance(value, SummaryRecord):
+        return value.to_dict()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
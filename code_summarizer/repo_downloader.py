@@ -1,28 +1,169 @@
 import os
 import shutil
-from git import Repo, GitCommandError
+from pathlib import Path
+from git import Git, Repo, GitCommandError, InvalidGitRepositoryError, NoSuchPathError
+from typing import Iterable, List, Optional, Tuple
 import logging
 
-log = logging.getLogger(__name__)
+from . import metrics
+from .language_parsers import SUPPORTED_EXTENSIONS
 
-def clone_repo(repo_url: str, dest_folder: str = "cloned_repo") -> bool:
-    """Clones or replaces a git repository locally."""
-    if os.path.exists(dest_folder):
-        log.info(f"Removing existing directory: {dest_folder}")
-        try:
-            shutil.rmtree(dest_folder)
-        except OSError as e:
-            log.error(f"Error removing directory {dest_folder}: {e}")
-            return False
+log = logging.getLogger(__name__)
 
+def _remove_path(path: str) -> bool:
     try:
-        log.info(f"Cloning repo from {repo_url} into {dest_folder}...")
-        Repo.clone_from(repo_url, dest_folder)
-        log.info("Repo cloned successfully.")
+        if os.path.islink(path):
+            os.unlink(path)
+        elif os.path.exists(path):
+            shutil.rmtree(path)
         return True
+    except OSError as e:
+        log.error(f"Error removing directory {path}: {e}")
+        return False
+
+def _configure_sparse_checkout(repo: Repo, extensions: Iterable[str]):
+    # Non-cone patterns: only files with a supported extension are checked out, at any depth.
+    patterns = sorted(f"*{ext}" for ext in extensions)
+    sparse_file = Path(repo.git_dir) / "info" / "sparse-checkout"
+    sparse_file.parent.mkdir(parents=True, exist_ok=True)
+    sparse_file.write_text("\n".join(patterns) + "\n", encoding="utf-8")
+    repo.git.config("core.sparseCheckout", "true")
+
+def shallow_checkout(repo_url: str, dest_folder: str, ref: Optional[str] = None,
+                     filter_blobs: bool = False) -> Optional[str]:
+    """Brings dest_folder to a depth-1 checkout of `ref` (branch, tag or commit SHA; default: remote HEAD).
+
+    An existing clone of the same URL is reused (fetch + hard reset + clean) instead of
+    being re-cloned. With filter_blobs, the clone is partial (blob:none) and only files
+    with a supported extension are checked out, so other blobs are never downloaded.
+    Returns the checked-out commit SHA, or None on failure.
+    """
+    try:
+        repo = Repo(dest_folder)
+        origin_urls = list(repo.remotes.origin.urls) if repo.remotes else []
+        if repo_url not in origin_urls:
+            log.info(f"Existing clone at {dest_folder} points to {origin_urls}, not {repo_url}. Re-cloning.")
+            raise InvalidGitRepositoryError(dest_folder)
+        log.info(f"Fetching {ref or 'HEAD'} of {repo_url} into existing clone {dest_folder}...")
+        reused = True
+    except (InvalidGitRepositoryError, NoSuchPathError, AttributeError, ValueError):
+        if not _remove_path(dest_folder):
+            return None
+        log.info(f"Cloning {ref or 'HEAD'} of {repo_url} into {dest_folder} (depth 1)...")
+        repo = Repo.init(dest_folder)
+        repo.create_remote("origin", repo_url)
+        reused = False
+
+    fetch_args = ["--depth", "1", "--no-tags"]
+    if filter_blobs:
+        _configure_sparse_checkout(repo, SUPPORTED_EXTENSIONS)
+        fetch_args.append("--filter=blob:none")
+    try:
+        with metrics.stage("clone", mode="reuse" if reused else "fresh"):
+            repo.git.fetch(*fetch_args, "origin", ref or "HEAD")
+            sha = repo.git.rev_parse("FETCH_HEAD^{commit}")
+            repo.git.reset("--hard", sha)
+            repo.git.clean("-fdx")
     except GitCommandError as e:
-        log.error(f"Error cloning repo: Git command failed - {e}")
+        log.error(f"Error checking out {ref or 'HEAD'} of {repo_url}: Git command failed - {e}")
+        metrics.incr("clone_failures")
+        return None
+    metrics.incr("checkouts", mode="reuse" if reused else "fresh")
+    log.info(f"Repo checked out at {sha[:12]}.")
+    return sha
+
+def link_checkout(target: Path, dest_folder: str) -> bool:
+    """Points dest_folder (as a symlink) at an existing checkout, replacing whatever was there."""
+    target = Path(target).resolve()
+    if os.path.realpath(dest_folder) == str(target):
+        return True
+    if not _remove_path(dest_folder):
         return False
+    Path(dest_folder).parent.mkdir(parents=True, exist_ok=True)
+    os.symlink(target, dest_folder, target_is_directory=True)
+    return True
+
+def clone_repo(repo_url: str, dest_folder: str = "cloned_repo", ref: Optional[str] = None,
+               cache=None, filter_blobs: bool = False) -> bool:
+    """Makes dest_folder a shallow checkout of a git repository.
+
+    With a CloneCache, the clone lives in (and is reused from) the cache and dest_folder
+    becomes a symlink to it; otherwise dest_folder itself is cloned or updated in place.
+    """
+    return sync_repo(repo_url, dest_folder, ref=ref, cache=cache, filter_blobs=filter_blobs) is not None
+
+def resolve_remote_sha(repo_url: str, ref: Optional[str] = None) -> Optional[str]:
+    """Commit SHA that `ref` (default: HEAD) points to on the remote, via ls-remote (no clone needed).
+
+    A full commit SHA is returned as is. Returns None if the ref cannot be resolved.
+    """
+    if ref and len(ref) == 40 and all(c in "0123456789abcdef" for c in ref.lower()):
+        return ref.lower()
+    try:
+        output = Git().ls_remote(repo_url, ref or "HEAD")
+    except GitCommandError as e:
+        log.warning(f"Could not resolve {ref or 'HEAD'} on {repo_url}: {e}")
+        return None
+    shas = {}
+    for line in output.splitlines():
+        sha, _, name = line.partition("\t")
+        shas[name] = sha
+    # Annotated tags are listed twice; the peeled "^{}" entry is the commit.
+    for name, sha in shas.items():
+        if name.endswith("^{}"):
+            return sha
+    return next(iter(shas.values()), None)
+
+def get_head_sha(repo_dir: str) -> Optional[str]:
+    try:
+        return Repo(repo_dir).head.commit.hexsha
+    except (InvalidGitRepositoryError, NoSuchPathError, ValueError) as e:
+        log.warning(f"Could not read HEAD commit of {repo_dir}: {e}")
+        return None
+
+def sync_repo(repo_url: str, dest_folder: str = "cloned_repo", ref: Optional[str] = None,
+              cache=None, filter_blobs: bool = False) -> Optional[str]:
+    """Updates dest_folder to `ref` (default: remote HEAD), cloning only if needed.
+
+    Returns the checked-out commit SHA, or None on failure.
+    """
+    try:
+        if cache is None:
+            return shallow_checkout(repo_url, dest_folder, ref=ref, filter_blobs=filter_blobs)
+        sha = cache.checkout(repo_url, ref=ref)
+        if sha is None or not link_checkout(cache.path_for(repo_url), dest_folder):
+            return None
+        return sha
     except Exception as e:
-        log.error(f"An unexpected error occurred during cloning: {e}")
-        return False
\ No newline at end of file
+        log.error(f"An unexpected error occurred while syncing {repo_url}: {e}")
+        return None
+
+def _ensure_commit(repo: Repo, sha: str):
+    # Shallow clones only hold the checked-out commit; fetch an older one on demand.
+    try:
+        repo.git.cat_file("-e", f"{sha}^{{commit}}")
+    except GitCommandError:
+        repo.git.fetch("--depth", "1", "--no-tags", "origin", sha)
+
+def diff_commits(repo_dir: str, old_sha: str, new_sha: str) -> Optional[Tuple[List[str], List[str]]]:
+    """Lists files changed between two commits as (added_or_modified, deleted) repo-relative paths.
+
+    Renames are reported as a deletion plus an addition. Returns None if the diff cannot be computed.
+    """
+    try:
+        repo = Repo(repo_dir)
+        _ensure_commit(repo, old_sha)
+        output = repo.git.diff("--name-status", "--no-renames", old_sha, new_sha)
+    except (GitCommandError, InvalidGitRepositoryError, NoSuchPathError) as e:
+        log.warning(f"Could not diff {old_sha[:12]}..{new_sha[:12]} in {repo_dir}: {e}")
+        return None
+    changed, deleted = [], []
+    for line in output.splitlines():
+        if not line.strip():
+            continue
+        status, _, path = line.partition("\t")
+        if status.startswith("D"):
+            deleted.append(path)
+        else:
+            changed.append(path)
+    return changed, deleted
@@ -0,0 +1,282 @@
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+DEFAULT_INDEX_DIR = Path("outputs") / "index"
+# Rows scored per matrix multiply; bounds the float32 scratch space for float16 indexes.
+SEARCH_CHUNK_ROWS = 1 << 16
+METADATA_FIELDS = ("repo_url", "file_path", "language", "summary", "name", "start_line", "end_line")
+
+_VECTORS_FILE = "vectors.npy"
+_METADATA_FILE = "metadata.jsonl"
+_OFFSETS_FILE = "metadata_offsets.npy"
+_LANGUAGE_CODES_FILE = "language_codes.npy"
+_REPO_CODES_FILE = "repo_codes.npy"
+_INFO_FILE = "index.json"
+# Scratch file the vectors are streamed to before being copied into vectors.npy.
+_RAW_VECTORS_FILE = "vectors.raw"
+
+class _IndexWriter:
+    """Streams index rows to disk: vectors to a raw scratch file, metadata to the JSONL sidecar.
+
+    Per-row bookkeeping lives in compact arrays, so memory stays flat for any number of rows;
+    finish() copies the vectors into the .npy file block by block.
+    """
+
+    def __init__(self, index_dir: Path, dtype: str):
+        self.index_dir = index_dir
+        self.dtype = np.dtype(dtype)
+        self.dim: Optional[int] = None
+        self.offsets = array("q")
+        self.language_codes = array("i")
+        self.repo_codes = array("i")
+        self.languages: Dict[str, int] = {}
+        self.repos: Dict[str, int] = {}
+        self._raw = open(index_dir / _RAW_VECTORS_FILE, "wb")
+        self._meta = open(index_dir / _METADATA_FILE, "wb")
+
+    def add(self, vector: np.ndarray, metadata_line: bytes, language: str, repo_url: str) -> bool:
+        """Appends one L2-normalized vector; rows whose dimension differs from the first are dropped."""
+        if self.dim is None:
+            self.dim = int(vector.shape[0])
+        elif vector.shape[0] != self.dim:
+            log.warning(f"Skipping an index row of dimension {vector.shape[0]} (expected {self.dim}).")
+            return False
+        self._raw.write(vector.astype(self.dtype).tobytes())
+        self.offsets.append(self._meta.tell())
+        self._meta.write(metadata_line)
+        self.language_codes.append(self.languages.setdefault(language, len(self.languages)))
+        self.repo_codes.append(self.repos.setdefault(repo_url, len(self.repos)))
+        return True
+
+    def finish(self, model_id: Optional[str]) -> Dict:
+        self._raw.close()
+        self._meta.close()
+        count, dim = len(self.offsets), self.dim or 0
+        raw_path = self.index_dir / _RAW_VECTORS_FILE
+        if count:
+            raw = np.memmap(raw_path, dtype=self.dtype, mode="r", shape=(count, dim))
+            matrix = np.lib.format.open_memmap(self.index_dir / _VECTORS_FILE, mode="w+", dtype=self.dtype,
+                                               shape=(count, dim))
+            for start in range(0, count, SEARCH_CHUNK_ROWS):
+                matrix[start:start + SEARCH_CHUNK_ROWS] = raw[start:start + SEARCH_CHUNK_ROWS]
+            matrix.flush()
+            del matrix, raw
+        else:
+            np.save(self.index_dir / _VECTORS_FILE, np.zeros((0, dim), dtype=self.dtype))
+        raw_path.unlink()
+        np.save(self.index_dir / _OFFSETS_FILE, np.frombuffer(self.offsets, dtype=np.int64))
+        np.save(self.index_dir / _LANGUAGE_CODES_FILE, np.frombuffer(self.language_codes, dtype=np.int32))
+        np.save(self.index_dir / _REPO_CODES_FILE, np.frombuffer(self.repo_codes, dtype=np.int32))
+        info = {
+            "count": count,
+            "dim": dim,
+            "dtype": self.dtype.name,
+            "model_id": model_id,
+            "languages": list(self.languages),
+            "repos": list(self.repos),
+        }
+        with open(self.index_dir / _INFO_FILE, "w", encoding="utf-8") as f:
+            json.dump(info, f, indent=2)
+        return info
+
+def build_index(records: Iterable[Dict], index_dir: Path = DEFAULT_INDEX_DIR, dtype: str = "float32",
+                model_id: Optional[str] = None, merge: bool = False) -> int:
+    """Writes L2-normalized embeddings and a metadata sidecar for records that have an embedding.
+
+    float32 gives the fastest queries; float16 halves the memory map at the cost of a
+    per-query up-cast. With `merge`, rows of the existing index whose repository does not
+    appear in `records` are kept, so indexing one repository leaves the others searchable.
+    Returns the number of indexed rows.
+    """
+    if dtype not in ("float32", "float16"):
+        raise ValueError(f"Unsupported index dtype '{dtype}'. Expected 'float32' or 'float16'.")
+    final_dir = Path(index_dir)
+    final_dir.parent.mkdir(parents=True, exist_ok=True)
+    # Build next to the live index and swap it in at the end, so open memory maps stay valid.
+    index_dir = final_dir.with_name(f"{final_dir.name}.building-{uuid.uuid4().hex[:8]}")
+    index_dir.mkdir()
+    writer = _IndexWriter(index_dir, dtype)
+
+    for record in records:
+        embedding = record.get("embedding")
+        if embedding is None:
+            continue
+        vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        norm = float(np.linalg.norm(vector))
+        if not np.isfinite(norm) or norm == 0.0:
+            continue
+        row = {field: record.get(field) for field in METADATA_FIELDS if record.get(field) is not None}
+        writer.add(vector / norm, json.dumps(row, ensure_ascii=False).encode("utf-8") + b"\n",
+                   record.get("language") or "", record.get("repo_url") or "")
+    new_rows = len(writer.offsets)
+    kept = _copy_other_repos(final_dir, writer, model_id) if merge else 0
+
+    info = writer.finish(model_id)
+    _swap_in(index_dir, final_dir)
+    log.info(f"Built search index with {info['count']} vectors ({dtype}, dim {info['dim']}) in {final_dir}"
+             + (f" ({new_rows} new, {kept} kept from other repositories)." if merge else "."))
+    return info["count"]
+
+def _copy_other_repos(index_dir: Path, writer: _IndexWriter, model_id: Optional[str]) -> int:
+    """Appends the rows of an existing index whose repository the writer has not seen."""
+    if not (index_dir / _INFO_FILE).exists():
+        return 0
+    existing = VectorIndex(index_dir)
+    try:
+        previous_model = existing.info.get("model_id")
+        if model_id and previous_model and previous_model != model_id:
+            log.warning(f"Dropping {len(existing)} indexed rows embedded with {previous_model} (now {model_id}).")
+            return 0
+        if writer.dim is not None and len(existing) and existing.vectors.shape[1] != writer.dim:
+            log.warning(f"Dropping {len(existing)} indexed rows of dimension {existing.vectors.shape[1]} "
+                        f"(now {writer.dim}).")
+            return 0
+        replaced = set(writer.repos)
+        repo_names, language_names = existing.info["repos"], existing.info["languages"]
+        kept = 0
+        with open(index_dir / _METADATA_FILE, "rb") as meta:
+            for start in range(0, len(existing), SEARCH_CHUNK_ROWS):
+                block = np.asarray(existing.vectors[start:start + SEARCH_CHUNK_ROWS], dtype=np.float32)
+                for offset, vector in enumerate(block):
+                    row = start + offset
+                    line = meta.readline()
+                    repo_url = repo_names[existing.repo_codes[row]]
+                    if repo_url in replaced:
+                        continue
+                    kept += writer.add(vector, line, language_names[existing.language_codes[row]], repo_url)
+        return kept
+    finally:
+        existing.close()
+
+def _swap_in(new_dir: Path, final_dir: Path):
+    retired = None
+    if final_dir.exists():
+        retired = final_dir.with_name(f"{final_dir.name}.old-{uuid.uuid4().hex[:8]}")
+        os.replace(final_dir, retired)
+    os.replace(new_dir, final_dir)
+    if retired is not None:
+        # Readers that still map the old files keep them alive until they close.
+        shutil.rmtree(retired, ignore_errors=True)
+
+def build_index_from_json(summaries_file: Path, index_dir: Path = DEFAULT_INDEX_DIR, dtype: str = "float32",
+                          model_id: Optional[str] = None, merge: bool = False) -> int:
+    with open(summaries_file, "r", encoding="utf-8") as f:
+        records = json.load(f)
+    return build_index(records, index_dir=index_dir, dtype=dtype, model_id=model_id, merge=merge)
+
+class VectorIndex:
+    """Memory-mapped cosine-similarity index over function embeddings."""
+
+    def __init__(self, index_dir: Path = DEFAULT_INDEX_DIR):
+        self.index_dir = Path(index_dir)
+        with open(self.index_dir / _INFO_FILE, "r", encoding="utf-8") as f:
+            self.info = json.load(f)
+        self.vectors = np.load(self.index_dir / _VECTORS_FILE, mmap_mode="r")
+        self.offsets = np.load(self.index_dir / _OFFSETS_FILE)
+        self.language_codes = np.load(self.index_dir / _LANGUAGE_CODES_FILE)
+        self.repo_codes = np.load(self.index_dir / _REPO_CODES_FILE)
+        self._language_ids = {name: i for i, name in enumerate(self.info["languages"])}
+        self._repo_ids = {name: i for i, name in enumerate(self.info["repos"])}
+        self._meta_lock = threading.Lock()
+        self._meta_file = open(self.index_dir / _METADATA_FILE, "rb")
+
+    def __len__(self) -> int:
+        return int(self.vectors.shape[0])
+
+    def close(self):
+        self._meta_file.close()
+
+    def _metadata(self, row: int) -> Dict:
+        with self._meta_lock:
+            self._meta_file.seek(int(self.offsets[row]))
+            return json.loads(self._meta_file.readline())
+
+    def _filter_mask(self, start: int, stop: int, language: Optional[str], repo_url: Optional[str]) -> Optional[np.ndarray]:
+        mask = None
+        if language is not None:
+            mask = self.language_codes[start:stop] == self._language_ids.get(language, -1)
+        if repo_url is not None:
+            repo_mask = self.repo_codes[start:stop] == self._repo_ids.get(repo_url, -1)
+            mask = repo_mask if mask is None else mask & repo_mask
+        return mask
+
+    def search_vector(self, query: Union[List[float], np.ndarray], k: int = 10,
+                      language: Optional[str] = None, repo_url: Optional[str] = None) -> List[Dict]:
+        """Top-k rows by cosine similarity to `query`, optionally filtered by language and/or repo."""
+        if len(self) == 0 or k <= 0:
+            return []
+        q = np.asarray(query, dtype=np.float32).reshape(-1)
+        norm = float(np.linalg.norm(q))
+        if norm == 0.0 or q.shape[0] != self.vectors.shape[1]:
+            log.warning(f"Query vector has dimension {q.shape[0]} / norm {norm}; index expects dimension {self.vectors.shape[1]}.")
+            return []
+        q /= norm
+
+        best_rows = np.empty(0, dtype=np.int64)
+        best_scores = np.empty(0, dtype=np.float32)
+        for start in range(0, len(self), SEARCH_CHUNK_ROWS):
+            stop = min(start + SEARCH_CHUNK_ROWS, len(self))
+            block = self.vectors[start:stop]
+            scores = (block if block.dtype == np.float32 else block.astype(np.float32)) @ q
+            mask = self._filter_mask(start, stop, language, repo_url)
+            if mask is not None:
+                scores = np.where(mask, scores, -np.inf)
+            take = min(k, scores.shape[0])
+            top = np.argpartition(-scores, take - 1)[:take]
+            top = top[np.isfinite(scores[top])]
+            best_rows = np.concatenate([best_rows, top + start])
+            best_scores = np.concatenate([best_scores, scores[top]])
+            if best_rows.shape[0] > k:
+                keep = np.argpartition(-best_scores, k - 1)[:k]
+                best_rows, best_scores = best_rows[keep], best_scores[keep]
+
+        order = np.argsort(-best_scores, kind="stable")
+        results = []
+        for idx in order:
+            result = self._metadata(int(best_rows[idx]))
+            result["score"] = float(best_scores[idx])
+            results.append(result)
+        return results
+
+_default_index: Optional[VectorIndex] = None
+_default_index_lock = threading.Lock()
+
+def load_index(index_dir: Path = DEFAULT_INDEX_DIR, reload: bool = False) -> Optional[VectorIndex]:
+    """Opens (and caches) the default index; returns None if it has not been built yet."""
+    global _default_index
+    with _default_index_lock:
+        if _default_index is not None and not reload and _default_index.index_dir == Path(index_dir):
+            return _default_index
+        if not (Path(index_dir) / _INFO_FILE).exists():
+            log.warning(f"No search index found in {index_dir}.")
+            return None
+        # The previous index is not closed here: in-flight searches may still hold it.
+        _default_index = VectorIndex(index_dir)
+        log.info(f"Loaded search index with {len(_default_index)} vectors from {index_dir}.")
+        return _default_index
+
+def search(query: str, k: int = 10, language: Optional[str] = None, repo_url: Optional[str] = None,
+           index: Optional[VectorIndex] = None) -> List[Dict]:
+    """Embeds `query` with the summarizer model and returns the k most similar indexed functions."""
+    from .summarizer import get_embedding
+
+    if index is None:
+        index = load_index()
+    if index is None:
+        return []
+    query_vector = get_embedding(query)
+    if query_vector is None:
+        log.warning("Could not embed search query; is the model loaded?")
+        return []
+    return index.search_vector(query_vector, k=k, language=language, repo_url=repo_url)
@@ -0,0 +1,172 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+from .summarizer import DEFAULT_BATCH_SIZE, embed_matrix
+
+log = logging.getLogger(__name__)
+
+# Web jobs hand the embedder small chunks so requests from several sessions interleave.
+WEB_CHUNK_SIZE = 32
+DEFAULT_MAX_CONCURRENT_JOBS = 2
+DEFAULT_MAX_QUEUED_JOBS = 8
+# The worker waits this long for more requests before running a partly filled micro-batch.
+DEFAULT_MAX_WAIT_SECONDS = 0.01
+
+class JobCancelled(Exception):
+    pass
+
+class EmbeddingWorker:
+    """One thread that owns the model and serves embedding requests from many jobs.
+
+    Requests arriving within max_wait of each other are merged into a single
+    embed_matrix call of up to max_batch snippets, so concurrent sessions share
+    length-bucketed model batches instead of taking turns on the model.
+    """
+
+    def __init__(self, max_batch: int = DEFAULT_BATCH_SIZE * 2, max_wait: float = DEFAULT_MAX_WAIT_SECONDS,
+                 batch_size: int = DEFAULT_BATCH_SIZE):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.batch_size = batch_size
+        self.batches = 0
+        self._requests: "queue.Queue[Tuple[List[str], Future]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="embedding-worker", daemon=True)
+        self._thread.start()
+
+    def submit(self, snippets: List[str]) -> Future:
+        future: Future = Future()
+        self._requests.put((list(snippets), future))
+        return future
+
+    def embed(self, snippets: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Blocking form of submit(); usable as the `embed` argument of iter_summaries."""
+        return self.submit(snippets).result()
+
+    def _run(self):
+        while True:
+            batch = [self._requests.get()]
+            size = len(batch[0][0])
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch:
+                try:
+                    request = self._requests.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                batch.append(request)
+                size += len(request[0])
+            live = [(snippets, future) for snippets, future in batch if future.set_running_or_notify_cancel()]
+            try:
+                matrix, found = embed_matrix([s for snippets, _ in live for s in snippets], batch_size=self.batch_size)
+                self.batches += 1
+            except Exception as e:
+                log.error(f"Embedding worker failed on {size} snippets: {e}", exc_info=True)
+                for _, future in live:
+                    future.set_exception(e)
+                continue
+            start = 0
+            for snippets, future in live:
+                # Copies, so one job's records do not keep the rows of other jobs alive.
+                end = start + len(snippets)
+                future.set_result((matrix[start:end].copy(), found[start:end].copy()))
+                start = end
+
+_worker: Optional[EmbeddingWorker] = None
+_worker_lock = threading.Lock()
+
+def get_embedding_worker() -> EmbeddingWorker:
+    """The process-wide shared embedding worker, started on first use."""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = EmbeddingWorker()
+        return _worker
+
+class JobProgress:
+    """Thread-safe progress of one web job, rendered as a one-line status with an ETA."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stage = "queued"
+        self.files_total = 0
+        self.files_parsed = 0
+        self.functions_found = 0
+        self.functions_embedded = 0
+        self.started_at: Optional[float] = None
+        self.cancelled = threading.Event()
+
+    def set_stage(self, stage: str, files_total: Optional[int] = None):
+        with self._lock:
+            self.stage = stage
+            if files_total is not None:
+                self.files_total = files_total
+            if stage == "summarizing":
+                self.started_at = time.monotonic()
+
+    def __call__(self, event: str, count: int):
+        """ProgressFn for iter_summaries; raises JobCancelled once the job has been cancelled."""
+        if self.cancelled.is_set():
+            raise JobCancelled()
+        with self._lock:
+            if event == "file":
+                self.files_parsed += 1
+                self.functions_found += count
+            elif event == "embedded":
+                self.functions_embedded += count
+
+    def eta_seconds(self) -> Optional[float]:
+        with self._lock:
+            if self.started_at is None or not self.functions_embedded or not self.files_parsed:
+                return None
+            # Extrapolate the function count from the files parsed so far.
+            expected = self.functions_found * max(1.0, self.files_total / self.files_parsed)
+            rate = self.functions_embedded / max(1e-6, time.monotonic() - self.started_at)
+            return max(0.0, expected - self.functions_embedded) / rate
+
+    def render(self) -> str:
+        eta = self.eta_seconds()
+        with self._lock:
+            text = (f"⏳ Parsed {self.files_parsed}/{self.files_total} files · "
+                    f"{self.functions_embedded}/{self.functions_found} functions embedded")
+        if eta is not None:
+            minutes, seconds = divmod(int(round(eta)), 60)
+            text += f" · ETA {minutes}m {seconds:02d}s" if minutes else f" · ETA {seconds}s"
+        return text
+
+class JobQueue:
+    """Runs at most max_concurrent jobs at once; up to max_queued more wait in FIFO order."""
+
+    def __init__(self, max_concurrent: int = DEFAULT_MAX_CONCURRENT_JOBS,
+                 max_queued: int = DEFAULT_MAX_QUEUED_JOBS):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_concurrent), thread_name_prefix="web-job")
+        self._lock = threading.Lock()
+        self._waiting: List[JobProgress] = []
+
+    def submit(self, fn: Callable[[JobProgress], object], progress: JobProgress) -> Optional[Future]:
+        """Queues fn(progress); returns None if the queue is full."""
+        with self._lock:
+            if len(self._waiting) >= self.max_queued:
+                return None
+            self._waiting.append(progress)
+
+        def run():
+            with self._lock:
+                self._waiting.remove(progress)
+            if progress.cancelled.is_set():
+                raise JobCancelled()
+            progress.set_stage("starting")
+            return fn(progress)
+
+        return self._executor.submit(run)
+
+    def position(self, progress: JobProgress) -> int:
+        """1-based place in the waiting line, or 0 once the job has started."""
+        with self._lock:
+            return self._waiting.index(progress) + 1 if progress in self._waiting else 0
@@ -0,0 +1,159 @@
+import json
+import logging
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, Optional
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+# Streaming on-disk layout for summaries:
+#   summaries.jsonl  one JSON object per function, without the embedding; functions
+#                    that have one carry `embedding_row`, their row in embeddings.f32
+#   embeddings.f32   append-only raw little-endian float32 matrix, `dim` values per row
+#   embeddings.json  {"dim": ..., "count": ..., "dtype": "float32"}
+METADATA_FILE = "summaries.jsonl"
+EMBEDDINGS_FILE = "embeddings.f32"
+EMBEDDINGS_INFO_FILE = "embeddings.json"
+_EMBEDDING_DTYPE = np.dtype("<f4")
+
+class SummaryWriter:
+    """Appends summary records to the JSONL + raw float32 layout without holding them in memory."""
+
+    def __init__(self, output_dir: Path, append: bool = False):
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.dim: Optional[int] = None
+        self.rows = 0
+        self.records = 0
+        # Bytes already in embeddings.f32 when appending; rows are counted from them once dim is known.
+        self._resumed_bytes = 0
+        if append:
+            # embeddings.json is only written by close(), so after a crash it undercounts the
+            # rows on disk. Resume from the files themselves, dropping any torn trailing write.
+            self.dim = read_embeddings_info(self.output_dir).get("dim")
+            _truncate_to_last_line(self.output_dir / METADATA_FILE)
+            vectors_path = self.output_dir / EMBEDDINGS_FILE
+            self._resumed_bytes = vectors_path.stat().st_size if vectors_path.exists() else 0
+        mode = "ab" if append else "wb"
+        self._meta = open(self.output_dir / METADATA_FILE, mode)
+        self._vectors = open(self.output_dir / EMBEDDINGS_FILE, mode)
+        if self.dim:
+            self._resume_rows()
+
+    def _resume_rows(self):
+        row_bytes = self.dim * _EMBEDDING_DTYPE.itemsize
+        self.rows = self._resumed_bytes // row_bytes
+        if self._resumed_bytes % row_bytes:
+            log.warning(f"Dropping a partially written embedding row from {self.output_dir / EMBEDDINGS_FILE}.")
+            self._vectors.truncate(self.rows * row_bytes)
+
+    def write(self, record: Dict):
+        line = {key: value for key, value in record.items() if key != "embedding"}
+        embedding = record.get("embedding")
+        if embedding is not None:
+            vector = np.asarray(embedding, dtype=_EMBEDDING_DTYPE).reshape(-1)
+            if self.dim is None:
+                self.dim = int(vector.shape[0])
+                self._resume_rows()
+            if vector.shape[0] == self.dim:
+                self._vectors.write(vector.tobytes())
+                line["embedding_row"] = self.rows
+                self.rows += 1
+            else:
+                log.warning(f"Dropping embedding of dimension {vector.shape[0]} (expected {self.dim}) "
+                            f"for {record.get('file_path')}")
+        self._meta.write(json.dumps(line, ensure_ascii=False, default=str).encode("utf-8") + b"\n")
+        self.records += 1
+
+    def tee(self, records: Iterable[Dict]) -> Iterator[Dict]:
+        """Writes each record as it passes through, for chaining with an uploader."""
+        for record in records:
+            self.write(record)
+            yield record
+
+    def close(self):
+        if self._meta.closed:
+            return
+        self._meta.close()
+        self._vectors.close()
+        with open(self.output_dir / EMBEDDINGS_INFO_FILE, "w", encoding="utf-8") as f:
+            json.dump({"dim": self.dim, "count": self.rows, "dtype": "float32"}, f)
+
+    def __enter__(self) -> "SummaryWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def _truncate_to_last_line(path: Path):
+    """Cuts a JSONL file back to its last complete line, e.g. after a crash mid-write."""
+    if not path.exists():
+        return
+    with open(path, "rb+") as f:
+        size = end = f.seek(0, os.SEEK_END)
+        while end > 0:
+            start = max(0, end - 65536)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b"\n")
+            if newline >= 0:
+                end = start + newline + 1
+                break
+            end = start
+        if end < size:
+            log.warning(f"Dropping a partially written line from {path}.")
+            f.truncate(end)
+
+def read_embeddings_info(output_dir: Path) -> Dict:
+    path = Path(output_dir) / EMBEDDINGS_INFO_FILE
+    if not path.exists():
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def open_embeddings(output_dir: Path) -> Optional[np.memmap]:
+    """Memory-maps embeddings.f32 as a (count, dim) float32 matrix, or None if there are none."""
+    info = read_embeddings_info(output_dir)
+    if not info.get("dim") or not info.get("count"):
+        return None
+    return np.memmap(Path(output_dir) / EMBEDDINGS_FILE, dtype=_EMBEDDING_DTYPE, mode="r",
+                     shape=(info["count"], info["dim"]))
+
+def iter_records(output_dir: Path, with_embeddings: bool = False) -> Iterator[Dict]:
+    """Streams records back from disk, optionally re-attaching each embedding (as a float32 array)."""
+    path = Path(output_dir) / METADATA_FILE
+    if not path.exists():
+        return
+    matrix = open_embeddings(output_dir) if with_embeddings else None
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            row = record.get("embedding_row")
+            if matrix is not None and row is not None and row < matrix.shape[0]:
+                # A copy, so records do not hold the file mapping open.
+                record["embedding"] = np.array(matrix[row], dtype=np.float32)
+            yield record
+
+def filter_records(output_dir: Path, keep: Callable[[Dict], bool]) -> int:
+    """Rewrites the output keeping only records for which keep(record) is true. Returns the number removed."""
+    output_dir = Path(output_dir)
+    if not (output_dir / METADATA_FILE).exists():
+        return 0
+    staging = output_dir.with_name(f"{output_dir.name}.filter-{uuid.uuid4().hex[:8]}")
+    removed = 0
+    with SummaryWriter(staging) as writer:
+        for record in iter_records(output_dir, with_embeddings=True):
+            if keep(record):
+                record.pop("embedding_row", None)
+                writer.write(record)
+            else:
+                removed += 1
+    for name in (METADATA_FILE, EMBEDDINGS_FILE, EMBEDDINGS_INFO_FILE):
+        os.replace(staging / name, output_dir / name)
+    shutil.rmtree(staging, ignore_errors=True)
+    return removed
@@ -1,45 +1,222 @@
-import torch
-from transformers import RobertaTokenizer, RobertaModel, logging as hf_logging
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Iterable, Iterator, Optional, Tuple
 
-from code_summarizer.language_parsers import extract_code_snippets, SUPPORTED_EXTENSIONS
+from code_summarizer import metrics
+from code_summarizer.language_parsers import SnippetRecord, extract_snippet_records, get_language_by_extension, DEFAULT_PYTHON_MODE
+from code_summarizer.discovery import discover_files
+from code_summarizer.embedding_cache import EmbeddingCache, make_cache_key
+from code_summarizer.records import SummaryRecord
+from code_summarizer.backends import BACKENDS, DEFAULT_BACKEND, EmbeddingBackend, load_backend
 from pathlib import Path
-import numpy as np
 import logging
+import threading
+
+import numpy as np
 
 log = logging.getLogger(__name__)
-hf_logging.set_verbosity_error()
 
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-log.info(f"Summarizer using device: {device}")
+MODEL_ID = "microsoft/codebert-base"
+POOLING = "mean"
+MAX_LENGTH = 512
+DEFAULT_BATCH_SIZE = 32
+# Number of pending snippets (across files) collected before running the model.
+EMBED_CHUNK_SIZE = DEFAULT_BATCH_SIZE * 8
+
+# Inference backend (see backends.py) and thread settings, applied by configure_backend.
+BACKEND = DEFAULT_BACKEND
+INTRA_OP_THREADS: Optional[int] = None
+INTER_OP_THREADS: Optional[int] = None
+
+# torch/transformers and the model are loaded on first use (see load_model), so that
+# importing the package stays cheap for parse-only and query-only work.
 MODEL_LOADED = False
+device = None
 tokenizer = None
-model = None
-
-try:
-    log.info("Loading CodeBERT tokenizer/model...")
-    tokenizer = RobertaTokenizer.from_pretrained("microsoft/codebert-base")
-    model = RobertaModel.from_pretrained("microsoft/codebert-base")
-    model = model.to(device)
-    model.eval()
-    MODEL_LOADED = True
-    log.info("CodeBERT model loaded successfully.")
-except Exception as e:
-    log.error(f"Failed to load CodeBERT model: {e}", exc_info=True)
+backend: Optional[EmbeddingBackend] = None
+embedding_cache: Optional[EmbeddingCache] = None
+_model_lock = threading.Lock()
+_load_attempted = False
+
+def configure_backend(name: str = DEFAULT_BACKEND, intra_op_threads: Optional[int] = None,
+                      inter_op_threads: Optional[int] = None):
+    """Selects the inference backend and thread counts. A model that is already loaded is reloaded on next use."""
+    global BACKEND, INTRA_OP_THREADS, INTER_OP_THREADS, MODEL_LOADED, backend, _load_attempted
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend '{name}'. Expected one of {list(BACKENDS)}.")
+    with _model_lock:
+        BACKEND, INTRA_OP_THREADS, INTER_OP_THREADS = name, intra_op_threads, inter_op_threads
+        MODEL_LOADED, backend, _load_attempted = False, None, False
+
+def load_model() -> bool:
+    """Loads the CodeBERT tokenizer and the configured backend once, thread-safely. Returns whether it is usable."""
+    global MODEL_LOADED, device, tokenizer, backend, _load_attempted
+    if _load_attempted:
+        return MODEL_LOADED
+    with _model_lock:
+        if _load_attempted:
+            return MODEL_LOADED
+        try:
+            from transformers import RobertaTokenizerFast, logging as hf_logging
+            hf_logging.set_verbosity_error()
+
+            log.info(f"Loading CodeBERT tokenizer/model (backend: {BACKEND})...")
+            tokenizer = RobertaTokenizerFast.from_pretrained(MODEL_ID)
+            backend = load_backend(BACKEND, MODEL_ID, INTRA_OP_THREADS, INTER_OP_THREADS)
+            device = backend.device
+            log.info(f"Summarizer using device: {device}")
+            MODEL_LOADED = True
+            log.info("CodeBERT model loaded successfully.")
+        except Exception as e:
+            log.error(f"Failed to load CodeBERT model: {e}", exc_info=True)
+        finally:
+            _load_attempted = True
+    return MODEL_LOADED
+
+def is_model_loaded() -> bool:
+    """Loads the model if needed and reports whether embeddings can be computed."""
+    return load_model()
+
+def get_device() -> str:
+    load_model()
+    return str(device) if device is not None else "unavailable"
+
+def warmup() -> bool:
+    """Loads the model and runs one forward pass, so servers pay the start-up cost before the first request."""
+    if not load_model():
+        return False
+    return bool(_embed_batched(["def warmup():\n    pass"], 1)[1][0])
+
+def set_embedding_cache(cache: Optional[EmbeddingCache]):
+    """Installs (or removes, with None) the persistent cache consulted by get_embeddings."""
+    global embedding_cache
+    embedding_cache = cache
+
+def get_cache_stats() -> Dict[str, int]:
+    if embedding_cache is None:
+        return {"hits": 0, "misses": 0}
+    return embedding_cache.stats()
+
+def embedding_model_id() -> str:
+    """Identifies the vectors this configuration produces (model plus any non-reference backend)."""
+    # Non-reference backends produce slightly different vectors, so they are told apart.
+    return MODEL_ID if BACKEND == DEFAULT_BACKEND else f"{MODEL_ID}#{BACKEND}"
+
+def embed_matrix(snippets: List[str], batch_size: int = DEFAULT_BATCH_SIZE) -> Tuple[np.ndarray, np.ndarray]:
+    """Embeds snippets into one contiguous (n, dim) float32 matrix plus a mask of the rows that succeeded.
+
+    Rows keep the input order; identical snippets are embedded once, and the persistent
+    cache (if set) is consulted first.
+    """
+    if not snippets:
+        return _empty_matrix(0)
+
+    cache = embedding_cache
+    model_key = embedding_model_id()
+    keys = [make_cache_key(snippet, model_key, MAX_LENGTH, POOLING) for snippet in snippets]
+    vectors = cache.get_many(keys) if cache is not None else {}
+    if cache is not None:
+        metrics.incr("embedding_cache_hits", len(vectors))
+        metrics.incr("embedding_cache_misses", len(set(keys) - vectors.keys()))
+
+    first_index: Dict[str, int] = {}
+    for i, key in enumerate(keys):
+        if key not in vectors and key not in first_index:
+            first_index[key] = i
+    to_embed = list(first_index.values())
+    computed, computed_ok = _embed_batched([snippets[i] for i in to_embed], batch_size)
+
+    fresh = {keys[i]: computed[row] for row, i in enumerate(to_embed) if computed_ok[row]}
+    if cache is not None and fresh:
+        cache.put_many(fresh)
+    vectors.update(fresh)
+    if not vectors:
+        return _empty_matrix(len(snippets))
+
+    dim = next(iter(vectors.values())).shape[0]
+    matrix = np.zeros((len(snippets), dim), dtype=np.float32)
+    found = np.zeros(len(snippets), dtype=bool)
+    for i, key in enumerate(keys):
+        vector = vectors.get(key)
+        if vector is not None:
+            matrix[i] = vector
+            found[i] = True
+    return matrix, found
+
+def get_embeddings(snippets: List[str], batch_size: int = DEFAULT_BATCH_SIZE) -> List[Optional[List[float]]]:
+    """List form of embed_matrix: one list of floats (or None) per snippet."""
+    matrix, found = embed_matrix(snippets, batch_size)
+    return [row.tolist() if ok else None for row, ok in zip(matrix, found)]
+
+def _empty_matrix(n: int) -> Tuple[np.ndarray, np.ndarray]:
+    return np.zeros((n, 0), dtype=np.float32), np.zeros(n, dtype=bool)
+
+def _iter_batches(snippets: List[str], batch_size: int) -> Iterator[Tuple[List[int], np.ndarray, np.ndarray]]:
+    """Yields (snippet indexes, input_ids, attention_mask) for length-bucketed, right-padded batches."""
+    with metrics.timer("tokenize"):
+        # One token over the limit reveals truncation; cutting back to MAX_LENGTH (keeping the
+        # closing special token) gives the same ids as truncating at MAX_LENGTH directly.
+        encoded = tokenizer(list(snippets), truncation=True, max_length=MAX_LENGTH + 1, padding=False)["input_ids"]
+    truncated = 0
+    for i, ids in enumerate(encoded):
+        if len(ids) > MAX_LENGTH:
+            encoded[i] = ids[:MAX_LENGTH - 1] + ids[-1:]
+            truncated += 1
+    metrics.incr("tokens", sum(len(ids) for ids in encoded))
+    metrics.incr("truncated_snippets", truncated)
+    # Sorting by token length means each batch is padded only to its own longest member.
+    order = sorted(range(len(snippets)), key=lambda i: len(encoded[i]))
+    pad_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else 0
+    for start in range(0, len(order), max(1, batch_size)):
+        batch_idx = order[start:start + batch_size]
+        width = max(len(encoded[i]) for i in batch_idx)
+        input_ids = np.full((len(batch_idx), width), pad_id, dtype=np.int64)
+        attention_mask = np.zeros((len(batch_idx), width), dtype=np.int64)
+        for row, i in enumerate(batch_idx):
+            ids = encoded[i]
+            input_ids[row, :len(ids)] = ids
+            attention_mask[row, :len(ids)] = 1
+        yield batch_idx, input_ids, attention_mask
+
+def embed_with_backend(target: EmbeddingBackend, snippets: List[str], batch_size: int = DEFAULT_BATCH_SIZE) -> np.ndarray:
+    """Embeds snippets with a specific backend (no cache, errors propagate); rows keep the input order."""
+    if not load_model():
+        raise RuntimeError("Tokenizer is not available.")
+    rows: List[Optional[np.ndarray]] = [None] * len(snippets)
+    for batch_idx, input_ids, attention_mask in _iter_batches(snippets, batch_size):
+        embeddings = target.embed(input_ids, attention_mask)
+        for row, i in enumerate(batch_idx):
+            rows[i] = embeddings[row]
+    return np.vstack(rows)
+
+def _embed_batched(snippets: List[str], batch_size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """(n, dim) float32 matrix and success mask; rows of failed batches stay zero and unmarked."""
+    matrix, found = _empty_matrix(len(snippets))
+    if not snippets or not load_model():
+        return matrix, found
+    batch_size = max(1, batch_size)
 
-def get_embedding(code: str) -> Optional[List[float]]:
-    if not MODEL_LOADED or tokenizer is None or model is None:
-        return None
     try:
-        inputs = tokenizer(code, return_tensors="pt", truncation=True, max_length=512, padding=True)
-        inputs = {k: v.to(device) for k, v in inputs.items()}
-        with torch.no_grad():
-            outputs = model(**inputs)
-        embedding = outputs.last_hidden_state.mean(dim=1).squeeze().cpu().numpy()
-        return embedding.tolist()
+        batches = _iter_batches(snippets, batch_size)
+        for batch_idx, input_ids, attention_mask in batches:
+            try:
+                with metrics.timer("model_forward", backend=BACKEND):
+                    embeddings = backend.embed(input_ids, attention_mask)
+                metrics.incr("embedded_snippets", len(batch_idx))
+                if not matrix.shape[1]:
+                    matrix = np.zeros((len(snippets), embeddings.shape[1]), dtype=np.float32)
+                matrix[batch_idx] = embeddings
+                found[batch_idx] = True
+            except Exception as e:
+                log.warning(f"Failed to generate embeddings for a batch of {len(batch_idx)} snippets: {e}")
+                metrics.incr("embedding_failures", len(batch_idx))
     except Exception as e:
-        log.warning(f"Failed to generate embedding: {e}. Snippet start: {code[:50]}...")
-        return None
+        log.warning(f"Failed to tokenize {len(snippets)} snippets: {e}")
+    return matrix, found
+
+def get_embedding(code: str) -> Optional[List[float]]:
+    embedding = get_embeddings([code], batch_size=1)[0]
+    if embedding is None and load_model():
+        log.warning(f"Failed to generate embedding. Snippet start: {code[:50]}...")
+    return embedding
 
 def generate_summary(snippet: str) -> str:
     try:
@@ -50,46 +227,87 @@ def generate_summary(snippet: str) -> str:
     except Exception:
         return "Summary generation failed."
 
-def summarize_file(file_path: Path, repo_url: str) -> List[Dict]:
-    language, snippets = extract_code_snippets(file_path)
-    if not snippets:
+# Same contract as embed_matrix: (n, dim) float32 matrix and a mask of the rows that succeeded.
+EmbedFn = Callable[[List[str]], Tuple[np.ndarray, np.ndarray]]
+# Progress events: ("file", functions found in a parsed file) and ("embedded", records built).
+ProgressFn = Callable[[str, int], None]
+
+def build_records(pending: List[SnippetRecord], repo_url: str, batch_size: int,
+                  embed: Optional[EmbedFn] = None) -> List[SummaryRecord]:
+    """Embeds SnippetRecords in one batched call and builds result records.
+
+    The records' embeddings are row views of that call's matrix, so a chunk's vectors stay
+    in one contiguous array. `embed` replaces the direct embed_matrix call, e.g. with a
+    shared EmbeddingWorker.
+    """
+    snippets = [item.snippet for item in pending]
+    with metrics.stage("embed"):
+        matrix, found = embed(snippets) if embed is not None else embed_matrix(snippets, batch_size=batch_size)
+    return [SummaryRecord(repo_url, item.file_path, item.language, item.snippet, generate_summary(item.snippet),
+                          matrix[i] if found[i] else None, item.name, item.start_line, item.end_line)
+            for i, item in enumerate(pending)]
+
+def iter_source_files(repo_dir: Path) -> Iterator[Path]:
+    """Source files selected by discover_files with its default filters."""
+    yield from discover_files(repo_dir).files
+
+def summarize_file(file_path: Path, repo_url: str, batch_size: int = DEFAULT_BATCH_SIZE,
+                   python_mode: str = DEFAULT_PYTHON_MODE) -> List[SummaryRecord]:
+    pending = extract_snippet_records(file_path, python_mode=python_mode)
+    if not pending:
         return []
+    log.debug(f"Summarizing {len(pending)} snippets from {file_path}...")
+    return build_records(pending, repo_url, batch_size)
 
-    results = []
-    log.debug(f"Summarizing {len(snippets)} snippets from {file_path}...")
-    for snippet in snippets:
-        if not snippet or snippet.isspace():
-            continue
-        embedding = get_embedding(snippet)
-        summary = generate_summary(snippet)
-        summary_data = {
-            "repo_url": repo_url,
-            "file_path": str(file_path.as_posix()),
-            "language": language,
-            "function_code": snippet,
-            "summary": summary,
-        }
-        if embedding is not None:
-             summary_data["embedding"] = embedding
-        results.append(summary_data)
-    return results
-
-def summarize_repo(repo_dir: Path, repo_url: str) -> List[Dict]:
-    all_results = []
+def iter_summaries(repo_dir: Path, repo_url: str, batch_size: int = DEFAULT_BATCH_SIZE,
+                   files: Optional[Iterable[Path]] = None, python_mode: str = DEFAULT_PYTHON_MODE,
+                   chunk_size: int = EMBED_CHUNK_SIZE, embed: Optional[EmbedFn] = None,
+                   progress: Optional[ProgressFn] = None) -> Iterator[SummaryRecord]:
+    """Yields summary records as each embedding chunk finishes, so memory stays flat for any repo size.
+
+    Covers every supported file under repo_dir, or only `files` when given (incremental runs).
+    `progress`, if set, is called per parsed file and per embedded chunk; an exception it
+    raises aborts the run.
+    """
     log.info(f"Starting summarization for repository: {repo_url}")
-    supported_extensions = set(SUPPORTED_EXTENSIONS.keys())
     files_processed_count = 0
+    functions_count = 0
+    # Snippets are pooled across files so small files still fill model batches.
+    pending: List[SnippetRecord] = []
+    chunk_size = max(chunk_size, 1)
 
-    for file in repo_dir.rglob("*"):
-        if file.is_file() and file.suffix.lower() in supported_extensions:
-            log.debug(f"Processing file: {file}")
-            try:
-                file_results = summarize_file(file, repo_url)
-                if file_results:
-                    all_results.extend(file_results)
-                    files_processed_count += 1
-            except Exception as e:
-                log.error(f"Failed to process file {file}: {e}", exc_info=True)
+    for file in (iter_source_files(repo_dir) if files is None else files):
+        log.debug(f"Processing file: {file}")
+        try:
+            with metrics.stage("parse"):
+                file_pending = extract_snippet_records(file, python_mode=python_mode)
+            if file_pending:
+                pending.extend(file_pending)
+                files_processed_count += 1
+        except Exception as e:
+            file_pending = None
+            log.error(f"Failed to process file {file}: {e}", exc_info=True)
+            metrics.incr("parse_failures", language=get_language_by_extension(Path(file)))
+        if progress is not None:
+            progress("file", len(file_pending or ()))
+        if len(pending) >= chunk_size:
+            records = build_records(pending, repo_url, batch_size, embed)
+            pending = []
+            functions_count += len(records)
+            if progress is not None:
+                progress("embedded", len(records))
+            yield from records
+
+    if pending:
+        records = build_records(pending, repo_url, batch_size, embed)
+        functions_count += len(records)
+        if progress is not None:
+            progress("embedded", len(records))
+        yield from records
+
+    log.info(f"Summarization complete for {repo_url}. Processed {files_processed_count} files, found {functions_count} functions.")
 
-    log.info(f"Summarization complete for {repo_url}. Processed {files_processed_count} files, found {len(all_results)} functions.")
-    return all_results
\ No newline at end of file
+def summarize_repo(repo_dir: Path, repo_url: str, batch_size: int = DEFAULT_BATCH_SIZE,
+                   files: Optional[Iterable[Path]] = None, python_mode: str = DEFAULT_PYTHON_MODE) -> List[SummaryRecord]:
+    """List-returning wrapper around iter_summaries."""
+    return list(iter_summaries(repo_dir, repo_url, batch_size=batch_size, files=files, python_mode=python_mode))
@@ -0,0 +1,84 @@
+import time
+
+import pytest
+
+from code_summarizer.brace_scanner import scan_functions
+
+# Inputs that used to backtrack for tens of seconds in the header-suffix check.
+SLOW_SUFFIX_INPUTS = [
+    "void f()" + " : a" * 16 + "\n{ return; }\n",
+    "void f()" + " -> a" * 16 + "\n{ return; }\n",
+    "void f()" + " : a" * 400 + "\n{ return; }\n",
+]
+
+WIDGET_CTOR = """Widget::Widget(Config cfg)
+    : a_(std::chrono::seconds(1)), b_(std::chrono::minutes(2)),
+      c_(std::chrono::milliseconds(3)), d_(std::chrono::microseconds(4)),
+      e_(std::chrono::hours(5)),
+      cb_([this] { this->tick(); }) {
+    start();
+}
+"""
+
+def _names(code, language="cpp"):
+    return [(code[start:end], name) for start, end, name in scan_functions(code, language)]
+
+def _timed_names(code, language="cpp", limit=1.0):
+    start = time.perf_counter()
+    names = _names(code, language)
+    assert time.perf_counter() - start < limit
+    return names
+
+@pytest.mark.parametrize("code", SLOW_SUFFIX_INPUTS)
+def test_suffix_check_is_linear(code):
+    _timed_names(code)
+
+def test_constructor_with_lambda_initializer():
+    assert _timed_names(WIDGET_CTOR) == [(WIDGET_CTOR.rstrip("\n"), "Widget::Widget")]
+
+def test_brace_initialized_members_do_not_open_a_body():
+    code = "Foo::Foo() : a_{1}, b_(2) {\n  init();\n}\n"
+    assert _names(code) == [(code.rstrip("\n"), "Foo::Foo")]
+
+def test_inline_constructor_with_brace_initializer():
+    assert _names("struct S { S() : a{1} {} };") == [("S() : a{1} {}", "S")]
+
+def test_several_brace_initializers():
+    assert [name for _, name in _names("class A { A() : x{1}, y{2} {} int g() const & { return 1; } };")] == ["A", "g"]
+
+def test_templated_qualified_name():
+    code = "template <typename T> T Foo<T>::get() const {\n  return v;\n}\n"
+    assert _names(code) == [(code.rstrip("\n"), "Foo::get")]
+
+def test_template_default_arguments():
+    code = "template <typename T = int, typename U = std::map<int, T>>\nU Foo<T, U>::make() { return {}; }\n"
+    assert [name for _, name in _names(code)] == ["Foo::make"]
+
+@pytest.mark.parametrize("code,language,name", [
+    ("int main() noexcept(true) { return 0; }", "cpp", "main"),
+    ("auto h() -> int { return 1; }", "cpp", "h"),
+    ("bool operator<(const A& o) const { return true; }", "cpp", "operator<"),
+    ("public Foo(int x) : base(x) { }", "csharp", "Foo"),
+    ("void M<T>() where T : class { }", "csharp", "M"),
+    ("public void f() throws IOException, Foo { }", "java", "f"),
+])
+def test_suffix_forms(code, language, name):
+    assert _names(code, language) == [(code, name)]
+
+def test_macro_invocation_is_not_a_function():
+    assert _names("FOO(bar) {\n  x();\n}\n") == []
+
+@pytest.mark.parametrize("code,language,name", [
+    ("char *dup(const char *s) {\n  return 0;\n}", "c", "dup"),
+    ("static PyObject *__Pyx_PyMethod_New(PyObject *f) {\n  return f;\n}", "c", "__Pyx_PyMethod_New"),
+    ("char **split(char *s) {\n  return 0;\n}", "c", "split"),
+    ("Foo *Foo::create() {\n  return new Foo();\n}", "cpp", "Foo::create"),
+    ("const std::string &name() const {\n  return name_;\n}", "cpp", "name"),
+    ("Foo &operator=(const Foo &o) {\n  return *this;\n}", "cpp", "operator="),
+    ("T &&take() {\n  return std::move(v);\n}", "cpp", "take"),
+])
+def test_pointer_and_reference_attached_to_name(code, language, name):
+    assert _names(code, language) == [(code, name)]
+
+def test_dereference_is_not_a_function():
+    assert _names("*p(q) {\n  x();\n}\n") == []
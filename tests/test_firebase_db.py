@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from code_summarizer import firebase_db
+from code_summarizer.fake_firestore import InMemoryFirestore
+from code_summarizer.firebase_db import (COLLECTION, delete_summaries, get_repo_manifest, get_summaries_by_repo,
+                                         is_manifest_fresh, make_document_id, upload_summaries,
+                                         write_repo_manifest)
+
+REPO = "file:///repo"
+
+def _summaries(count, repo_url=REPO):
+    return [{"repo_url": repo_url, "file_path": f"cloned_repo_cli/f{i % 7}.py", "language": "python",
+             "function_code": f"def f{i}(): pass", "summary": f"summary {i}",
+             "embedding": np.full(4, i, dtype=np.float32)}
+            for i in range(count)]
+
+@pytest.fixture
+def installed_client(monkeypatch):
+    """Installs a fake as the module's initialized client, for functions without a client argument."""
+    client = InMemoryFirestore()
+    monkeypatch.setattr(firebase_db, "db", client)
+    monkeypatch.setattr(firebase_db, "FIRESTORE_INITIALIZED", True)
+    monkeypatch.setattr(firebase_db, "_init_attempted", True)
+    return client
+
+def test_upload_batches_and_converts_embeddings():
+    client = InMemoryFirestore()
+    assert upload_summaries(_summaries(1200), client=client, batch_size=500) == 1200
+    assert client.commits == 3
+    doc_id = make_document_id(REPO, "cloned_repo_cli/f0.py", "def f0(): pass")
+    assert client.collection(COLLECTION).document(doc_id).get().to_dict()["embedding"] == [0.0] * 4
+
+def test_reupload_overwrites_instead_of_duplicating():
+    client = InMemoryFirestore()
+    upload_summaries(_summaries(50), client=client)
+    upload_summaries(_summaries(50), client=client)
+    assert client.count(COLLECTION) == 50
+
+def test_transient_errors_are_retried():
+    client = InMemoryFirestore(fail_next_commits=2)
+    assert upload_summaries(_summaries(10), client=client, base_delay=0.001) == 10
+    assert client.count(COLLECTION) == 10
+
+def test_upload_gives_up_after_max_retries():
+    client = InMemoryFirestore(fail_next_commits=10)
+    assert upload_summaries(_summaries(10), client=client, max_retries=2, base_delay=0.001) == 0
+    assert client.count(COLLECTION) == 0
+
+def test_records_missing_required_keys_are_skipped():
+    summaries = _summaries(3)
+    del summaries[1]["summary"]
+    client = InMemoryFirestore()
+    assert upload_summaries(summaries, client=client) == 2
+
+def test_paged_reads_with_projection():
+    client = InMemoryFirestore()
+    upload_summaries(_summaries(25) + _summaries(5, repo_url="file:///other"), client=client)
+    rows = get_summaries_by_repo(REPO, fields=["file_path"], page_size=4, client=client)
+    assert len(rows) == 25
+    assert all(set(row) == {"file_path"} for row in rows)
+    assert len(get_summaries_by_repo(REPO, limit=6, page_size=4, client=client)) == 6
+
+def test_manifest_round_trip_and_freshness():
+    client = InMemoryFirestore()
+    assert get_repo_manifest(REPO, client=client) is None
+    assert write_repo_manifest(REPO, "a" * 40, 12, "model", client=client)
+    manifest = get_repo_manifest(REPO, client=client)
+    assert manifest["function_count"] == 12
+    assert is_manifest_fresh(manifest, commit_sha="a" * 40, model_id="model")
+    assert not is_manifest_fresh(manifest, commit_sha="b" * 40)
+    assert not is_manifest_fresh(manifest, model_id="other")
+
+def test_delete_summaries_by_file(installed_client):
+    upload_summaries(_summaries(21), client=installed_client)
+    assert delete_summaries(REPO, ["cloned_repo_cli/f0.py", "cloned_repo_cli/f1.py"]) == 6
+    assert installed_client.count(COLLECTION) == 15
+    assert delete_summaries(REPO, []) == 0
+
+def test_delete_all_summaries_drops_manifest(installed_client):
+    upload_summaries(_summaries(5), client=installed_client)
+    write_repo_manifest(REPO, "a" * 40, 5, "model")
+    assert delete_summaries(REPO) == 5
+    assert get_repo_manifest(REPO) is None
+
+def test_failed_delete_returns_none(installed_client):
+    upload_summaries(_summaries(5), client=installed_client)
+    installed_client.fail_next_commits = 1
+    assert delete_summaries(REPO) is None
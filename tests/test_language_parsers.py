@@ -0,0 +1,31 @@
+from code_summarizer.language_parsers import extract_code_spans, extract_snippet_records
+
+def _write(path, text):
+    path.write_bytes(text.encode("utf-8"))
+    return path
+
+def _check_bytes(path, spans):
+    raw = path.read_bytes()
+    for span in spans:
+        assert raw[span.start_byte:span.end_byte].decode("utf-8") == span.text
+
+def test_crlf_python_offsets_match_file(tmp_path):
+    path = _write(tmp_path / "m.py", "import os\r\n\r\nclass A:\r\n    def f(self):\r\n        return 'é'\r\n\r\ndef g():\r\n    pass\r\n")
+    language, spans = extract_code_spans(path)
+    assert language == "python"
+    assert [(s.name, s.start_line, s.end_line) for s in spans] == [("A.f", 4, 5), ("g", 7, 8)]
+    assert spans[0].start_byte == len(b"import os\r\n\r\nclass A:\r\n    ")
+    _check_bytes(path, spans)
+
+def test_crlf_brace_offsets_match_file(tmp_path):
+    path = _write(tmp_path / "m.c", "// é\r\n#include <x.h>\r\n\r\nint add(int a, int b) {\r\n  return a + b;\r\n}\r\n")
+    _, spans = extract_code_spans(path)
+    assert [(s.name, s.start_line, s.end_line) for s in spans] == [("add", 4, 6)]
+    _check_bytes(path, spans)
+
+def test_snippet_records_carry_name_and_lines(tmp_path):
+    path = _write(tmp_path / "m.py", "def f():\n    return 1\n\n\nasync def g():\n    pass\n")
+    records = extract_snippet_records(path)
+    assert [(r.file_path, r.language, r.name, r.start_line, r.end_line) for r in records] == [
+        (path.as_posix(), "python", "f", 1, 2), (path.as_posix(), "python", "g", 5, 6)]
+    assert records[1].snippet == "async def g():\n    pass"
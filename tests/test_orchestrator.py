@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from code_summarizer.orchestrator import run_overlapped
+from code_summarizer.records import SummaryRecord
+
+def _records(count, error=None):
+    for i in range(count):
+        yield SummaryRecord("file:///repo", f"cloned_repo_cli/f{i}.py", "python", f"def f{i}(): pass",
+                            f"summary {i}", np.zeros(4, dtype=np.float32))
+    if error is not None:
+        raise error
+
+class _Recorder:
+    def __init__(self):
+        self.paths = []
+
+    def __call__(self, chunk):
+        self.paths.extend(record.file_path for record in chunk)
+        return len(chunk)
+
+def test_uploads_every_record():
+    upload = _Recorder()
+    result = run_overlapped(_records(100), upload=upload, chunk_size=32)
+    assert (result.functions, result.uploaded, result.upload_failures) == (100, 100, 0)
+    assert upload.paths == [f"cloned_repo_cli/f{i}.py" for i in range(100)]
+
+def test_failing_stream_flushes_partial_chunk():
+    upload = _Recorder()
+    with pytest.raises(RuntimeError, match="stream broke"):
+        run_overlapped(_records(45, RuntimeError("stream broke")), upload=upload, chunk_size=32)
+    assert len(upload.paths) == 45
+
+def test_failing_stream_before_first_chunk_fills():
+    upload = _Recorder()
+    with pytest.raises(ValueError):
+        run_overlapped(_records(5, ValueError("early")), upload=upload, chunk_size=32)
+    assert len(upload.paths) == 5
+
+def test_upload_failures_are_counted():
+    result = run_overlapped(_records(64), upload=lambda chunk: len(chunk) - 1, chunk_size=32)
+    assert (result.uploaded, result.upload_failures) == (62, 2)
@@ -0,0 +1,118 @@
+import os
+
+import pytest
+from git import Repo
+
+from code_summarizer.clone_cache import CloneCache
+from code_summarizer.repo_downloader import diff_commits, get_head_sha, resolve_remote_sha, shallow_checkout, sync_repo
+
+def _commit(work: Repo, files, message):
+    for name, text in files.items():
+        path = os.path.join(work.working_dir, name)
+        if text is None:
+            work.index.remove([name], working_tree=True)
+            continue
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        work.index.add([name])
+    return work.index.commit(message).hexsha
+
+@pytest.fixture
+def remote(tmp_path):
+    """A bare repository reachable as file://, with two commits and a tag on the first."""
+    bare = Repo.init(tmp_path / "remote.git", bare=True)
+    work = Repo.init(tmp_path / "work")
+    with work.config_writer() as config:
+        config.set_value("user", "name", "test")
+        config.set_value("user", "email", "test@example.com")
+    first = _commit(work, {"a.py": "def a():\n    return 1\n", "b.py": "def b():\n    pass\n"}, "first")
+    work.create_tag("v1")
+    second = _commit(work, {"a.py": "def a():\n    return 2\n", "b.py": None, "c.py": "def c():\n    pass\n"}, "second")
+    work.create_remote("origin", bare.working_dir)
+    work.git.push("origin", "HEAD:refs/heads/main", "--tags")
+    bare.git.symbolic_ref("HEAD", "refs/heads/main")
+    return {"url": f"file://{bare.working_dir}", "work": work, "first": first, "second": second}
+
+def _make_remote(tmp_path, name, size):
+    bare = Repo.init(tmp_path / f"{name}.git", bare=True)
+    work = Repo.init(tmp_path / f"{name}-work")
+    with work.config_writer() as config:
+        config.set_value("user", "name", "test")
+        config.set_value("user", "email", "test@example.com")
+    _commit(work, {"data.py": "x = 1\n" * size}, "init")
+    work.create_remote("origin", bare.working_dir)
+    work.git.push("origin", "HEAD:refs/heads/main")
+    bare.git.symbolic_ref("HEAD", "refs/heads/main")
+    return f"file://{bare.working_dir}"
+
+def test_checkout_is_depth_one(remote, tmp_path):
+    dest = tmp_path / "clone"
+    assert shallow_checkout(remote["url"], str(dest)) == remote["second"]
+    assert Repo(dest).git.rev_list("--count", "HEAD") == "1"
+    assert sorted(p for p in os.listdir(dest) if p != ".git") == ["a.py", "c.py"]
+
+def test_checkout_pins_sha_and_tag(remote, tmp_path):
+    dest = tmp_path / "clone"
+    assert shallow_checkout(remote["url"], str(dest), ref=remote["first"]) == remote["first"]
+    assert (dest / "b.py").exists()
+    assert shallow_checkout(remote["url"], str(dest), ref="v1") == remote["first"]
+    assert get_head_sha(str(dest)) == remote["first"]
+
+def test_existing_clone_is_updated_in_place(remote, tmp_path):
+    dest = tmp_path / "clone"
+    shallow_checkout(remote["url"], str(dest), ref=remote["first"])
+    (dest / "stray.txt").write_text("left over", encoding="utf-8")
+    assert shallow_checkout(remote["url"], str(dest)) == remote["second"]
+    assert not (dest / "stray.txt").exists()
+    assert (dest / "a.py").read_text(encoding="utf-8") == "def a():\n    return 2\n"
+
+def test_failed_checkout_returns_none(remote, tmp_path):
+    assert shallow_checkout(remote["url"], str(tmp_path / "clone"), ref="no-such-branch") is None
+
+def test_resolve_remote_sha(remote):
+    assert resolve_remote_sha(remote["url"]) == remote["second"]
+    assert resolve_remote_sha(remote["url"], "main") == remote["second"]
+    assert resolve_remote_sha(remote["url"], "v1") == remote["first"]
+    assert resolve_remote_sha(remote["url"], remote["first"].upper()) == remote["first"]
+
+def test_diff_fetches_older_commit_on_demand(remote, tmp_path):
+    dest = tmp_path / "clone"
+    shallow_checkout(remote["url"], str(dest))
+    changed, deleted = diff_commits(str(dest), remote["first"], remote["second"])
+    assert (sorted(changed), deleted) == (["a.py", "c.py"], ["b.py"])
+
+def test_cache_links_checkout(remote, tmp_path):
+    cache = CloneCache(tmp_path / "cache")
+    dest = tmp_path / "cloned_repo_cli"
+    assert sync_repo(remote["url"], str(dest), cache=cache) == remote["second"]
+    assert dest.is_symlink() and os.path.realpath(dest) == str(cache.path_for(remote["url"]).resolve())
+    assert [entry["commit_sha"] for entry in cache.entries()] == [remote["second"]]
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    urls = [_make_remote(tmp_path, name, 10) for name in ("one", "two", "three")]
+    cache = CloneCache(tmp_path / "cache", max_entries=2)
+    for url in urls:
+        assert cache.checkout(url) is not None
+    assert sorted(entry["repo_url"] for entry in cache.entries()) == sorted(urls[1:])
+    assert not cache.path_for(urls[0]).exists()
+    # The index survives a restart.
+    assert len(CloneCache(tmp_path / "cache", max_entries=2).entries()) == 2
+
+def test_cache_does_not_evict_clone_in_use(tmp_path):
+    urls = [_make_remote(tmp_path, name, 10) for name in ("one", "two")]
+    cache = CloneCache(tmp_path / "cache", max_entries=1)
+    with cache.use(urls[0]) as path:
+        assert path is not None
+        cache.checkout(urls[1])
+        assert path.exists()
+    assert cache.evict() == 1
+    assert [entry["repo_url"] for entry in cache.entries()] == [urls[1]]
+
+def test_cache_byte_budget(tmp_path):
+    small, large = _make_remote(tmp_path, "small", 10), _make_remote(tmp_path, "large", 20000)
+    cache = CloneCache(tmp_path / "cache")
+    cache.checkout(small)
+    cache.checkout(large)
+    cache.max_bytes = cache.total_bytes() - 1
+    assert cache.evict() == 1
+    assert [entry["repo_url"] for entry in cache.entries()] == [large]
@@ -0,0 +1,52 @@
+import numpy as np
+
+from code_summarizer.sinks import EMBEDDINGS_FILE, EMBEDDINGS_INFO_FILE, METADATA_FILE, SummaryWriter, iter_records
+
+def _record(name, value):
+    return {"file_path": name, "summary": name, "embedding": np.full(4, value, dtype=np.float32)}
+
+def _crash(writer):
+    """Leaves the writer's files as a killed process would: flushed, but never closed."""
+    writer._meta.flush()
+    writer._vectors.flush()
+
+def _rows(output_dir):
+    return [(r["file_path"], r["embedding_row"], float(r["embedding"][0]))
+            for r in iter_records(output_dir, with_embeddings=True)]
+
+def test_append_after_close(tmp_path):
+    with SummaryWriter(tmp_path) as writer:
+        writer.write(_record("a", 1))
+    with SummaryWriter(tmp_path, append=True) as writer:
+        writer.write(_record("b", 2))
+    assert _rows(tmp_path) == [("a", 0, 1.0), ("b", 1, 2.0)]
+
+def test_append_after_crash_counts_rows_on_disk(tmp_path):
+    with SummaryWriter(tmp_path) as writer:
+        writer.write(_record("a", 1))
+    crashed = SummaryWriter(tmp_path, append=True)
+    crashed.write(_record("b", 2))
+    _crash(crashed)
+    with SummaryWriter(tmp_path, append=True) as writer:
+        writer.write(_record("c", 3))
+    assert _rows(tmp_path) == [("a", 0, 1.0), ("b", 1, 2.0), ("c", 2, 3.0)]
+
+def test_append_drops_torn_writes(tmp_path):
+    with SummaryWriter(tmp_path) as writer:
+        writer.write(_record("a", 1))
+    with open(tmp_path / EMBEDDINGS_FILE, "ab") as f:
+        f.write(b"\0\0")
+    with open(tmp_path / METADATA_FILE, "ab") as f:
+        f.write(b'{"file_pa')
+    with SummaryWriter(tmp_path, append=True) as writer:
+        writer.write(_record("b", 2))
+    assert _rows(tmp_path) == [("a", 0, 1.0), ("b", 1, 2.0)]
+
+def test_append_after_crash_before_first_close(tmp_path):
+    crashed = SummaryWriter(tmp_path)
+    crashed.write(_record("a", 1))
+    _crash(crashed)
+    assert not (tmp_path / EMBEDDINGS_INFO_FILE).exists()
+    with SummaryWriter(tmp_path, append=True) as writer:
+        writer.write(_record("b", 2))
+    assert _rows(tmp_path) == [("a", 0, 1.0), ("b", 1, 2.0)]